@@ -1,10 +1,23 @@
+import os
 import httpx
+import asyncio
 import datetime
-from fastapi import APIRouter, HTTPException
-from database import get_db, get_sys_config
-from models import ConfigModel, SubscribeModel, BatchSubscribeModel, BatchDeleteModel, SaveLinkModel, DriveListReq, DriveActionReq, QrcodeStatusModel, QrcodeLoginModel
+import unicodedata
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse, FileResponse, Response, PlainTextResponse
+from database import get_db, get_sys_config, set_sys_config, count_media, invalidate_media_counts, upsert_media_items, fetch_in_chunks, SharedVersion
+from models import ConfigModel, SubscribeModel, BatchSubscribeModel, BatchDeleteModel, SaveLinkModel, DriveListReq, DriveActionReq, DriveBatchReq, QrcodeStatusModel, QrcodeLoginModel
 from logger import get_logs, add_log
 from drive_api import QuarkDrive, AliyunDrive
+from resilience import resilient_request, is_available, PROVIDER_SETTINGS, FAST_FAIL_TIMEOUT
+from cache import TTLCache
+from log_stream import log_event_stream
+from media_search import search_local, to_tmdb_result
+import poster_cache
+import metrics
+from job_report import list_reports, get_report
+from leases import job_running, is_leader, list_leases
 
 router = APIRouter()
 
@@ -13,21 +26,20 @@ def get_config(): return get_sys_config()
 
 @router.post("/api/config")
 def update_config(config: ConfigModel):
-    conn = get_db()
-    try:
-        fields = [
-            ('api_domain', config.api_domain), ('image_domain', config.image_domain), 
-            ('api_key', config.api_key), ('pansou_domain', config.pansou_domain), 
-            ('cron_expression', config.cron_expression), ('cms_api_url', config.cms_api_url), 
-            ('cms_api_token', config.cms_api_token), ('cookie_quark', config.cookie_quark), 
-            ('token_aliyun', config.token_aliyun), ('quark_save_dir', config.quark_save_dir), 
-            ('aliyun_save_dir', config.aliyun_save_dir), ('auto_subscribe_new', config.auto_subscribe_new),
-            ('auto_subscribe_drive', config.auto_subscribe_drive)
-        ]
-        for key, value in fields: conn.execute("REPLACE INTO system_configs (config_key, config_value) VALUES (?, ?)", (key, value))
-        conn.commit()
-        return {"message": "配置保存成功"}
-    finally: conn.close()
+    fields = [
+        ('api_domain', config.api_domain), ('image_domain', config.image_domain), 
+        ('api_key', config.api_key), ('pansou_domain', config.pansou_domain), 
+        ('cron_expression', config.cron_expression), ('cms_api_url', config.cms_api_url), 
+        ('cms_api_token', config.cms_api_token), ('cookie_quark', config.cookie_quark), 
+        ('token_aliyun', config.token_aliyun), ('quark_save_dir', config.quark_save_dir), 
+        ('aliyun_save_dir', config.aliyun_save_dir), ('auto_subscribe_new', config.auto_subscribe_new),
+        ('auto_subscribe_drive', config.auto_subscribe_drive), ('release_profile', config.release_profile),
+        ('library_115_cids', config.library_115_cids), ('library_115_ttl_hours', config.library_115_ttl_hours)
+    ]
+    set_sys_config(fields)
+    tmdb_search_cache.clear()  # API 域名/密钥可能已变更
+    tmdb_search_shared.bump()
+    return {"message": "配置保存成功"}
 
 @router.get("/api/sync")
 async def sync_daily_data():
@@ -38,6 +50,7 @@ async def sync_daily_data():
         add_log("WARNING", "手动触发 TMDB 采集失败：未配置 API Key")
         return {"status": "error", "message": "未配置 TMDB API Key，请先在【TMDB与盘搜源配置】中填写！"}
         
+    if job_running("tmdb_sync"): return {"status": "error", "message": "已有 TMDB 同步任务正在运行，请稍后再试。"}
     add_log("INFO", "已检测到 TMDB API Key，后台马上开始采集数据...")
     from scheduler import sync_tmdb_data
     import asyncio
@@ -45,14 +58,20 @@ async def sync_daily_data():
     
     return {"status": "success", "message": "数据入库操作已马上启动，请留意系统运行日志！"}
 
+def _parse_media_cursor(cursor: str):
+    """游标格式为 "add_date|tmdb_id"，即上一页最后一条记录的排序键"""
+    try:
+        add_date, tmdb_id = cursor.split('|', 1)
+        return add_date, int(tmdb_id)
+    except (AttributeError, ValueError): return None
+
 @router.get("/api/local_media")
-async def get_local_media(type: str = 'hot', page: int = 1, size: int = 30):
+async def get_local_media(type: str = 'hot', page: int = 1, size: int = 30, cursor: Optional[str] = None):
     conn = get_db()
     today_str = datetime.date.today().isoformat()
     
     if type == 'hot':
-        c_q_today = "SELECT COUNT(*) FROM media_items WHERE add_date = ?"
-        today_count = conn.execute(c_q_today, (today_str,)).fetchone()[0]
+        today_count = count_media(conn, 'hot', today_str)
         
         if today_count == 0:
             conn.close() 
@@ -64,7 +83,7 @@ async def get_local_media(type: str = 'hot', page: int = 1, size: int = 30):
             conn = get_db() 
             
     elif type in ['movie', 'tv']:
-        total_count = conn.execute("SELECT COUNT(*) FROM media_items").fetchone()[0]
+        total_count = count_media(conn, 'all')
         if total_count < 10000: 
             conn.close()
             config = get_sys_config()
@@ -75,36 +94,87 @@ async def get_local_media(type: str = 'hot', page: int = 1, size: int = 30):
                 asyncio.create_task(sync_tmdb_data(force=True, mode="base"))
             conn = get_db()
 
-    offset = (page - 1) * size
-    sub_dict = {row['tmdb_id']: row['status'] for row in conn.execute("SELECT tmdb_id, status FROM subscriptions").fetchall()}
-    
-    if type == 'hot':
-        c_q, d_q = "SELECT COUNT(*) FROM media_items WHERE add_date = ?", "SELECT * FROM media_items WHERE add_date = ? ORDER BY add_date DESC, tmdb_id DESC LIMIT ? OFFSET ?"
-        p_c, p_d = (today_str,), (today_str, size, offset)
-    elif type == 'movie':
-        c_q, d_q = "SELECT COUNT(*) FROM media_items WHERE media_type='movie'", "SELECT * FROM media_items WHERE media_type='movie' ORDER BY add_date DESC, tmdb_id DESC LIMIT ? OFFSET ?"
-        p_c, p_d = (), (size, offset)
-    else:
-        c_q, d_q = "SELECT COUNT(*) FROM media_items WHERE media_type='tv'", "SELECT * FROM media_items WHERE media_type='tv' ORDER BY add_date DESC, tmdb_id DESC LIMIT ? OFFSET ?"
-        p_c, p_d = (), (size, offset)
-        
-    total = conn.execute(c_q, p_c).fetchone()[0]
-    rows = conn.execute(d_q, p_d).fetchall()
+    # 键集分页：携带游标时从上一页末尾继续做索引范围扫描，深翻页不再 OFFSET 扫描整表；无游标 (页码跳转) 时退回 OFFSET
+    if type == 'hot': where, params = "m.add_date = ?", [today_str]
+    else: where, params = "m.media_type = ?", ['movie' if type == 'movie' else 'tv']
+    keyset = _parse_media_cursor(cursor) if cursor else None
+    if keyset:
+        where += " AND (m.add_date, m.tmdb_id) < (?, ?)"
+        params += list(keyset)
+    # 订阅状态只为当前页的记录走 subscriptions.tmdb_id 唯一索引关联
+    d_q = f"""SELECT m.*, s.status AS sub_status FROM media_items m LEFT JOIN subscriptions s ON s.tmdb_id = m.tmdb_id
+              WHERE {where} ORDER BY m.add_date DESC, m.tmdb_id DESC LIMIT ?{'' if keyset else ' OFFSET ?'}"""
+    params += [size] if keyset else [size, (page - 1) * size]
+
+    total = count_media(conn, 'hot' if type == 'hot' else params[0], today_str)
+    rows = conn.execute(d_q, params).fetchall()
     conn.close()
     
-    return {"total": total, "items": [{**dict(row), 'sub_status': sub_dict.get(row['tmdb_id'])} for row in rows]}
+    items = [dict(row) for row in rows]
+    next_cursor = f"{items[-1]['add_date']}|{items[-1]['tmdb_id']}" if len(items) == size else None
+    return {"total": total, "items": items, "next_cursor": next_cursor}
+
+LOCAL_SEARCH_MIN_RESULTS = 5  # 本地命中少于该数量时才回退 TMDB 在线搜索
+
+# TMDB 在线搜索结果缓存：按 (规范化关键词, 语言) 缓存，订阅状态每次请求时单独补充，不进缓存
+tmdb_search_cache = TTLCache(maxsize=500, ttl=600)
+tmdb_search_shared = SharedVersion("tmdb_search")  # 其他 worker 保存配置后同样清空
+_search_inflight = {}
+
+def _normalize_query(query: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", query or "").casefold().split())
+
+async def _tmdb_search_multi(query: str, language: str) -> dict:
+    """同一关键词的并发请求只回源一次，成功的结果写入缓存"""
+    key = (_normalize_query(query), language)
+    if tmdb_search_shared.changed(): tmdb_search_cache.clear()
+    cached = tmdb_search_cache.get(key)
+    if cached is not None: return cached
+    task = _search_inflight.get(key)
+    if task is None:
+        async def fetch():
+            config = get_sys_config()
+            async with httpx.AsyncClient(timeout=FAST_FAIL_TIMEOUT) as client:
+                res = await resilient_request("tmdb", client, "GET", f"{config['api_domain']}/3/search/multi",
+                                              params={"api_key": config['api_key'], "query": key[0], "language": language})
+            if res.status_code != 200: raise HTTPException(status_code=502, detail=f"TMDB 搜索失败: HTTP {res.status_code}")
+            data = res.json()
+            tmdb_search_cache.set(key, data)
+            return data
+        task = _search_inflight[key] = asyncio.ensure_future(fetch())
+        task.add_done_callback(lambda _: _search_inflight.pop(key, None))
+    return await asyncio.shield(task)
+
+@router.get("/api/search/local")
+def search_local_media(query: str, page: int = 1, size: int = 20):
+    total, items = search_local(query, page, max(1, min(size, 100)))
+    return {"total": total, "items": items}
 
 @router.get("/api/search")
-async def search_tmdb(query: str):
-    config = get_sys_config()
-    async with httpx.AsyncClient() as client:
-        res = await client.get(f"{config['api_domain']}/3/search/multi", params={"api_key": config['api_key'], "query": query, "language": "zh-CN"})
-        data = res.json()
-        conn = get_db()
-        sub_dict = {row['tmdb_id']: row['status'] for row in conn.execute("SELECT tmdb_id, status FROM subscriptions").fetchall()}
-        conn.close()
-        for i in data.get('results', []): i['sub_status'] = sub_dict.get(i.get('id'))
-        return data
+async def search_tmdb(query: str, online: bool = False, language: str = "zh-CN"):
+    # 优先检索本地影视库，结果足够时不再请求 TMDB；online=true 时强制在线搜索
+    local_total, local_items = search_local(query, 1, 40)
+    local_results = [to_tmdb_result(i) for i in local_items]
+    if local_total >= LOCAL_SEARCH_MIN_RESULTS and not online:
+        return {"page": 1, "results": local_results, "total_results": local_total, "source": "local"}
+    if not _normalize_query(query): return {"page": 1, "results": local_results, "total_results": local_total, "source": "local"}
+    try: cached = await _tmdb_search_multi(query, language)
+    except Exception as e:
+        # 在线搜索失败时仍返回本地结果，不让整个页面报错
+        if local_results: return {"page": 1, "results": local_results, "total_results": local_total, "source": "local", "error": str(e)}
+        if isinstance(e, HTTPException): raise
+        raise HTTPException(status_code=502, detail=f"TMDB 搜索失败: {str(e)}")
+    online_results = cached.get('results', [])
+    # 订阅状态只按本次返回的 ID 走 subscriptions.tmdb_id 索引查询
+    ids = {i['id'] for i in online_results if isinstance(i.get('id'), int)}
+    conn = get_db()
+    sub_dict = {row['tmdb_id']: row['status'] for row in fetch_in_chunks(conn, "SELECT tmdb_id, status FROM subscriptions WHERE tmdb_id IN ({marks})", ids)}
+    conn.close()
+    # 本地结果排在前面，在线结果按 (类型, ID) 去重后补充在后；缓存中的原始结果不做修改
+    seen = {(i['media_type'], i['id']) for i in local_results}
+    data = {**cached, 'results': local_results + [{**i, 'sub_status': sub_dict.get(i.get('id'))} for i in online_results if (i.get('media_type'), i.get('id')) not in seen]}
+    data['source'] = 'mixed' if local_results else 'tmdb'
+    return data
 
 @router.post("/api/subscribe")
 def subscribe(media: SubscribeModel):
@@ -114,29 +184,37 @@ def subscribe(media: SubscribeModel):
         conn.close()
         return {"code": 409, "status": existing['status'], "message": "已存在"}
     today = datetime.date.today().isoformat()
-    conn.execute("INSERT OR REPLACE INTO media_items (tmdb_id, media_type, title, overview, poster_path, add_date) VALUES (?,?,?,?,?,?)", (media.tmdb_id, media.media_type, media.title, media.overview, media.poster_path, today))
-    if existing: conn.execute("UPDATE subscriptions SET status = 'pending', drive_type = ? WHERE tmdb_id = ?", (media.drive_type, media.tmdb_id))
+    upsert_media_items(conn, [(media.tmdb_id, media.media_type, media.title, media.overview, media.poster_path, today, media.year)])
+    if existing: conn.execute("UPDATE subscriptions SET status = 'pending', drive_type = ?, attempts = 0, last_error = NULL, next_retry_at = '' WHERE tmdb_id = ?", (media.drive_type, media.tmdb_id))
     else: conn.execute("INSERT INTO subscriptions (tmdb_id, status, drive_type) VALUES (?, 'pending', ?)", (media.tmdb_id, media.drive_type))
-    conn.commit(); conn.close()
+    conn.commit(); conn.close(); invalidate_media_counts()
     return {"code": 200, "message": "成功"}
 
 @router.post("/api/subscribe/batch")
 def batch_subscribe(data: BatchSubscribeModel):
-    conn = get_db(); today = datetime.date.today().isoformat(); count = 0
-    for media in data.items:
-        existing = conn.execute("SELECT status FROM subscriptions WHERE tmdb_id = ?", (media.tmdb_id,)).fetchone()
-        if existing and not media.force: continue
-        conn.execute("INSERT OR REPLACE INTO media_items (tmdb_id, media_type, title, overview, poster_path, add_date) VALUES (?,?,?,?,?,?)", (media.tmdb_id, media.media_type, media.title, media.overview, media.poster_path, today))
-        if existing: conn.execute("UPDATE subscriptions SET status = 'pending', drive_type = ? WHERE tmdb_id = ?", (media.drive_type, media.tmdb_id))
-        else: conn.execute("INSERT INTO subscriptions (tmdb_id, status, drive_type) VALUES (?, 'pending', ?)", (media.tmdb_id, media.drive_type))
-        count += 1
-    conn.commit(); conn.close()
-    return {"code": 200, "message": f"批量加入 {count} 个"}
+    # 集合化处理：一次 IN 查询取回已有订阅，再用 executemany 在同一事务中批量写入，耗时不再随条目数线性增长
+    today = datetime.date.today().isoformat()
+    medias = list({m.tmdb_id: m for m in data.items}.values())
+    if not medias: return {"code": 200, "message": "批量加入 0 个"}
+    conn = get_db()
+    try:
+        existing = {row['tmdb_id'] for row in fetch_in_chunks(conn, "SELECT tmdb_id FROM subscriptions WHERE tmdb_id IN ({marks})", [m.tmdb_id for m in medias])}
+        targets = [m for m in medias if m.force or m.tmdb_id not in existing]
+        upsert_media_items(conn, [(m.tmdb_id, m.media_type, m.title, m.overview, m.poster_path, today, m.year) for m in targets])
+        conn.executemany("UPDATE subscriptions SET status = 'pending', drive_type = ?, attempts = 0, last_error = NULL, next_retry_at = '' WHERE tmdb_id = ?",
+                         [(m.drive_type, m.tmdb_id) for m in targets if m.tmdb_id in existing])
+        conn.executemany("INSERT INTO subscriptions (tmdb_id, status, drive_type) VALUES (?, 'pending', ?)",
+                         [(m.tmdb_id, m.drive_type) for m in targets if m.tmdb_id not in existing])
+        conn.commit()
+    finally:
+        conn.close()
+    invalidate_media_counts()
+    return {"code": 200, "message": f"批量加入 {len(targets)} 个"}
 
 @router.get("/api/subscriptions")
 def get_subscriptions(status: str = 'pending'):
     conn = get_db()
-    rows = conn.execute("SELECT s.status, s.drive_type, m.* FROM subscriptions s JOIN media_items m ON s.tmdb_id = m.tmdb_id WHERE s.status = ? ORDER BY s.id DESC", (status,)).fetchall()
+    rows = conn.execute("SELECT s.status, s.drive_type, s.attempts, s.last_error, s.last_tried_at, s.next_retry_at, m.* FROM subscriptions s JOIN media_items m ON s.tmdb_id = m.tmdb_id WHERE s.status = ? ORDER BY s.id DESC", (status,)).fetchall()
     conn.close()
     return [dict(row) for row in rows]
 
@@ -158,8 +236,8 @@ async def search_ps(kw: str):
     c = get_sys_config()
     domain = c.get('pansou_domain', 'http://192.168.68.200:8080').rstrip('/')
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            res = await client.post(f"{domain}/api/search", json={"kw": kw})
+        async with httpx.AsyncClient(timeout=FAST_FAIL_TIMEOUT) as client:
+            res = await resilient_request("pansou", client, "POST", f"{domain}/api/search", retries=1, json={"kw": kw})
             d = res.json()
             return d.get("data") if d.get("code") == 0 else d
     except Exception as e: return {"error": f"无法连接: {str(e)}", "merged_by_type": {}}
@@ -184,32 +262,69 @@ async def api_save_link(req: SaveLinkModel):
             
         if success:
             conn = get_db(); today = datetime.date.today().isoformat()
-            conn.execute("INSERT OR REPLACE INTO media_items (tmdb_id, media_type, title, overview, poster_path, add_date) VALUES (?,?,?,?,?,?)", (req.tmdb_id, req.media_type, req.title, "", req.poster_path, today))
+            upsert_media_items(conn, [(req.tmdb_id, req.media_type, req.title, "", req.poster_path, today, None)])
             existing = conn.execute("SELECT status FROM subscriptions WHERE tmdb_id = ?", (req.tmdb_id,)).fetchone()
             if existing: conn.execute("UPDATE subscriptions SET status = 'success', drive_type = ? WHERE tmdb_id = ?", (req.drive_type, req.tmdb_id))
             else: conn.execute("INSERT INTO subscriptions (tmdb_id, status, drive_type) VALUES (?, 'success', ?)", (req.tmdb_id, req.drive_type))
-            conn.commit(); conn.close()
+            conn.commit(); conn.close(); invalidate_media_counts()
             return {"code": 200, "message": "转存成功！"}
         return {"code": 500, "message": f"失败: {msg}"}
     except Exception as e: return {"code": 500, "message": f"异常: {str(e)}"}
 
+def _format_quark_item(i: dict):
+    return {"id": i.get('fid'), "name": i.get('file_name'), "is_folder": i.get('file_type') == 0, "size": i.get('size', 0), "updated_at": datetime.datetime.fromtimestamp(i.get('updated_at', 0)/1000).strftime('%Y-%m-%d %H:%M:%S') if i.get('updated_at') else ""}
+
+def _format_aliyun_item(i: dict):
+    return {"id": i.get('file_id'), "name": i.get('name'), "is_folder": i.get('type') == 'folder', "size": i.get('size', 0), "updated_at": i.get('updated_at', '').replace('T', ' ').replace('Z', '')}
+
+# 目录列表缓存：(网盘, 账号凭据指纹, 目录ID, 游标, 页大小) -> (条目列表, next_cursor)
+# 来回点击面包屑时直接命中；经本系统发起的增删改会同步更新或失效对应目录
+drive_list_cache = TTLCache(maxsize=300, ttl=60)
+drive_list_shared = SharedVersion("drive_list")  # 其他 worker 改动网盘后整体失效 (无法得知具体目录)
+
+def _drive_account(config: dict, drive_type: str):
+    return hash(config.get('cookie_quark', '') if drive_type == 'quark' else config.get('token_aliyun', ''))
+
+def _invalidate_drive_dirs(drive_type: str, parent_ids=None):
+    """失效指定目录的全部分页；parent_ids 为空表示目录未知，整盘失效"""
+    targets = set(p for p in (parent_ids or []) if p)
+    drive_list_cache.discard_where(lambda k: k[0] == drive_type and (not targets or k[2] in targets))
+    drive_list_shared.bump()
+
+def _rename_in_cache(drive_type: str, parent_id: str, file_id: str, new_name: str):
+    """重命名不影响分页位置，直接改写缓存中的条目"""
+    for key in [k for k in drive_list_cache.keys() if k[0] == drive_type and k[2] == parent_id]:
+        cached = drive_list_cache.get(key)
+        if not cached: continue
+        for item in cached[0]:
+            if item["id"] == file_id: item["name"] = new_name
+    drive_list_shared.bump()
+
 @router.post("/api/drive/list")
 async def api_drive_list(req: DriveListReq):
+    # 游标分页：每次只返回一页，前端凭 next_cursor 继续加载，超大目录不再被截断也不会一次性塞满响应
     config = get_sys_config()
-    result = []
+    page_size = max(20, min(req.page_size or 100, 200))
+    parent_id = req.parent_id or ("0" if req.drive_type == 'quark' else "root")
+    cache_key = (req.drive_type, _drive_account(config, req.drive_type), parent_id, req.cursor or "", page_size)
+    if req.refresh: _invalidate_drive_dirs(req.drive_type, [parent_id])
+    if drive_list_shared.changed(): drive_list_cache.clear()
+    cached = drive_list_cache.get(cache_key)
+    if cached: return {"code": 200, "data": cached[0], "next_cursor": cached[1], "msg": "success", "cached": True}
     try:
         if req.drive_type == 'quark':
             api = QuarkDrive(config.get('cookie_quark', ''))
-            items, msg = await api.list_files(req.parent_id or "0")
-            for i in items:
-                result.append({"id": i.get('fid'), "name": i.get('file_name'), "is_folder": i.get('file_type') == 0, "size": i.get('size', 0), "updated_at": datetime.datetime.fromtimestamp(i.get('updated_at', 0)/1000).strftime('%Y-%m-%d %H:%M:%S') if i.get('updated_at') else ""})
+            items, next_cursor, msg = await api.list_page(req.parent_id or "0", req.cursor, page_size)
+            result = [_format_quark_item(i) for i in items]
         else:
             api = AliyunDrive(config.get('token_aliyun', ''))
-            items, msg = await api.list_files(req.parent_id or "root")
-            for i in items:
-                result.append({"id": i.get('file_id'), "name": i.get('name'), "is_folder": i.get('type') == 'folder', "size": i.get('size', 0), "updated_at": i.get('updated_at', '').replace('T', ' ').replace('Z', '')})
-        result.sort(key=lambda x: (not x['is_folder'], x['updated_at']), reverse=True)
-        return {"code": 200, "data": result, "msg": msg}
+            items, next_cursor, msg = await api.list_page(req.parent_id or "root", req.cursor, page_size)
+            result = [_format_aliyun_item(i) for i in items]
+        if msg != "success": return {"code": 500, "msg": msg}
+        # 排序完全由网盘接口完成 (见各自 list_page)，跨页保持一致，这里不能再按页重排：
+        # 夸克为 "目录在前、修改时间倒序"；阿里云接口不支持按类型排序，目录与文件统一按修改时间倒序
+        drive_list_cache.set(cache_key, (result, next_cursor))
+        return {"code": 200, "data": result, "next_cursor": next_cursor, "msg": msg}
     except Exception as e: return {"code": 500, "msg": str(e)}
 
 @router.post("/api/drive/action")
@@ -220,9 +335,30 @@ async def api_drive_action(req: DriveActionReq):
         if req.action == 'mkdir': success, msg = await api.make_dir(req.file_id, req.new_name)
         elif req.action == 'rename': success, msg = await api.rename(req.file_id, req.new_name)
         elif req.action == 'delete': success, msg = await api.delete(req.file_id)
+        if success:
+            if req.action == 'rename' and req.parent_id: _rename_in_cache(req.drive_type, req.parent_id, req.file_id, req.new_name)
+            elif req.action == 'mkdir': _invalidate_drive_dirs(req.drive_type, [req.file_id])
+            else: _invalidate_drive_dirs(req.drive_type, [req.parent_id] if req.parent_id else None)
         return {"code": 200 if success else 500, "msg": msg}
     except Exception as e: return {"code": 500, "msg": str(e)}
 
+@router.post("/api/drive/batch")
+async def api_drive_batch(req: DriveBatchReq):
+    if not req.ops: return {"code": 400, "msg": "未选择任何文件"}
+    config = get_sys_config()
+    api = QuarkDrive(config.get('cookie_quark', '')) if req.drive_type == 'quark' else AliyunDrive(config.get('token_aliyun', ''))
+    touched = [req.parent_id] + [op.to_parent_id for op in req.ops if op.action == 'move']
+    try: results = await api.batch([op.dict() for op in req.ops])
+    except Exception as e:
+        # 中途失败时部分操作可能已生效，保守地让相关目录缓存失效
+        _invalidate_drive_dirs(req.drive_type, touched if req.parent_id else None)
+        add_log("ERROR", f"🗂️ 【网盘批量操作】{req.drive_type} 执行异常: {str(e)}")
+        return {"code": 500, "msg": str(e)}
+    if any(r["success"] for r in results): _invalidate_drive_dirs(req.drive_type, touched if req.parent_id else None)
+    ok = sum(1 for r in results if r["success"])
+    if ok < len(results): add_log("WARNING", f"🗂️ 【网盘批量操作】{req.drive_type} 成功 {ok} 项，失败 {len(results) - ok} 项。")
+    return {"code": 200 if ok == len(results) else 207, "msg": f"成功 {ok} 项，失败 {len(results) - ok} 项", "data": results}
+
 # ==================== 115 扫码登录接口：带有最强抗风控头信息 ====================
 HEADERS_115 = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
@@ -257,21 +393,99 @@ async def log_115(p: QrcodeLoginModel):
             res_json = res.json()
             if res_json.get('state'):
                 ck = "; ".join(f"{k}={v}" for k, v in res_json['data']['cookie'].items())
-                conn = get_db()
-                conn.execute("REPLACE INTO system_configs (config_key, config_value) VALUES ('cookie_115', ?)", (ck,))
-                conn.commit()
-                conn.close()
+                set_sys_config({'cookie_115': ck})
                 return {"message": "成功"}
             raise HTTPException(status_code=400, detail="登录失败或二维码已过期")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/api/115/index/refresh")
+async def refresh_115_index():
+    if job_running("library_115"): return {"message": "115 本地资产索引正在重建中，请留意系统日志"}
+    from library_index import refresh_library_index
+    import asyncio
+    asyncio.create_task(refresh_library_index(force=True))
+    return {"message": "115 本地资产索引已开始后台重建，请留意系统日志"}
+
+@router.get("/api/115/index/status")
+def get_115_index_status():
+    conn = get_db()
+    total = conn.execute("SELECT COUNT(*) FROM library_115").fetchone()[0]
+    conn.close()
+    return {"total": total, "refreshed_at": get_sys_config().get('library_115_refreshed_at', '')}
+
 @router.get("/api/logs")
-def fetch_logs(): return get_logs(100)
+def fetch_logs(since_id: Optional[int] = None): return get_logs(100, since_id)
+
+@router.get("/api/logs/stream")
+async def stream_logs(request: Request, since_id: Optional[int] = None):
+    # 浏览器断线重连时 EventSource 会自动携带 Last-Event-ID，从断点继续补发
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit(): since_id = int(last_event_id)
+    return StreamingResponse(log_event_stream(request, since_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# ==================== 海报代理 ====================
+POSTER_CACHE_HEADERS = {"Cache-Control": "public, max-age=31536000, immutable"}
+
+@router.get("/api/poster/{size}/{name}")
+async def get_poster(size: str, name: str, request: Request):
+    if not poster_cache.is_valid_request(size, name): raise HTTPException(status_code=404, detail="海报不存在")
+    etag = poster_cache.etag_for(size, name)
+    if request.headers.get("if-none-match") == etag: return Response(status_code=304, headers={**POSTER_CACHE_HEADERS, "ETag": etag})
+    try:
+        path = await poster_cache.get_poster(size, name)
+        # 返回前文件可能刚被淘汰 (本进程或其他 worker)，缺失时重新拉取一次
+        if not os.path.isfile(path): path = await poster_cache.get_poster(size, name)
+    except Exception as e: raise HTTPException(status_code=502, detail=f"海报拉取失败: {str(e)}")
+    if not os.path.isfile(path): raise HTTPException(status_code=502, detail="海报拉取失败: 缓存文件缺失")
+    return FileResponse(path, headers={**POSTER_CACHE_HEADERS, "ETag": etag})
+
+# ==================== 任务运行报告 ====================
+@router.get("/api/reports")
+def fetch_job_reports(job_type: Optional[str] = None, target: Optional[str] = None, limit: int = 50):
+    # job_type: strm (target 为节点 ID) / tmdb_sync (target 为同步模式)
+    return {"code": 200, "data": list_reports(job_type, target, max(1, min(limit, 200)))}
+
+@router.get("/api/reports/{report_id}")
+def fetch_job_report(report_id: int):
+    report = get_report(report_id)
+    if not report: raise HTTPException(status_code=404, detail="报告不存在")
+    return {"code": 200, "data": report}
+
+# ==================== Prometheus 指标 ====================
+@metrics.register_collector
+def _subscription_queue():
+    now_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    conn = get_db()
+    by_status = conn.execute("SELECT status, COUNT(*) FROM subscriptions GROUP BY status").fetchall()
+    due = conn.execute("SELECT COUNT(*) FROM subscriptions WHERE status = 'pending' AND next_retry_at <= ?", (now_str,)).fetchone()[0]
+    conn.close()
+    return [("cinelink_subscriptions", "Subscriptions by status", ("status",), [((r[0] or 'unknown',), r[1]) for r in by_status]),
+            ("cinelink_subscriptions_due", "Pending subscriptions whose retry time has passed", (), [((), due)])]
+
+@metrics.register_collector
+def _circuit_state():
+    return [("cinelink_circuit_open", "1 while the provider circuit breaker rejects calls", ("provider",),
+             [((p,), 0 if is_available(p) else 1) for p in PROVIDER_SETTINGS])]
+
+@router.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@metrics.register_collector
+def _scheduler_leader():
+    return [("cinelink_scheduler_leader", "1 if this process currently runs the scheduled jobs", (), [((), 1 if is_leader() else 0)])]
 
 @router.post("/api/tasks/trigger")
 async def trigger_task():
+    # 任务锁跨进程生效：无论请求落在哪个 worker，同一时间只会有一轮订阅搜刮
+    if job_running("auto_subscription"): return {"message": "订阅搜刮任务正在运行中，请勿重复触发"}
     from scheduler import auto_subscription_task
     import asyncio
     asyncio.create_task(auto_subscription_task())
     return {"message": "启动成功"}
+
+@router.get("/api/tasks/leases")
+def get_task_leases():
+    return {"code": 200, "data": list_leases(), "leader": is_leader()}
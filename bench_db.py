@@ -0,0 +1,54 @@
+import os
+import sqlite3
+import tempfile
+import time
+import datetime
+import database
+
+# 模拟一次典型接口请求的数据库开销：读取系统配置 + 查询订阅 + 写入一条日志
+# 对比旧实现 (每次 sqlite3.connect、默认 DELETE 日志模式、synchronous=FULL) 与当前连接层
+
+def legacy_get_db():
+    conn = sqlite3.connect(database.DB_PATH)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def simulate_request(get_db):
+    conn = get_db()
+    {row['config_key']: row['config_value'] for row in conn.execute("SELECT config_key, config_value FROM system_configs")}
+    conn.close()
+    conn = get_db()
+    conn.execute("SELECT tmdb_id, status FROM subscriptions WHERE status = 'pending' LIMIT 20").fetchall()
+    conn.close()
+    conn = get_db()
+    conn.execute("INSERT INTO system_logs (level, message, created_at) VALUES (?, ?, ?)",
+                 ("INFO", "bench", datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+    conn.commit()
+    conn.close()
+
+def bench(get_db, rounds: int):
+    start = time.perf_counter()
+    for _ in range(rounds): simulate_request(get_db)
+    return (time.perf_counter() - start) / rounds * 1000
+
+def prepare(db_dir: str, name: str, wal: bool):
+    database.DB_DIR = db_dir
+    database.DB_PATH = os.path.join(db_dir, name)
+    database.init_db()
+    if not wal:
+        conn = sqlite3.connect(database.DB_PATH)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.close()
+
+if __name__ == '__main__':
+    rounds = int(os.environ.get("BENCH_ROUNDS", "300"))
+    with tempfile.TemporaryDirectory() as tmp:
+        prepare(tmp, "legacy.db", wal=False)
+        legacy_ms = bench(legacy_get_db, rounds)
+        prepare(tmp, "pooled.db", wal=True)
+        pooled_ms = bench(database.get_db, rounds)
+        database.close_thread_db()
+    print(f"📊 每轮模拟请求: 2 次查询 + 1 次日志写入，共 {rounds} 轮")
+    print(f"⏱️ 旧实现 (每次新建连接 / DELETE 日志 / synchronous=FULL): {legacy_ms:.3f} ms/请求")
+    print(f"⏱️ 新连接层 (线程复用 / WAL / synchronous=NORMAL):         {pooled_ms:.3f} ms/请求")
+    print(f"🚀 提升倍数: {legacy_ms / pooled_ms:.1f}x")
@@ -0,0 +1,64 @@
+import time
+from release_parser import parse_release, rank_candidates, load_profile
+
+# 真实资源名称语料 (盘搜 note 字段与常见 PT/网盘命名)，用于监控单条候选解析开销
+CORPUS = [
+    "流浪地球2 (2023) 4K HDR 杜比视界 国语中字 原盘REMUX",
+    "流浪地球2.The.Wandering.Earth.II.2023.2160p.WEB-DL.H265.HDR.DDP5.1-OurTV",
+    "The.Last.of.Us.S01E03.2160p.WEB-DL.DDP5.1.Atmos.DV.HDR.H.265-FLUX",
+    "The Last of Us S01 1080p AMZN WEBRip x265 10bit",
+    "狂飙 全39集 1080P 国语中字",
+    "狂飙.Knockout.2023.S01.Complete.2160p.WEB-DL.HEVC.AAC-HHWEB",
+    "Oppenheimer.2023.1080p.BluRay.x264-SPARKS",
+    "Oppenheimer 2023 UHD BluRay 2160p TrueHD Atmos 7.1 DV HEVC REMUX-FraMeSToR",
+    "奥本海默 HDTS 枪版 中字",
+    "奥本海默 Oppenheimer (2023) 4K 蓝光原盘 杜比视界",
+    "三体 第1季 第15集 4K",
+    "三体 Three-Body 2023 S01E30 2160p WEB-DL H.265 DDP5.1",
+    "繁花 第1季 全30集 1080P 沪语版",
+    "Dune.Part.Two.2024.2160p.UHD.BluRay.REMUX.DV.HDR10.HEVC.TrueHD.7.1.Atmos",
+    "沙丘2 2024 1080p WEB-DL 中英双字",
+    "Poor.Things.2023.720p.WEBRip.x264.AAC-YTS",
+    "封神第一部 2023 4K 60帧 高码率 国语",
+    "The.Bear.S03.1080p.HULU.WEB-DL.DDP5.1.H.264-NTb",
+    "熊家餐馆 第三季 S03 全10集 1080P 英语中字",
+    "Inception.2010.BDRip.1080p.x265.10bit",
+    "盗梦空间 Inception 2010 4K REMUX HDR10+",
+    "Spirited.Away.2001.1080p.BluRay.DTS.x264-HiDt",
+    "千与千寻 2001 日语 中字 DVD",
+    "漫长的季节 全12集 4K HDR 高码",
+    "Shogun.2024.S01E01.Anjin.2160p.DSNP.WEB-DL.DDP5.1.DV.HDR.H.265",
+    "幕府将军 2024 S01E01-E10 全集 1080P",
+    "Godzilla.Minus.One.2023.2160p.AV1.Opus-Tigole",
+    "哥斯拉-1.0 2023 HDCAM 抢先版",
+    "Breaking.Bad.Complete.Series.1080p.BluRay.x265",
+    "绝命毒师 全五季 1080P 蓝光 中英字幕",
+    "Frieren.S01E28.1080p.CR.WEB-DL.AAC2.0.H.264",
+    "葬送的芙莉莲 第28集 1080P 简繁内封",
+]
+
+def bench_parse(rounds: int = 2000):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for name in CORPUS:
+            parse_release(name)
+    elapsed = time.perf_counter() - start
+    return elapsed / (rounds * len(CORPUS)) * 1e6
+
+def bench_rank(rounds: int = 2000):
+    merged = {
+        "115": [{"url": f"https://115.com/s/{i}", "note": n} for i, n in enumerate(CORPUS[:12])],
+        "aliyun": [{"url": f"https://www.alipan.com/s/{i}", "note": n} for i, n in enumerate(CORPUS[12:22])],
+        "magnet": [{"url": f"magnet:?xt={i}", "note": n} for i, n in enumerate(CORPUS[22:])],
+    }
+    profile = load_profile()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        rank_candidates(merged, ["115", "aliyun", "ed2k", "magnet"], "奥本海默", profile=profile)
+    elapsed = time.perf_counter() - start
+    return elapsed / (rounds * len(CORPUS)) * 1e6
+
+if __name__ == '__main__':
+    print(f"📊 语料规模: {len(CORPUS)} 条资源名称")
+    print(f"⏱️ parse_release   单条平均耗时: {bench_parse():.2f} µs")
+    print(f"⏱️ rank_candidates 单条平均耗时: {bench_rank():.2f} µs (含打分与排序)")
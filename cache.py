@@ -0,0 +1,53 @@
+import time
+import threading
+from collections import OrderedDict
+
+# ==================== 进程内 LRU + TTL 缓存 ====================
+# 供分享会话、网盘目录列表、搜索结果等短期缓存复用。条目过期或超出容量时按最久未使用淘汰。
+
+_MISSING = object()
+
+class TTLCache:
+    def __init__(self, maxsize: int = 256, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING: return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize: self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+            return default if entry is _MISSING else entry[1]
+
+    def discard_where(self, predicate):
+        """按键批量失效，返回删除的条目数"""
+        with self._lock:
+            keys = [k for k in self._data if predicate(k)]
+            for k in keys: del self._data[k]
+            return len(keys)
+
+    def keys(self):
+        with self._lock: return list(self._data)
+
+    def clear(self):
+        with self._lock: self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
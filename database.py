@@ -1,87 +1,509 @@
 import sqlite3
 import os
+import asyncio
+import threading
+import time
+from metrics import SQLITE_LATENCY
 
 # 【核心修改1】将数据库存放于独立的 data 目录下，完美适配 Docker 目录挂载
 DB_DIR = "data"
 DB_PATH = os.path.join(DB_DIR, "tmdb_system.db")
 
-def init_db():
-    # 1. 自动创建数据库存放目录
-    if not os.path.exists(DB_DIR):
-        os.makedirs(DB_DIR, exist_ok=True)
-        
-    # 2. 防呆检测：如果之前被 Docker 错误挂载成了文件夹，给出明显提示
-    if os.path.isdir(DB_PATH):
-        raise Exception(f"致命错误：{DB_PATH} 被错误地创建为了文件夹！请删除宿主机上的同名文件夹并重新启动。")
+# ==================== 连接层：WAL + 每线程复用连接 ====================
+# Web 进程与 STRM 子进程会同时写库。WAL 模式下读写互不阻塞，synchronous=NORMAL 只在检查点时 fsync；
+# busy_timeout 让偶发的写冲突排队等待，而不是直接抛出 database is locked。
+BUSY_TIMEOUT_MS = 5000
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA cache_size=-16000",  # 约 16MB 页缓存
+    "PRAGMA mmap_size=134217728",  # 128MB 内存映射读
+    "PRAGMA temp_store=MEMORY",
+)
+STATEMENT_CACHE_SIZE = 256
+
+SQL_OPS = ("SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH")
+
+def _sql_op(sql: str) -> str:
+    head = sql.lstrip()[:7].upper()
+    for op in SQL_OPS:
+        if head.startswith(op): return op
+    return "OTHER"
+
+def _current_task():
+    try: return asyncio.current_task()
+    except RuntimeError: return None  # 不在事件循环中 (线程池 / 子进程)
+
+class TransactionSpansAwaitError(sqlite3.ProgrammingError):
+    """事件循环线程上的共享连接里，有协程在事务未提交时 await 让出了执行权"""
+
+class TimedCursor(sqlite3.Cursor):
+    """记录语句执行与结果读取耗时到 /metrics，并在执行前检查共享连接上的事务归属"""
+    def execute(self, sql, parameters=()):
+        self.connection.check_owner()
+        start = time.perf_counter()
+        try: return super().execute(sql, parameters)
+        finally:
+            SQLITE_LATENCY.observe(time.perf_counter() - start, _sql_op(sql))
+            self.connection.claim()
+
+    def executemany(self, sql, seq_of_parameters):
+        self.connection.check_owner()
+        start = time.perf_counter()
+        try: return super().executemany(sql, seq_of_parameters)
+        finally:
+            SQLITE_LATENCY.observe(time.perf_counter() - start, _sql_op(sql))
+            self.connection.claim()
+
+    def fetchall(self):
+        start = time.perf_counter()
+        try: return super().fetchall()
+        finally: SQLITE_LATENCY.observe(time.perf_counter() - start, "FETCH")
+
+class PooledConnection(sqlite3.Connection):
+    """
+    线程内复用的连接。业务代码沿用 get_db() ... conn.close() 的写法，
+    close() 只回滚未提交的事务，连接本身保留给同一线程的下一次 get_db()。
+
+    事件循环线程上的所有协程共享同一个连接，因此 async 函数中的写事务绝不能跨越 await：
+    写入 -> commit() 必须在两次 await 之间完成，否则其他协程的语句会混进同一个事务，
+    它们的 commit / close 也会提交或回滚这份写了一半的数据。事务开启时记下所属的 asyncio 任务，
+    其他任务在事务提交前使用该连接会抛出 TransactionSpansAwaitError，问题在开发阶段即可暴露。
+    """
+    _txn_task = None
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def check_owner(self):
+        if not self.in_transaction:
+            self._txn_task = None
+            return
+        task = _current_task()
+        if self._txn_task is not None and self._txn_task is not task:
+            raise TransactionSpansAwaitError(f"连接上有未提交的事务属于另一个协程 ({self._txn_task.get_name()})，写事务必须在 await 之前提交")
+
+    def claim(self):
+        if self.in_transaction and self._txn_task is None: self._txn_task = _current_task()
+
+    def commit(self):
+        self.check_owner()
+        super().commit()
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
 
-    # 3. 连接数据库（如果文件不存在，SQLite 会自动创建空 db 文件）
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
+    def close(self):
+        # 只回滚本协程自己的事务，不替另一个协程丢弃其尚未提交的写入
+        if self.in_transaction and self._txn_task in (None, _current_task()): self.rollback()
+        if not self.in_transaction: self._txn_task = None
+
+    def really_close(self):
+        super().close()
+
+_local = threading.local()
+
+def _connect():
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT_MS / 1000, factory=PooledConnection, cached_statements=STATEMENT_CACHE_SIZE)
+    for pragma in CONNECTION_PRAGMAS: conn.execute(pragma)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+# ==================== 版本化的表结构迁移 ====================
+# schema_version 记录已执行的迁移。启动时若库已是最新版本只需一次查询，不再逐条执行建表/ALTER。
+# 新增字段、索引或回填数据时，在 MIGRATIONS 末尾追加一个版本号更大的函数即可：
+# 待执行的迁移在同一个事务中按顺序执行，任何一步失败都会整体回滚。
+# 旧版本 (尚无 schema_version 表) 的数据库同样从 1 开始执行，各步骤均可在已有表上安全重放。
+# 新增默认配置项时也需追加一个迁移 (可以是空函数)，默认配置会在每次执行迁移后补齐。
+
+# 【核心修改2】将私人的虚拟模板数据全部置空，仅保留公共服务域名和系统开关状态
+DEFAULT_CONFIGS = [
+    ('api_key', ''), # 置空
+    ('api_domain', 'https://api.tmdb.org'), # 保留官方公共域名
+    ('image_domain', 'https://image.tmdb.org'), # 保留官方公共域名
+    ('pansou_domain', ''), # 置空
+    ('cookie_115', ''), 
+    ('cookie_quark', ''), 
+    ('token_aliyun', ''),
+    ('quark_save_dir', '0'), 
+    ('aliyun_save_dir', 'root'), 
+    ('cron_expression', '0 * * * *'), # 保留标准 Cron 表达式
+    ('cms_api_url', ''), # 置空
+    ('cms_api_token', ''), # 置空
+    ('last_sync_date', ''),
+    ('auto_subscribe_new', '0'), 
+    ('auto_subscribe_drive', '115'),
+    ('release_profile', ''),  # 资源择优规则 (JSON)，留空使用内置默认规则
+    ('library_115_cids', '0'),  # 115 本地索引需要遍历的目录 ID，多个用逗号分隔
+    ('library_115_ttl_hours', '12'),
+    ('library_115_refreshed_at', ''),
+    ('sub_max_attempts', '6'),  # 连续未找到资源达到该次数后标记为 not_found，不再自动重试
+    ('sub_retry_base_hours', '6'),  # 重试间隔基数，按 6h、12h、24h... 指数退避，最长 7 天
+    ('log_retention_rows', '20000'),  # 系统日志最多保留行数
+    ('log_retention_days', '7'),  # 系统日志最多保留天数
+    ('poster_cache_mb', '1024')  # 本地海报缓存容量上限 (MB)，超出后按最近访问时间淘汰
+]
+
+def _column_exists(cursor, table: str, column: str) -> bool:
+    return any(row[1] == column for row in cursor.execute(f"PRAGMA table_info({table})").fetchall())
+
+def _add_column(cursor, table: str, column_sql: str):
+    """仅在字段不存在时 ADD COLUMN (SQLite 只改表结构定义，不会重写已有数据)"""
+    if not _column_exists(cursor, table, column_sql.split()[0]):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column_sql}")
+
+def _m001_base_tables(cursor):
     cursor.execute('''CREATE TABLE IF NOT EXISTS system_configs (config_key VARCHAR(50) UNIQUE PRIMARY KEY, config_value VARCHAR(255))''')
     cursor.execute('''CREATE TABLE IF NOT EXISTS media_items (tmdb_id INTEGER PRIMARY KEY, media_type VARCHAR(20), title VARCHAR(255), overview TEXT, poster_path VARCHAR(255), add_date DATE)''')
     cursor.execute('''CREATE TABLE IF NOT EXISTS subscriptions (id INTEGER PRIMARY KEY AUTOINCREMENT, tmdb_id INTEGER UNIQUE, status VARCHAR(20) DEFAULT 'pending')''')
-    try:
-        cursor.execute("ALTER TABLE subscriptions ADD COLUMN drive_type VARCHAR(20) DEFAULT '115'")
-    except sqlite3.OperationalError:
-        pass 
+    _add_column(cursor, "subscriptions", "drive_type VARCHAR(20) DEFAULT '115'")
     cursor.execute('''CREATE TABLE IF NOT EXISTS system_logs (id INTEGER PRIMARY KEY AUTOINCREMENT, level VARCHAR(20), message TEXT, created_at DATETIME)''')
-    
-    # 【核心修改2】将私人的虚拟模板数据全部置空，仅保留公共服务域名和系统开关状态
-    default_configs = [
-        ('api_key', ''), # 置空
-        ('api_domain', 'https://api.tmdb.org'), # 保留官方公共域名
-        ('image_domain', 'https://image.tmdb.org'), # 保留官方公共域名
-        ('pansou_domain', ''), # 置空
-        ('cookie_115', ''), 
-        ('cookie_quark', ''), 
-        ('token_aliyun', ''),
-        ('quark_save_dir', '0'), 
-        ('aliyun_save_dir', 'root'), 
-        ('cron_expression', '0 * * * *'), # 保留标准 Cron 表达式
-        ('cms_api_url', ''), # 置空
-        ('cms_api_token', ''), # 置空
-        ('last_sync_date', ''),
-        ('auto_subscribe_new', '0'), 
-        ('auto_subscribe_drive', '115')
-    ]
-    cursor.executemany('INSERT OR IGNORE INTO system_configs (config_key, config_value) VALUES (?, ?)', default_configs)
-
     cursor.execute('''CREATE TABLE IF NOT EXISTS strm_configs (
                     id INTEGER PRIMARY KEY AUTOINCREMENT, config_name TEXT, url TEXT, username TEXT, 
                     password TEXT, rootpath TEXT, target_directory TEXT, download_enabled INTEGER DEFAULT 1,
                     update_mode TEXT DEFAULT 'incremental', download_interval_range TEXT DEFAULT '1-3')''')
-
     cursor.execute('''CREATE TABLE IF NOT EXISTS strm_settings (
                     id INTEGER PRIMARY KEY AUTOINCREMENT, video_formats TEXT, subtitle_formats TEXT,
                     image_formats TEXT, metadata_formats TEXT, size_threshold INTEGER DEFAULT 100, download_threads INTEGER DEFAULT 4)''')
-    
     # STRM 的扩展名属于系统必备通用配置，保留以确保开箱即用
-    cursor.execute("SELECT COUNT(*) FROM strm_settings")
-    if cursor.fetchone()[0] == 0:
+    if cursor.execute("SELECT 1 FROM strm_settings LIMIT 1").fetchone() is None:
         cursor.execute('''INSERT INTO strm_settings (video_formats, subtitle_formats, image_formats, metadata_formats, size_threshold, download_threads) 
             VALUES (?, ?, ?, ?, ?, ?)''', ('mp4,mkv,avi,mov,flv,wmv,ts,m2ts', 'srt,ass,sub', 'jpg,png,bmp', 'nfo', 100, 4))
-            
     cursor.execute('''CREATE TABLE IF NOT EXISTS strm_records (
                     id INTEGER PRIMARY KEY AUTOINCREMENT, config_id INTEGER, file_name TEXT, local_path TEXT,
                     created_at DATETIME DEFAULT CURRENT_TIMESTAMP)''')
     cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_strm_local_path ON strm_records(config_id, local_path)')
-
     cursor.execute('''CREATE TABLE IF NOT EXISTS strm_tasks (
                     id INTEGER PRIMARY KEY AUTOINCREMENT, task_name TEXT, 
                     config_id INTEGER, cron_expression TEXT, is_enabled INTEGER DEFAULT 1)''')
 
-    conn.commit()
-    conn.close()
+def _m002_subscription_retry(cursor):
+    # 订阅重试调度：失败次数、最近错误、最近尝试时间与下次可重试时间 ('' 表示立即可执行)
+    for column_sql in ["attempts INTEGER DEFAULT 0", "last_error TEXT", "last_tried_at DATETIME", "next_retry_at DATETIME DEFAULT ''"]:
+        _add_column(cursor, "subscriptions", column_sql)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_sub_status_retry ON subscriptions(status, next_retry_at)')
+
+def _m003_library_115(cursor):
+    cursor.execute('''CREATE TABLE IF NOT EXISTS library_115 (
+                    file_id TEXT PRIMARY KEY, parent_id TEXT, name TEXT, is_folder INTEGER DEFAULT 0,
+                    norm_title TEXT, folder_title TEXT, quality INTEGER DEFAULT 0, indexed_at DATETIME)''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_library_115_title ON library_115(norm_title, quality)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_library_115_folder ON library_115(folder_title, quality)')
+
+def _m004_media_indexes(cursor):
+    # 影视库分页：按类型/日期过滤并按 (add_date, tmdb_id) 倒序翻页，均可直接走索引范围扫描
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_media_type_date ON media_items(media_type, add_date, tmdb_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_media_date ON media_items(add_date, tmdb_id)')
+
+def _m005_media_fts(cursor):
+    # 本地全文检索：FTS5 trigram 索引 title/overview，触发器随 media_items 的写入自动同步
+    try:
+        cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS media_fts USING fts5(title, overview, tokenize='trigram')")
+    except sqlite3.OperationalError as e:
+        print(f"⚠️ 当前 SQLite 不支持 FTS5 trigram，本地搜索将退回 LIKE 匹配: {e}")
+        return
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS media_fts_ai AFTER INSERT ON media_items BEGIN
+                      INSERT OR REPLACE INTO media_fts (rowid, title, overview) VALUES (new.tmdb_id, new.title, new.overview); END''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS media_fts_au AFTER UPDATE OF title, overview ON media_items BEGIN
+                      INSERT OR REPLACE INTO media_fts (rowid, title, overview) VALUES (new.tmdb_id, new.title, new.overview); END''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS media_fts_ad AFTER DELETE ON media_items BEGIN
+                      DELETE FROM media_fts WHERE rowid = old.tmdb_id; END''')
+    # 为已有影视库补建索引
+    if cursor.execute("SELECT 1 FROM media_fts LIMIT 1").fetchone() is None:
+        cursor.execute("INSERT INTO media_fts (rowid, title, overview) SELECT tmdb_id, title, overview FROM media_items")
+
+def _m006_strm_record_counts(cursor):
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_strm_config_id ON strm_records(config_id, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_strm_created ON strm_records(created_at, id)')
+    # 各节点记录数在写入时由触发器维护，记录页不再对整表 COUNT(*)
+    cursor.execute('''CREATE TABLE IF NOT EXISTS strm_record_counts (config_id INTEGER PRIMARY KEY, total INTEGER DEFAULT 0)''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS strm_records_count_ai AFTER INSERT ON strm_records BEGIN
+                      INSERT INTO strm_record_counts (config_id, total) VALUES (new.config_id, 1)
+                      ON CONFLICT(config_id) DO UPDATE SET total = total + 1; END''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS strm_records_count_ad AFTER DELETE ON strm_records BEGIN
+                      UPDATE strm_record_counts SET total = total - 1 WHERE config_id = old.config_id; END''')
+    if cursor.execute("SELECT 1 FROM strm_record_counts LIMIT 1").fetchone() is None:
+        cursor.execute("INSERT INTO strm_record_counts (config_id, total) SELECT config_id, COUNT(*) FROM strm_records GROUP BY config_id")
+
+def _m007_job_reports(cursor):
+    # 任务运行报告：每次 STRM 生成 / TMDB 同步一行，report 为 JSON (阶段耗时、请求分位数、峰值等)
+    cursor.execute('''CREATE TABLE IF NOT EXISTS job_reports (id INTEGER PRIMARY KEY AUTOINCREMENT, job_type TEXT NOT NULL, target TEXT NOT NULL,
+                      status TEXT, started_at DATETIME, finished_at DATETIME, duration_sec REAL, report TEXT)''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_job_reports_target ON job_reports(job_type, target, id)')
+
+def _m008_leases(cursor):
+    # 跨进程租约 (调度主节点选举 / 任务互斥)，时间均为 Unix 时间戳
+    cursor.execute('''CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, holder TEXT NOT NULL,
+                      acquired_at REAL, heartbeat_at REAL, expires_at REAL NOT NULL)''')
+
+def _m009_media_fts_triggers(cursor):
+    # 经 ON CONFLICT DO UPDATE 触发的 INSERT OR REPLACE INTO media_fts 会报 constraint failed，
+    # 改为先按 rowid 删除旧索引再插入 (media_fts 自带内容存储，不能使用外部内容表的 'delete' 命令)
+    if cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'media_fts'").fetchone() is None: return
+    cursor.execute("DROP TRIGGER IF EXISTS media_fts_ai")
+    cursor.execute("DROP TRIGGER IF EXISTS media_fts_au")
+    cursor.execute('''CREATE TRIGGER media_fts_ai AFTER INSERT ON media_items BEGIN
+                      DELETE FROM media_fts WHERE rowid = new.tmdb_id;
+                      INSERT INTO media_fts (rowid, title, overview) VALUES (new.tmdb_id, new.title, new.overview); END''')
+    cursor.execute('''CREATE TRIGGER media_fts_au AFTER UPDATE OF title, overview ON media_items BEGIN
+                      DELETE FROM media_fts WHERE rowid = old.tmdb_id;
+                      INSERT INTO media_fts (rowid, title, overview) VALUES (new.tmdb_id, new.title, new.overview); END''')
+
+def _m010_media_year(cursor):
+    # 上映/首播年份，自动订阅择优时用于排除同名的其他作品
+    _add_column(cursor, "media_items", "year INTEGER")
+
+def _m011_cache_versions(cursor):
+    # 跨进程缓存版本号：多 worker 部署时各进程据此发现其他进程的写入并丢弃本地缓存
+    cursor.execute("CREATE TABLE IF NOT EXISTS cache_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)")
+
+def _m012_library_115_fts(cursor):
+    # 115 索引的子串匹配 ("[4K]流浪地球" 这类标题前带标签的文件名) 走 trigram 索引，不再对整表做 instr 扫描。
+    # 刷新索引改用 ON CONFLICT DO UPDATE 写入，行的 rowid 保持不变 (库内不执行 VACUUM)，由触发器按 rowid 同步
+    try:
+        cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS library_115_fts USING fts5(norm_title, folder_title, tokenize='trigram')")
+    except sqlite3.OperationalError as e:
+        print(f"⚠️ 当前 SQLite 不支持 FTS5 trigram，115 索引的子串匹配将退回全表扫描: {e}")
+        return
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS library_115_fts_ai AFTER INSERT ON library_115 BEGIN
+                      DELETE FROM library_115_fts WHERE rowid = new.rowid;
+                      INSERT INTO library_115_fts (rowid, norm_title, folder_title) VALUES (new.rowid, new.norm_title, new.folder_title); END''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS library_115_fts_au AFTER UPDATE OF norm_title, folder_title ON library_115 BEGIN
+                      DELETE FROM library_115_fts WHERE rowid = old.rowid;
+                      INSERT INTO library_115_fts (rowid, norm_title, folder_title) VALUES (new.rowid, new.norm_title, new.folder_title); END''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS library_115_fts_ad AFTER DELETE ON library_115 BEGIN
+                      DELETE FROM library_115_fts WHERE rowid = old.rowid; END''')
+    cursor.execute("DELETE FROM library_115_fts")
+    cursor.execute("INSERT INTO library_115_fts (rowid, norm_title, folder_title) SELECT rowid, norm_title, folder_title FROM library_115")
+
+MIGRATIONS = [
+    (1, "基础数据表", _m001_base_tables),
+    (2, "订阅重试调度字段", _m002_subscription_retry),
+    (3, "115 本地资产索引", _m003_library_115),
+    (4, "影视库分页索引", _m004_media_indexes),
+    (5, "影视库全文检索", _m005_media_fts),
+    (6, "STRM 记录索引与计数", _m006_strm_record_counts),
+    (7, "任务运行报告", _m007_job_reports),
+    (8, "跨进程租约", _m008_leases),
+    (9, "修复全文检索同步触发器", _m009_media_fts_triggers),
+    (10, "影视年份字段", _m010_media_year),
+    (11, "跨进程缓存版本号", _m011_cache_versions),
+    (12, "115 索引全文检索", _m012_library_115_fts),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def _current_version(conn) -> int:
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'").fetchone() is None: return 0
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+def migrate(conn):
+    """执行所有未应用的迁移，返回本次应用的版本号列表"""
+    if _current_version(conn) >= SCHEMA_VERSION: return []
+    # BEGIN IMMEDIATE 先拿到写锁，多个进程同时启动时只有一个会真正执行迁移
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute('''CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY, description TEXT, applied_at DATETIME, duration_ms REAL)''')
+        current = _current_version(conn)
+        applied = []
+        cursor = conn.cursor()
+        for version, description, func in MIGRATIONS:
+            if version <= current: continue
+            start = time.perf_counter()
+            func(cursor)
+            conn.execute("INSERT INTO schema_version (version, description, applied_at, duration_ms) VALUES (?, ?, datetime('now', 'localtime'), ?)",
+                         (version, description, round((time.perf_counter() - start) * 1000, 1)))
+            applied.append(version)
+        if applied: conn.executemany('INSERT OR IGNORE INTO system_configs (config_key, config_value) VALUES (?, ?)', DEFAULT_CONFIGS)
+        conn.execute("COMMIT")
+        return applied
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+def init_db():
+    """准备数据库，返回 {"version", "applied", "elapsed_ms"} 供启动日志输出"""
+    start = time.perf_counter()
+    # 1. 自动创建数据库存放目录
+    if not os.path.exists(DB_DIR):
+        os.makedirs(DB_DIR, exist_ok=True)
+        
+    # 2. 防呆检测：如果之前被 Docker 错误挂载成了文件夹，给出明显提示
+    if os.path.isdir(DB_PATH):
+        raise Exception(f"致命错误：{DB_PATH} 被错误地创建为了文件夹！请删除宿主机上的同名文件夹并重新启动。")
+
+    # 3. 连接数据库（如果文件不存在，SQLite 会自动创建空 db 文件）；手动管理事务，迁移整体在一个事务内完成
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+    try:
+        if conn.execute("PRAGMA journal_mode").fetchone()[0] != "wal":
+            conn.execute("PRAGMA journal_mode=WAL")  # WAL 模式写入库文件后持久生效
+        applied = migrate(conn)
+    finally:
+        conn.close()
+    return {"version": SCHEMA_VERSION, "applied": applied, "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)}
 
 def get_db():
     # 【核心修改3】这里必须使用 DB_PATH 变量！(之前旧代码这里写死的是 'tmdb_system.db'，导致了您的报错)
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    # 同一线程 (包括事件循环线程上的所有协程) 共享一个连接；进程 fork 或库路径变化后重新建立
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.key != (os.getpid(), DB_PATH):
+        conn = _connect()
+        _local.conn, _local.key = conn, (os.getpid(), DB_PATH)
     return conn
 
-def get_sys_config():
+def close_thread_db():
+    """显式释放当前线程的连接 (进程退出或测试切换库文件时使用)"""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.really_close()
+        _local.conn = None
+
+# ==================== 跨进程缓存失效 ====================
+# uvicorn 多 worker 时每个进程各有一份内存缓存。写入方提交后调用 bump()，把 cache_versions 中的版本号加一；
+# 读取方在使用本地缓存前调用 changed()，距上次检查不足 CACHE_CHECK_INTERVAL 秒时直接返回 False，
+# 否则做一次主键查询，版本号与上次看到的不同就说明其他进程改过数据，调用方应丢弃本地缓存。
+# 每个缓存持有各自的 SharedVersion 实例 (同名实例共享版本号，但各自记录看到的值)。
+CACHE_CHECK_INTERVAL = 2.0
+
+class SharedVersion:
+    def __init__(self, name: str):
+        self.name = name
+        self.seen = None
+        self.checked_at = 0.0
+
+    def _read(self) -> int:
+        conn = get_db()
+        # 读路径上随时可能被调用，调用方若有未提交的事务，不能因 close() 被回滚
+        owned = not conn.in_transaction
+        try:
+            row = conn.execute("SELECT version FROM cache_versions WHERE name = ?", (self.name,)).fetchone()
+            return row[0] if row else 0
+        except sqlite3.OperationalError: return 0  # 迁移尚未执行
+        finally:
+            if owned: conn.close()
+
+    def mark(self):
+        """加载缓存前调用，记下此刻的版本号"""
+        self.seen, self.checked_at = self._read(), time.monotonic()
+
+    def changed(self) -> bool:
+        if self.seen is not None and time.monotonic() - self.checked_at < CACHE_CHECK_INTERVAL: return False
+        previous = self.seen
+        self.mark()
+        return previous is None or previous != self.seen
+
+    def bump(self):
+        """调用方事务未提交时随该事务一起提交，否则单独提交"""
+        conn = get_db()
+        owned = not conn.in_transaction
+        try:
+            conn.execute("INSERT INTO cache_versions (name, version) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET version = version + 1", (self.name,))
+            version = conn.execute("SELECT version FROM cache_versions WHERE name = ?", (self.name,)).fetchone()[0]
+            # 期间没有其他进程写入时，本进程自己的这次递增无需再触发一次本地失效
+            if self.seen is not None and version == self.seen + 1: self.seen = version
+            if owned: conn.commit()
+        except sqlite3.OperationalError: pass
+        finally:
+            if owned: conn.close()
+
+# ==================== 系统配置缓存 ====================
+# 配置整表常驻内存，读取只是一次字典拷贝。所有写 system_configs 的地方提交后调用 invalidate_sys_config()
+# (或直接使用 set_sys_config)；版本号保证失效前开始的加载不会把旧值写回缓存。
+# 其他进程写入的配置通过 cache_versions 感知，最迟 CACHE_CHECK_INTERVAL 秒后生效。
+_config_lock = threading.Lock()
+_config_cache = None
+_config_version = 0
+_config_shared = SharedVersion("sys_config")
+
+def _load_sys_config():
+    global _config_cache
+    with _config_lock: version = _config_version
+    _config_shared.mark()
     conn = get_db()
     rows = conn.execute("SELECT config_key, config_value FROM system_configs").fetchall()
     conn.close()
-    return {row['config_key']: row['config_value'] for row in rows}
+    data = {row['config_key']: row['config_value'] for row in rows}
+    with _config_lock:
+        if version == _config_version: _config_cache = data
+    return data
+
+def get_sys_config():
+    """返回配置字典的副本。长时间运行的任务应在开始时取一次，整个作业期间使用同一份配置"""
+    with _config_lock: cached = _config_cache
+    if cached is not None and not _config_shared.changed(): return dict(cached)
+    if cached is not None: _drop_sys_config()
+    return _load_sys_config()
+
+def _drop_sys_config():
+    global _config_cache, _config_version
+    with _config_lock:
+        _config_version += 1
+        _config_cache = None
+
+def invalidate_sys_config():
+    _drop_sys_config()
+    _config_shared.bump()
+
+# ==================== 影视库计数缓存 ====================
+# 分页总数按过滤条件缓存，影视库写入 (TMDB 同步、订阅入库) 后调用 invalidate_media_counts()
+_media_counts = {}
+_media_counts_shared = SharedVersion("media_counts")
+
+def count_media(conn, media_filter: str, today_str: str = None) -> int:
+    key = (media_filter, today_str if media_filter == 'hot' else None)
+    if _media_counts_shared.changed(): _media_counts.clear()
+    if key not in _media_counts:
+        if media_filter == 'hot': sql, params = "SELECT COUNT(*) FROM media_items WHERE add_date = ?", (today_str,)
+        elif media_filter in ('movie', 'tv'): sql, params = "SELECT COUNT(*) FROM media_items WHERE media_type = ?", (media_filter,)
+        else: sql, params = "SELECT COUNT(*) FROM media_items", ()
+        _media_counts[key] = conn.execute(sql, params).fetchone()[0]
+    return _media_counts[key]
+
+def invalidate_media_counts():
+    _media_counts.clear()
+    _media_counts_shared.bump()
+
+# ==================== 批量写入工具 ====================
+SQL_VARIABLE_CHUNK = 900  # 单条 IN 查询的参数上限，兼容旧版 SQLite 的 999 个变量限制
+
+# 仅在内容确实变化时才改写行，未变化的记录不产生写入，也不会触发全文索引更新；
+# year 为空 (前端订阅未带年份) 时保留库中已有的年份
+MEDIA_UPSERT_SQL = '''INSERT INTO media_items (tmdb_id, media_type, title, overview, poster_path, add_date, year) VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(tmdb_id) DO UPDATE SET media_type = excluded.media_type, title = excluded.title, overview = excluded.overview,
+        poster_path = excluded.poster_path, add_date = excluded.add_date, year = COALESCE(excluded.year, media_items.year)
+    WHERE media_items.media_type IS NOT excluded.media_type OR media_items.title IS NOT excluded.title
+       OR media_items.overview IS NOT excluded.overview OR media_items.poster_path IS NOT excluded.poster_path
+       OR media_items.add_date IS NOT excluded.add_date OR (excluded.year IS NOT NULL AND media_items.year IS NOT excluded.year)'''
+
+def upsert_media_items(conn, rows):
+    """
+    rows: [(tmdb_id, media_type, title, overview, poster_path, add_date, year)]，由调用方负责提交事务。
+    返回本次新入库或更换了海报的 poster_path 列表 (供海报预热使用，库中已有的海报不再重复预取)
+    """
+    rows = list(rows)
+    existing = dict(fetch_in_chunks(conn, "SELECT tmdb_id, poster_path FROM media_items WHERE tmdb_id IN ({marks})", {row[0] for row in rows}))
+    conn.executemany(MEDIA_UPSERT_SQL, rows)
+    return [row[4] for row in rows if row[4] and existing.get(row[0]) != row[4]]
+
+def fetch_in_chunks(conn, sql_template: str, values, chunk_size: int = SQL_VARIABLE_CHUNK):
+    """按块执行 IN 查询，sql_template 中以 {marks} 占位"""
+    values = list(values)
+    rows = []
+    for i in range(0, len(values), chunk_size):
+        chunk = values[i:i + chunk_size]
+        rows.extend(conn.execute(sql_template.format(marks=','.join('?' * len(chunk))), chunk).fetchall())
+    return rows
+
+def set_sys_config(items):
+    """写入一组配置 (dict 或 (key, value) 列表) 并在提交后使缓存失效"""
+    pairs = list(items.items()) if isinstance(items, dict) else list(items)
+    conn = get_db()
+    try:
+        conn.executemany("REPLACE INTO system_configs (config_key, config_value) VALUES (?, ?)", pairs)
+        conn.commit()
+    finally:
+        conn.close()
+        invalidate_sys_config()
@@ -1,12 +1,133 @@
 import httpx
+import asyncio
 import datetime
 import random
 import re
+import time
+from database import get_db, invalidate_sys_config
+from logger import add_log
+from resilience import resilient_request
+from cache import TTLCache
+
+LIST_PAGE_SIZE = 100
+BATCH_SIZE = 100  # 夸克 filelist 与阿里云 /v3/batch 单次最多提交 100 项
+BATCH_CONCURRENCY = 3
+
+# 分享会话缓存：(渠道, 分享ID, 提取码) -> {"token": stoken/share_token, "root": 根目录列表}
+# 有效期短于两家 Token 的实际寿命 (夸克 stoken 约 30 分钟，阿里云 share_token 2 小时)；上游拒绝时立即淘汰
+SHARE_SESSION_TTL = 600
+share_sessions = TTLCache(maxsize=256, ttl=SHARE_SESSION_TTL)
 
 def _safe_json(res):
     try: return res.json()
     except: return {"code": -999, "message": f"HTTP {res.status_code}"}
 
+async def iter_pages(fetch_page, cursor=None):
+    """
+    通用分页异步迭代器。fetch_page(cursor) 返回 (items, next_cursor, msg)。
+    消费当前页的同时已在后台预取下一页 (read-ahead)，翻页等待被隐藏在处理当前页的时间里。
+    """
+    task = asyncio.ensure_future(fetch_page(cursor))
+    try:
+        while task:
+            items, next_cursor, msg = await task
+            if msg != "success": raise Exception(msg)
+            task = asyncio.ensure_future(fetch_page(next_cursor)) if next_cursor else None
+            for item in items: yield item
+    finally:
+        if task and not task.done(): task.cancel()
+
+# ==========================================
+# 批量文件操作：按渠道上限分块，块之间并发执行
+# ==========================================
+def chunked(items: list, size: int = BATCH_SIZE):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def _op_result(op: dict, success: bool, msg: str):
+    return {"file_id": op.get("file_id"), "action": op.get("action"), "success": success, "msg": msg}
+
+async def run_chunks(jobs: list, concurrency: int = BATCH_CONCURRENCY):
+    """并发执行 [(chunk, worker)]，worker(chunk) 返回逐项结果列表；单块异常只影响该块内的条目"""
+    sem = asyncio.Semaphore(concurrency)
+
+    async def guarded(chunk, worker):
+        async with sem:
+            try: return await worker(chunk)
+            except Exception as e: return [_op_result(op, False, str(e)) for op in chunk]
+
+    results = []
+    for part in await asyncio.gather(*(guarded(c, w) for c, w in jobs)): results.extend(part)
+    return results
+
+# ==========================================
+# 分享目录树展开与转存选择 (夸克 / 阿里云通用)
+# ==========================================
+VALID_VIDEO_EXTS = (
+    '.mp4', '.mkv', '.avi', '.mov', '.flv', '.wmv', '.ts', '.m2ts', 
+    '.rmvb', '.iso', '.vob', '.webm', '.srt', '.ass', '.sub', '.nfo'
+)
+SUBTITLE_EXTS = ('.srt', '.ass', '.ssa', '.sub', '.idx', '.sup', '.nfo')
+BAIT_KEYWORDS = ('公众号', '关注', '更多资源', '最新资源', '最新地址', '扫码', '加群', '群号', '广告', '防失联', '免费领', '微信')
+MIN_VIDEO_BYTES = 20 * 1024 * 1024  # 小于 20MB 的"视频"基本都是引流短片
+SHARE_WALK_DEPTH = 4
+SHARE_WALK_CONCURRENCY = 4
+
+def is_wanted_file(name: str, size: int) -> bool:
+    lower = (name or '').lower()
+    is_subtitle = lower.endswith(SUBTITLE_EXTS)
+    if not is_subtitle and not lower.endswith(VALID_VIDEO_EXTS): return False  # 压缩包、图片、txt/url 等一律跳过
+    if any(k in lower for k in BAIT_KEYWORDS): return False
+    if not is_subtitle and size and size < MIN_VIDEO_BYTES: return False
+    return True
+
+async def expand_share_tree(items: list, list_children, is_folder, max_depth: int = SHARE_WALK_DEPTH, concurrency: int = SHARE_WALK_CONCURRENCY):
+    """并发、限深地展开分享目录树。信号量只包住单次列表请求，递归本身不占用并发名额。"""
+    sem = asyncio.Semaphore(concurrency)
+
+    async def build(item, depth):
+        node = {"item": item, "children": None}
+        if is_folder(item) and depth < max_depth:
+            async with sem: children = await list_children(item)
+            node["children"] = await asyncio.gather(*(build(c, depth + 1) for c in children))
+        return node
+
+    return await asyncio.gather(*(build(i, 0) for i in items))
+
+def plan_share_transfer(nodes: list, is_folder, name_of, size_of):
+    """
+    选出需要转存的条目，返回 ([(条目, 相对目录)], 选中文件数, 跳过文件数)。
+    若某个目录下的内容全部符合要求则整体转存该目录，否则只转存其中符合要求的子目录与文件，
+    并记录它们所在的相对目录 (目录名元组)，转存时在目标目录下按原层级重建，避免同名文件互相覆盖。
+    """
+    def visit(node, path):
+        item = node["item"]
+        if not is_folder(item):
+            wanted = is_wanted_file(name_of(item), size_of(item))
+            return ([(item, path)] if wanted else []), wanted, int(wanted), int(not wanted)
+        if node["children"] is None:  # 超出遍历深度，无法确认内容，保守跳过
+            return [], False, 0, 1
+        picked, clean, selected, skipped = [], True, 0, 0
+        for child in node["children"]:
+            p, c, s, k = visit(child, path + (name_of(item),))
+            picked += p; clean = clean and c; selected += s; skipped += k
+        if clean and selected: return [(item, path)], True, selected, skipped
+        return picked, clean, selected, skipped
+
+    picked, selected, skipped = [], 0, 0
+    for node in nodes:
+        p, _, s, k = visit(node, ())
+        picked += p; selected += s; skipped += k
+    return picked, selected, skipped
+
+async def make_dir_tree(paths, root: str, create_dir):
+    """按相对目录逐级创建 (或复用) 目标目录，返回 {相对目录: 目录ID}。create_dir(父目录ID, 名称) 返回新目录ID"""
+    dir_ids = {(): root}
+    for path in paths:
+        for depth in range(1, len(path) + 1):
+            if path[:depth] not in dir_ids:
+                dir_ids[path[:depth]] = await create_dir(dir_ids[path[:depth - 1]], path[depth - 1])
+    return dir_ids
+
 # ==========================================
 # 夸克网盘 API 核心引擎 (纯享转存版)
 # ==========================================
@@ -28,70 +149,245 @@ class QuarkDrive:
         req_headers = self.headers.copy()
         req_headers["referer"] = f"https://pan.quark.cn/s/{pwd_id}"
         async with httpx.AsyncClient(timeout=self.timeout) as client:
-            res = await client.post("https://pan.quark.cn/1/clouddrive/share/sharepage/token", json={"pwd_id": pwd_id, "passcode": passcode}, headers=req_headers)
+            res = await resilient_request("quark", client, "POST", "https://pan.quark.cn/1/clouddrive/share/sharepage/token", json={"pwd_id": pwd_id, "passcode": passcode}, headers=req_headers)
             data = _safe_json(res)
             if data.get("code") != 0: return None, data.get("message", "解析失败")
             return data.get("data", {}).get("stoken"), "success"
 
-    async def get_share_file_list(self, pwd_id: str, stoken: str, pdir_fid: str = "0"):
+    async def get_share_file_list(self, pwd_id: str, stoken: str, pdir_fid: str = "0", client: httpx.AsyncClient = None):
+        """分页读取分享内某个目录的全部条目"""
+        if client is None:
+            async with httpx.AsyncClient(timeout=self.timeout) as own_client:
+                return await self.get_share_file_list(pwd_id, stoken, pdir_fid, own_client)
         req_headers = self.headers.copy()
         req_headers["referer"] = f"https://pan.quark.cn/s/{pwd_id}"
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            res = await client.get(f"https://pan.quark.cn/1/clouddrive/share/sharepage/detail?pwd_id={pwd_id}&stoken={stoken}&pdir_fid={pdir_fid}", headers=req_headers)
+        items, page = [], 1
+        while True:
+            params = {"pwd_id": pwd_id, "stoken": stoken, "pdir_fid": pdir_fid, "_page": page, "_size": LIST_PAGE_SIZE, "_fetch_total": 1}
+            res = await resilient_request("quark", client, "GET", "https://pan.quark.cn/1/clouddrive/share/sharepage/detail", params=params, headers=req_headers)
             data = _safe_json(res)
             if data.get("code") != 0: return None, data.get("message", "获取失败")
-            return data.get("data", {}).get("list", []), "success"
+            batch = data.get("data", {}).get("list", [])
+            items.extend(batch)
+            total = int(data.get("metadata", {}).get("_total", 0) or 0)
+            if not batch or len(items) >= total: return items, "success"
+            page += 1
+
+    async def open_share(self, pwd_id: str, passcode: str = "", client: httpx.AsyncClient = None):
+        """获取分享会话 (stoken + 根目录列表)，命中缓存时不产生任何请求"""
+        key = ("quark", pwd_id, passcode or "")
+        session = share_sessions.get(key)
+        if session: return session, "success"
+        stoken, msg = await self.get_share_token(pwd_id, passcode)
+        if not stoken: return None, f"夸克解析失败: {msg}"
+        file_list, msg = await self.get_share_file_list(pwd_id, stoken, "0", client)
+        if file_list is None: return None, f"获取文件列表失败: {msg}"
+        session = {"token": stoken, "root": file_list}
+        share_sessions.set(key, session)
+        return session, "success"
 
     async def save_share(self, share_url: str, passcode: str = "", save_dir: str = "0"):
         if not self.cookie: return False, "未配置夸克Cookie"
         pwd_id = self._extract_pwd_id(share_url)
-        if not pwd_id: return False, "无法解析"
-        stoken, msg = await self.get_share_token(pwd_id, passcode)
-        if not stoken: return False, msg
-        file_list, msg = await self.get_share_file_list(pwd_id, stoken, "0")
-        if not file_list: return False, msg
-        
-        fid_list = [f["fid"] for f in file_list]
-        fid_token_list = [f["share_fid_token"] for f in file_list]
+        if not pwd_id: return False, "无法解析夸克分享链接"
+
         req_headers = self.headers.copy()
         req_headers["referer"] = f"https://pan.quark.cn/s/{pwd_id}"
-        payload = {
-            "fid_list": fid_list, "fid_token_list": fid_token_list, 
-            "to_pdir_fid": save_dir.split('-')[0].strip(), 
-            "pwd_id": pwd_id, "stoken": stoken, "pdir_fid": "0", "scene": "link"
-        }
-        
+        key = ("quark", pwd_id, passcode or "")
         async with httpx.AsyncClient(timeout=self.timeout) as client:
             try:
-                res = await client.post("https://drive-pc.quark.cn/1/clouddrive/share/sharepage/save", params=self._get_base_params(), json=payload, headers=req_headers)
-                if _safe_json(res).get("code") == 0: return True, "转存成功"
-                return False, _safe_json(res).get("message", "转存被拒绝")
-            except Exception as e: return False, str(e)
+                session, msg = await self.open_share(pwd_id, passcode, client)
+                if not session: return False, msg
+                stoken, file_list = session["token"], session["root"]
+                if not file_list: return False, "分享内无文件或为空目录"
 
-    async def list_files(self, dir_fid: str = "0"):
+                async def list_children(folder):
+                    children, msg = await self.get_share_file_list(pwd_id, stoken, folder["fid"], client)
+                    if children is None: raise Exception(f"读取分享子目录失败: {msg}")
+                    return children
+                is_folder = lambda f: f.get("file_type") == 0 or f.get("dir") is True
+                tree = await expand_share_tree(file_list, list_children, is_folder)
+                picked, selected, skipped = plan_share_transfer(tree, is_folder, lambda f: f.get("file_name", ""), lambda f: f.get("size", 0))
+                if not picked: return False, "分享链接内未找到视频格式文件 (可能为压缩包或无关引流文件)"
+
+                # 转存接口要求同一批条目属于同一个分享目录，按 (父目录, 目标相对目录) 分组提交
+                groups = {}
+                for f, path in picked: groups.setdefault((f.get("pdir_fid", "0"), path), []).append(f)
+                root = save_dir.split('-')[0].strip() if save_dir else "0"
+                dir_ids = await make_dir_tree([path for _, path in groups], root, lambda parent, name: self._ensure_dir(client, parent, name))
+                for (pdir_fid, path), group in groups.items():
+                    payload = {
+                        "fid_list": [f["fid"] for f in group], "fid_token_list": [f["share_fid_token"] for f in group],
+                        "to_pdir_fid": dir_ids[path],
+                        "pwd_id": pwd_id, "stoken": stoken, "pdir_fid": pdir_fid, "scene": "link"
+                    }
+                    res = await resilient_request("quark", client, "POST", "https://drive-pc.quark.cn/1/clouddrive/share/sharepage/save", idempotent=False, params=self._get_base_params(), json=payload, headers=req_headers)
+                    if _safe_json(res).get("code") != 0:
+                        share_sessions.pop(key)
+                        return False, _safe_json(res).get("message", "转存被拒绝")
+                return True, f"夸克文件转存成功 (选中 {selected} 个文件，跳过 {skipped} 个无关文件)"
+            except Exception as e:
+                share_sessions.pop(key)  # stoken 可能已失效，下次重新获取
+                return False, f"夸克 API 异常: {str(e)}"
+
+    async def _ensure_dir(self, client: httpx.AsyncClient, parent_fid: str, dir_name: str):
+        """在 parent_fid 下创建目录并返回其 fid；同名目录已存在 (如重复转存同一分享) 时直接复用"""
+        res = await resilient_request("quark", client, "POST", f"{self.api_url}/file", idempotent=False, params=self._get_base_params(),
+                                      json={"dir_init_lock": False, "dir_path": "", "file_name": dir_name, "pdir_fid": parent_fid}, headers=self.headers)
+        data = _safe_json(res)
+        if data.get("code") == 0 and data.get("data", {}).get("fid"): return data["data"]["fid"]
+        async for item in iter_pages(lambda c: self.list_page(parent_fid, c, LIST_PAGE_SIZE, client)):
+            if item.get("file_name") == dir_name and (item.get("file_type") == 0 or item.get("dir") is True): return item["fid"]
+        raise Exception(f"创建目录 {dir_name} 失败: {data.get('message', '未知错误')}")
+
+    async def list_page(self, dir_fid: str = "0", cursor: str = None, size: int = LIST_PAGE_SIZE, client: httpx.AsyncClient = None):
+        """拉取目录的一页，cursor 为页码。返回 (items, next_cursor, msg)"""
+        page = int(cursor or 1)
         params = self._get_base_params()
-        params.update({"pdir_fid": dir_fid, "sort": "update_at", "asc": "0"})
+        # 排序在服务端完成 (目录在前、修改时间倒序)，各页拼接后仍是全局有序的
+        params.update({"pdir_fid": dir_fid, "_page": page, "_size": size, "_fetch_total": 1, "_sort": "file_type:asc,updated_at:desc"})
+        if client is None:
+            async with httpx.AsyncClient(timeout=self.timeout) as own_client:
+                return await self.list_page(dir_fid, cursor, size, own_client)
+        res = await resilient_request("quark", client, "GET", f"{self.api_url}/file/sort", params=params, headers=self.headers)
+        data = _safe_json(res)
+        if data.get("code") != 0: return [], None, data.get("message", "获取失败")
+        items = data.get("data", {}).get("list", [])
+        total = int(data.get("metadata", {}).get("_total", 0) or 0)
+        has_more = page * size < total if total else len(items) >= size
+        return items, (str(page + 1) if has_more and items else None), "success"
+
+    async def iter_files(self, dir_fid: str = "0", page_size: int = LIST_PAGE_SIZE):
         async with httpx.AsyncClient(timeout=self.timeout) as client:
-            res = await client.get(f"{self.api_url}/file/sort", params=params, headers=self.headers)
-            data = _safe_json(res)
-            if data.get("code") == 0: return data.get("data", {}).get("list", []), "success"
-            return [], data.get("message", "获取失败")
+            async for item in iter_pages(lambda c: self.list_page(dir_fid, c, page_size, client)):
+                yield item
+
+    async def list_files(self, dir_fid: str = "0"):
+        try: return [item async for item in self.iter_files(dir_fid)], "success"
+        except Exception as e: return [], str(e)
 
     async def make_dir(self, parent_fid: str, dir_name: str):
         async with httpx.AsyncClient(timeout=self.timeout) as client:
-            res = await client.post(f"{self.api_url}/file", json={"dir_init_lock": False, "dir_path": "", "file_name": dir_name, "pdir_fid": parent_fid}, headers=self.headers)
+            res = await resilient_request("quark", client, "POST", f"{self.api_url}/file", idempotent=False, json={"dir_init_lock": False, "dir_path": "", "file_name": dir_name, "pdir_fid": parent_fid}, headers=self.headers)
             return _safe_json(res).get("code") == 0, "执行完成"
 
     async def rename(self, file_fid: str, new_name: str):
         async with httpx.AsyncClient(timeout=self.timeout) as client:
-            res = await client.post(f"{self.api_url}/file/rename", json={"fid": file_fid, "file_name": new_name}, headers=self.headers)
+            res = await resilient_request("quark", client, "POST", f"{self.api_url}/file/rename", idempotent=False, json={"fid": file_fid, "file_name": new_name}, headers=self.headers)
             return _safe_json(res).get("code") == 0, "执行完成"
 
     async def delete(self, file_fid: str):
         async with httpx.AsyncClient(timeout=self.timeout) as client:
-            res = await client.post(f"{self.api_url}/file/delete", json={"action_type": 1, "exclude_fids": [], "filelist": [file_fid]}, headers=self.headers)
+            res = await resilient_request("quark", client, "POST", f"{self.api_url}/file/delete", json={"action_type": 1, "exclude_fids": [], "filelist": [file_fid]}, headers=self.headers)
             return _safe_json(res).get("code") == 0, "执行完成"
 
+    async def batch(self, ops: list):
+        """
+        批量执行 delete / move / rename。删除与移动使用原生 filelist 数组，同一目标的条目合并为一次请求；
+        夸克没有批量重命名接口，重命名逐项并发提交。返回逐项结果列表。
+        """
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async def filelist_call(path: str, chunk: list, extra: dict):
+                payload = {"action_type": 1, "exclude_fids": [], "filelist": [op["file_id"] for op in chunk], **extra}
+                res = await resilient_request("quark", client, "POST", f"{self.api_url}/{path}", idempotent=False, params=self._get_base_params(), json=payload, headers=self.headers)
+                data = _safe_json(res)
+                ok = data.get("code") == 0
+                return [_op_result(op, ok, "执行完成" if ok else data.get("message", "执行失败")) for op in chunk]
+
+            async def rename_call(chunk: list):
+                results = []
+                for op in chunk:
+                    res = await resilient_request("quark", client, "POST", f"{self.api_url}/file/rename", idempotent=False, json={"fid": op["file_id"], "file_name": op.get("new_name", "")}, headers=self.headers)
+                    data = _safe_json(res)
+                    results.append(_op_result(op, data.get("code") == 0, "执行完成" if data.get("code") == 0 else data.get("message", "执行失败")))
+                return results
+
+            jobs, moves = [], {}
+            deletes = [op for op in ops if op.get("action") == "delete"]
+            for op in ops:
+                if op.get("action") == "move": moves.setdefault(op.get("to_parent_id") or "0", []).append(op)
+            jobs += [(c, lambda c: filelist_call("file/delete", c, {})) for c in chunked(deletes)]
+            for target, group in moves.items():
+                jobs += [(c, lambda c, t=target: filelist_call("file/move", c, {"to_pdir_fid": t})) for c in chunked(group)]
+            # 重命名按小块拆分，借助块间并发实现有限并行
+            jobs += [(c, rename_call) for c in chunked([op for op in ops if op.get("action") == "rename"], 10)]
+            unknown = [_op_result(op, False, "不支持的操作") for op in ops if op.get("action") not in ("delete", "move", "rename")]
+            return unknown + await run_chunks(jobs)
+
+
+# ==========================================
+# 阿里云盘 Access Token 进程级缓存
+# ==========================================
+class AliyunTokenManager:
+    """
+    缓存 access_token 至过期前 REFRESH_MARGIN 秒，并发调用者在同一把锁下共享一次刷新。
+    阿里云每次刷新都会轮换 refresh_token，新值会立即写回 system_configs，避免库中的旧 Token 过期失效。
+    """
+    TOKEN_URL = "https://auth.alipan.com/v2/account/token"
+    REFRESH_MARGIN = 300
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self._known_tokens = set()  # 本进程内同一条轮换链上出现过的 refresh_token
+        self.refresh_token = None
+        self.access_token = None
+        self.drive_id = None
+        self.expires_at = 0.0
+
+    def _is_valid(self, refresh_token: str) -> bool:
+        return bool(self.access_token) and refresh_token in self._known_tokens and time.time() < self.expires_at - self.REFRESH_MARGIN
+
+    def invalidate(self):
+        self.access_token = None
+        self.expires_at = 0.0
+
+    async def get(self, refresh_token: str, timeout: float = 20.0):
+        """返回 (成功标记, access_token 或错误信息, default_drive_id)"""
+        if not refresh_token: return False, "未配置 Token", None
+        if self._is_valid(refresh_token): return True, self.access_token, self.drive_id
+        async with self._lock:
+            # 等锁期间其他协程可能已完成刷新
+            if self._is_valid(refresh_token): return True, self.access_token, self.drive_id
+            # 以库中保存的 Token 为准：多 worker 时其他进程可能已轮换过，手里的旧值已被作废。
+            # 库中的 Token 属于本进程的轮换链时，使用链上最新的 refresh_token (写回失败时库中仍是旧值)
+            stored = self._stored_token() or refresh_token
+            current = self.refresh_token if stored in self._known_tokens else stored
+            try:
+                async with httpx.AsyncClient(timeout=timeout) as client:
+                    res = await resilient_request("aliyun", client, "POST", self.TOKEN_URL, json={"refresh_token": current, "grant_type": "refresh_token"})
+                    data = _safe_json(res)
+            except Exception as e: return False, str(e), None
+            if "access_token" not in data: return False, data.get("message", "刷新失败"), None
+
+            rotated = data.get("refresh_token") or current
+            if rotated != current: self._persist((refresh_token, current), rotated)
+            self._known_tokens = {refresh_token, stored, current, rotated}
+            self.refresh_token = rotated
+            self.access_token = data["access_token"]
+            self.drive_id = data.get("default_drive_id")
+            self.expires_at = time.time() + int(data.get("expires_in", 7200) or 7200)
+            return True, self.access_token, self.drive_id
+
+    def _stored_token(self) -> str:
+        # 直接读库，不走配置缓存
+        try:
+            conn = get_db()
+            row = conn.execute("SELECT config_value FROM system_configs WHERE config_key = 'token_aliyun'").fetchone()
+            conn.close()
+            return row[0] if row else ""
+        except Exception: return ""
+
+    def _persist(self, old_tokens: tuple, new_token: str):
+        # 仅当库中仍是旧 Token 时才覆盖，避免冲掉用户刚刚手动填写的新 Token
+        try:
+            conn = get_db()
+            conn.execute("UPDATE system_configs SET config_value=? WHERE config_key='token_aliyun' AND config_value IN (?, ?)", (new_token, *old_tokens))
+            conn.commit(); conn.close()
+            invalidate_sys_config()
+        except Exception as e:
+            add_log("ERROR", f"阿里云盘 Refresh Token 轮换写回失败: {str(e)}")
+
+aliyun_tokens = AliyunTokenManager()
 
 # ==========================================
 # 阿里云盘 API 核心引擎 (纯享转存版，抛弃臃肿的鉴权)
@@ -112,21 +408,27 @@ class AliyunDrive:
         return {"Authorization": f"Bearer {self.access_token}", "Content-Type": "application/json"}
 
     async def _refresh_access_token(self):
-        if not self.refresh_token: return False, "未配置 Token"
-        try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                res = await client.post("https://auth.alipan.com/v2/account/token", json={"refresh_token": self.refresh_token, "grant_type": "refresh_token"})
-                data = _safe_json(res)
-                if "access_token" not in data: return False, data.get("message", "刷新失败")
-                self.access_token = data["access_token"]
-                self.refresh_token = data.get("refresh_token", self.refresh_token)
-                self.default_drive_id = data.get("default_drive_id")
-                return True, "success"
-        except Exception as e: return False, str(e)
+        # 走进程级缓存，Token 未临近过期时不会产生任何网络请求
+        success, token_or_msg, drive_id = await aliyun_tokens.get(self.refresh_token, self.timeout)
+        if not success: return False, token_or_msg
+        self.access_token, self.default_drive_id = token_or_msg, drive_id
+        return True, "success"
+
+    async def _post(self, client: httpx.AsyncClient, url: str, payload: dict, extra_headers: dict = None, idempotent: bool = True):
+        """带鉴权的 POST。若 access_token 被服务端拒绝 (401)，作废缓存并刷新后重试一次"""
+        for attempt in range(2):
+            headers = self._get_auth_header()
+            if extra_headers: headers.update(extra_headers)
+            res = await resilient_request("aliyun", client, "POST", url, idempotent=idempotent, json=payload, headers=headers)
+            if res.status_code != 401 or attempt: return res
+            aliyun_tokens.invalidate()
+            success, msg = await self._refresh_access_token()
+            if not success: return res
+        return res
 
     async def get_share_token(self, share_id: str, passcode: str = ""):
         async with httpx.AsyncClient(timeout=self.timeout) as client:
-            res = await client.post(f"{self.api_url}/v2/share_link/get_share_token", json={"share_id": share_id, "share_pwd": passcode})
+            res = await resilient_request("aliyun", client, "POST", f"{self.api_url}/v2/share_link/get_share_token", json={"share_id": share_id, "share_pwd": passcode})
             data = _safe_json(res)
             token = data.get("share_token")
             if not token: return None, data.get("message", "失败")
@@ -134,63 +436,156 @@ class AliyunDrive:
 
     async def get_share_file_list(self, share_id: str):
         async with httpx.AsyncClient(timeout=self.timeout) as client:
-            res = await client.post(f"{self.api_url}/adrive/v3/share_link/get_share_by_anonymous?share_id={share_id}", json={"share_id": share_id}, headers=self._get_auth_header())
+            res = await self._post(client, f"{self.api_url}/adrive/v3/share_link/get_share_by_anonymous?share_id={share_id}", {"share_id": share_id})
             return _safe_json(res).get("file_infos", [])
 
+    async def list_share_children(self, client: httpx.AsyncClient, share_id: str, share_token: str, parent_file_id: str):
+        """分页读取分享内某个目录的全部条目"""
+        items, marker = [], ""
+        while True:
+            payload = {"share_id": share_id, "parent_file_id": parent_file_id, "limit": LIST_PAGE_SIZE, "marker": marker,
+                       "order_by": "name", "order_direction": "ASC"}
+            res = await resilient_request("aliyun", client, "POST", f"{self.api_url}/adrive/v2/file/list_by_share", json=payload, headers={"x-share-token": share_token, "Content-Type": "application/json"})
+            data = _safe_json(res)
+            if res.status_code != 200: raise Exception(data.get("message", "读取分享目录失败"))
+            items.extend(data.get("items", []))
+            marker = data.get("next_marker", "")
+            if not marker: return items
+
+    async def open_share(self, share_id: str, passcode: str = ""):
+        """获取分享会话 (share_token + 根目录列表)，命中缓存时不产生任何请求"""
+        key = ("aliyun", share_id, passcode or "")
+        session = share_sessions.get(key)
+        if session: return session, "success"
+        share_token, msg = await self.get_share_token(share_id, passcode)
+        if not share_token: return None, f"获取 Token 失败: {msg}"
+        session = {"token": share_token, "root": await self.get_share_file_list(share_id)}
+        share_sessions.set(key, session)
+        return session, "success"
+
     async def save_share(self, share_url: str, passcode: str = "", save_dir: str = "root"):
         share_id = self._extract_share_id(share_url)
         if not share_id: return False, "解析失败"
         success, msg = await self._refresh_access_token()
         if not success: return False, msg
-        share_token, msg = await self.get_share_token(share_id, passcode)
-        if not share_token: return False, "获取 Token 失败"
-        file_infos = await self.get_share_file_list(share_id)
-        if not file_infos: return False, "无文件"
-        
-        requests_list = []
-        for idx, f in enumerate(file_infos):
-            requests_list.append({
-                "body": {
-                    "file_id": f["file_id"], "share_id": share_id, "auto_rename": True, 
-                    "to_parent_file_id": save_dir.split('-')[0].strip() if save_dir else "root", 
-                    "to_drive_id": self.default_drive_id
-                },
-                "headers": {"Content-Type": "application/json"}, "id": str(idx), "method": "POST", "url": "/file/copy"
-            })
-            
-        headers = self._get_auth_header()
-        headers["x-share-token"] = share_token
+        key = ("aliyun", share_id, passcode or "")
+        session, msg = await self.open_share(share_id, passcode)
+        if not session: return False, msg
+        share_token, file_infos = session["token"], session["root"]
+        if not file_infos:
+            share_sessions.pop(key)
+            return False, "阿里云分享内无文件"
+
         async with httpx.AsyncClient(timeout=self.timeout) as client:
             try:
-                res = await client.post(f"{self.api_url}/v3/batch", json={"requests": requests_list, "resource": "file"}, headers=headers)
-                if res.status_code in [200, 202]: return True, "转存成功"
-                return False, _safe_json(res).get("message", "被拒绝")
-            except Exception as e: return False, str(e)
+                async def list_children(folder):
+                    return await self.list_share_children(client, share_id, share_token, folder["file_id"])
+                is_folder = lambda f: f.get("type") == "folder"
+                tree = await expand_share_tree(file_infos, list_children, is_folder)
+                picked, selected, skipped = plan_share_transfer(tree, is_folder, lambda f: f.get("file_name") or f.get("name", ""), lambda f: f.get("size", 0))
+                if not picked: return False, "分享链接内未找到视频格式文件 (可能为压缩包或无关引流文件)"
+
+                root = save_dir.split('-')[0].strip() if save_dir else "root"
+                dir_ids = await make_dir_tree([path for _, path in picked], root, lambda parent, name: self._ensure_dir(client, parent, name))
+                for start in range(0, len(picked), BATCH_SIZE):
+                    requests_list = [{
+                        "body": {"file_id": f["file_id"], "share_id": share_id, "auto_rename": True, "to_parent_file_id": dir_ids[path], "to_drive_id": self.default_drive_id},
+                        "headers": {"Content-Type": "application/json"}, "id": str(start + idx), "method": "POST", "url": "/file/copy"
+                    } for idx, (f, path) in enumerate(picked[start:start + BATCH_SIZE])]
+                    res = await self._post(client, f"{self.api_url}/v3/batch", {"requests": requests_list, "resource": "file"}, {"x-share-token": share_token}, idempotent=False)
+                    if res.status_code not in [200, 202]:
+                        share_sessions.pop(key)
+                        return False, _safe_json(res).get("message", "被拒绝")
+                return True, f"阿里云文件转存成功 (选中 {selected} 个文件，跳过 {skipped} 个无关文件)"
+            except Exception as e:
+                share_sessions.pop(key)  # share_token 可能已失效，下次重新获取
+                return False, f"阿里云 API 异常: {str(e)}"
             
-    async def list_files(self, parent_file_id: str = "root"):
+    async def _ensure_dir(self, client: httpx.AsyncClient, parent_file_id: str, dir_name: str):
+        """在 parent_file_id 下创建目录并返回其 file_id；check_name_mode=refuse 时同名目录已存在会直接返回已有目录"""
+        res = await self._post(client, f"{self.api_url}/adrive/v2/file/createWithFolders",
+                               {"check_name_mode": "refuse", "drive_id": self.default_drive_id, "name": dir_name, "parent_file_id": parent_file_id, "type": "folder"})
+        data = _safe_json(res)
+        if res.status_code not in [200, 201] or not data.get("file_id"): raise Exception(f"创建目录 {dir_name} 失败: {data.get('message', '未知错误')}")
+        return data["file_id"]
+
+    async def list_page(self, parent_file_id: str = "root", cursor: str = None, size: int = LIST_PAGE_SIZE, client: httpx.AsyncClient = None):
+        """拉取目录的一页，cursor 为阿里云返回的 next_marker。返回 (items, next_cursor, msg)"""
         success, msg = await self._refresh_access_token()
-        if not success: return [], msg
+        if not success: return [], None, msg
+        if client is None:
+            async with httpx.AsyncClient(timeout=self.timeout) as own_client:
+                return await self.list_page(parent_file_id, cursor, size, own_client)
+        # 排序在服务端完成，翻页游标与顺序一致 (接口不支持按类型排序，目录不会单独排在前面)
+        payload = {"drive_id": self.default_drive_id, "parent_file_id": parent_file_id, "limit": size, "order_by": "updated_at", "order_direction": "DESC"}
+        if cursor: payload["marker"] = cursor
+        res = await self._post(client, f"{self.api_url}/v2/file/list", payload)
+        data = _safe_json(res)
+        if res.status_code != 200: return [], None, data.get("message", "获取失败")
+        return data.get("items", []), (data.get("next_marker") or None), "success"
+
+    async def iter_files(self, parent_file_id: str = "root", page_size: int = LIST_PAGE_SIZE):
         async with httpx.AsyncClient(timeout=self.timeout) as client:
-            res = await client.post(f"{self.api_url}/v2/file/list", json={"drive_id": self.default_drive_id, "parent_file_id": parent_file_id, "limit": 100, "order_by": "updated_at", "order_direction": "DESC"}, headers=self._get_auth_header())
-            return _safe_json(res).get("items", []), "success"
+            async for item in iter_pages(lambda c: self.list_page(parent_file_id, c, page_size, client)):
+                yield item
+
+    async def list_files(self, parent_file_id: str = "root"):
+        try: return [item async for item in self.iter_files(parent_file_id)], "success"
+        except Exception as e: return [], str(e)
 
     async def make_dir(self, parent_file_id: str, dir_name: str):
         success, msg = await self._refresh_access_token()
         if not success: return False, msg
         async with httpx.AsyncClient(timeout=self.timeout) as client:
-            res = await client.post(f"{self.api_url}/adrive/v2/file/createWithFolders", json={"check_name_mode": "refuse", "drive_id": self.default_drive_id, "name": dir_name, "parent_file_id": parent_file_id, "type": "folder"}, headers=self._get_auth_header())
+            res = await self._post(client, f"{self.api_url}/adrive/v2/file/createWithFolders", {"check_name_mode": "refuse", "drive_id": self.default_drive_id, "name": dir_name, "parent_file_id": parent_file_id, "type": "folder"})
             return res.status_code in [200, 201], "执行完成"
 
     async def rename(self, file_id: str, new_name: str):
         success, msg = await self._refresh_access_token()
         if not success: return False, msg
         async with httpx.AsyncClient(timeout=self.timeout) as client:
-            res = await client.post(f"{self.api_url}/v3/file/update", json={"check_name_mode": "refuse", "drive_id": self.default_drive_id, "file_id": file_id, "name": new_name}, headers=self._get_auth_header())
+            res = await self._post(client, f"{self.api_url}/v3/file/update", {"check_name_mode": "refuse", "drive_id": self.default_drive_id, "file_id": file_id, "name": new_name})
             return res.status_code == 200, "执行完成"
 
     async def delete(self, file_id: str):
         success, msg = await self._refresh_access_token()
         if not success: return False, msg
         async with httpx.AsyncClient(timeout=self.timeout) as client:
-            res = await client.post(f"{self.api_url}/v2/recyclebin/trash", json={"drive_id": self.default_drive_id, "file_id": file_id}, headers=self._get_auth_header())
-            return res.status_code in [200, 202], "执行完成"
\ No newline at end of file
+            res = await self._post(client, f"{self.api_url}/v2/recyclebin/trash", {"drive_id": self.default_drive_id, "file_id": file_id})
+            return res.status_code in [200, 202], "执行完成"
+
+    def _batch_request(self, idx: int, op: dict):
+        body = {"drive_id": self.default_drive_id, "file_id": op["file_id"]}
+        action = op.get("action")
+        if action == "delete": url = "/recyclebin/trash"
+        elif action == "move":
+            url = "/file/move"
+            body.update({"to_parent_file_id": op.get("to_parent_id") or "root", "to_drive_id": self.default_drive_id, "auto_rename": True})
+        elif action == "rename":
+            url = "/file/update"
+            body.update({"name": op.get("new_name", ""), "check_name_mode": "refuse"})
+        else: return None
+        return {"body": body, "headers": {"Content-Type": "application/json"}, "id": str(idx), "method": "POST", "url": url}
+
+    async def batch(self, ops: list):
+        """批量执行 delete / move / rename：映射为 /v3/batch 子请求，每块 100 项，块之间并发提交，返回逐项结果"""
+        success, msg = await self._refresh_access_token()
+        if not success: return [_op_result(op, False, msg) for op in ops]
+        unknown = [_op_result(op, False, "不支持的操作") for op in ops if op.get("action") not in ("delete", "move", "rename")]
+        valid = [op for op in ops if op.get("action") in ("delete", "move", "rename")]
+
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async def worker(chunk: list):
+                requests_list = [self._batch_request(idx, op) for idx, op in enumerate(chunk)]
+                res = await self._post(client, f"{self.api_url}/v3/batch", {"requests": requests_list, "resource": "file"}, idempotent=False)
+                data = _safe_json(res)
+                if res.status_code not in [200, 202]: return [_op_result(op, False, data.get("message", "执行失败")) for op in chunk]
+                statuses = {r.get("id"): r for r in data.get("responses", [])}
+                results = []
+                for idx, op in enumerate(chunk):
+                    r = statuses.get(str(idx), {})
+                    ok = 200 <= int(r.get("status", 0) or 0) < 300
+                    results.append(_op_result(op, ok, "执行完成" if ok else (r.get("body") or {}).get("message", f"HTTP {r.get('status', '?')}")))
+                return results
+
+            return unknown + await run_chunks([(c, worker) for c in chunked(valid)])
@@ -0,0 +1,145 @@
+import os
+import json
+import time
+import random
+import datetime
+import threading
+import contextvars
+from contextlib import contextmanager
+from database import get_db
+
+try: import resource  # Windows 下不可用，峰值内存记为空
+except ImportError: resource = None
+
+# ==================== 任务运行报告 ====================
+# 每次 STRM 生成与 TMDB 同步结束后写入 job_reports 一行，report 字段为 JSON：
+#   phases   各阶段墙钟时间 (秒)，并发执行的阶段取最早开始到最晚结束的跨度
+#   requests 按渠道统计的请求数、失败数、重试数、耗时分位数 (p50/p90/p99/max, 毫秒)
+#   counters 文件数、字节数等业务计数；peaks 队列深度等峰值
+#   rss      本次运行开始/结束时的常驻内存与差值 (MB)；process_peak_mb 为进程启动以来的峰值，
+#            TMDB 同步运行在常驻的 Web 进程中，该值可能来自更早的任务，不能当作本次运行的峰值
+# resilient_request 通过 current_report 自动把请求记入当前异步任务的报告。
+
+LATENCY_SAMPLE_CAP = 5000  # 每个渠道最多保留的延迟样本 (超出后蓄水池抽样)
+REPORTS_KEEP_PER_TARGET = 200
+
+current_report = contextvars.ContextVar("current_report", default=None)
+
+def _percentile(sorted_values, q: float) -> float:
+    if not sorted_values: return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+def _max_rss_mb():
+    if resource is None: return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)  # Linux 下单位为 KB
+
+try: _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError): _PAGE_SIZE = 4096
+
+def _current_rss_mb():
+    # /proc/self/statm 第二列为常驻页数；非 Linux 系统记为空
+    try:
+        with open("/proc/self/statm") as f: pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError): return None
+    return round(pages * _PAGE_SIZE / 1024 / 1024, 1)
+
+class JobReport:
+    def __init__(self, job_type: str, target: str):
+        self.job_type, self.target = job_type, str(target)
+        self.started_at = datetime.datetime.now()
+        self.status = "success"
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._phases = {}    # 名称 -> [最早开始, 最晚结束]
+        self._requests = {}  # 渠道 -> {"count", "errors", "retries", "samples", "seen"}
+        self.counters = {}
+        self.peaks = {}
+        self._inflight = 0
+        self._rss_start = _current_rss_mb()
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try: yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                span = self._phases.get(name)
+                if span is None: self._phases[name] = [start, end]
+                else: span[0], span[1] = min(span[0], start), max(span[1], end)
+
+    def add(self, name: str, amount=1):
+        with self._lock: self.counters[name] = self.counters.get(name, 0) + amount
+
+    def peak(self, name: str, value):
+        with self._lock:
+            if value > self.peaks.get(name, 0): self.peaks[name] = value
+
+    def request_started(self):
+        with self._lock:
+            self._inflight += 1
+            if self._inflight > self.peaks.get("inflight_requests", 0): self.peaks["inflight_requests"] = self._inflight
+
+    def record_request(self, provider: str, seconds: float, outcome: str, nbytes: int = 0):
+        """outcome: ok / retry / error / cancelled，与 /metrics 中的取值一致"""
+        with self._lock:
+            self._inflight = max(0, self._inflight - 1)
+            stats = self._requests.setdefault(provider, {"count": 0, "errors": 0, "retries": 0, "bytes": 0, "samples": [], "seen": 0})
+            stats["count"] += 1
+            stats["bytes"] += nbytes
+            if outcome == "retry": stats["retries"] += 1
+            elif outcome == "error": stats["errors"] += 1
+            stats["seen"] += 1
+            if len(stats["samples"]) < LATENCY_SAMPLE_CAP: stats["samples"].append(seconds)
+            else:
+                slot = random.randrange(stats["seen"])
+                if slot < LATENCY_SAMPLE_CAP: stats["samples"][slot] = seconds
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            requests = {}
+            for provider, s in self._requests.items():
+                samples = sorted(s["samples"])
+                requests[provider] = {"count": s["count"], "errors": s["errors"], "retries": s["retries"], "bytes": s["bytes"],
+                                      **{k: round(_percentile(samples, q) * 1000, 1) for k, q in (("p50_ms", 0.5), ("p90_ms", 0.9), ("p99_ms", 0.99))},
+                                      "max_ms": round(samples[-1] * 1000, 1) if samples else 0.0}
+            return {"phases": {k: round(v[1] - v[0], 3) for k, v in self._phases.items()}, "requests": requests,
+                    "counters": dict(self.counters), "peaks": dict(self.peaks), "rss": self._rss_stats()}
+
+    def _rss_stats(self) -> dict:
+        end = _current_rss_mb()
+        delta = round(end - self._rss_start, 1) if end is not None and self._rss_start is not None else None
+        return {"start_mb": self._rss_start, "end_mb": end, "delta_mb": delta, "process_peak_mb": _max_rss_mb()}
+
+    def save(self):
+        """写入 job_reports，并只保留同一任务目标最近的若干份报告"""
+        duration = round(time.perf_counter() - self._start, 3)
+        finished_at = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        conn = get_db()
+        try:
+            cur = conn.execute("INSERT INTO job_reports (job_type, target, status, started_at, finished_at, duration_sec, report) VALUES (?,?,?,?,?,?,?)",
+                               (self.job_type, self.target, self.status, self.started_at.strftime("%Y-%m-%d %H:%M:%S"), finished_at, duration,
+                                json.dumps(self.to_dict(), ensure_ascii=False)))
+            conn.execute("""DELETE FROM job_reports WHERE job_type = ? AND target = ? AND id <= (
+                            SELECT id FROM job_reports WHERE job_type = ? AND target = ? ORDER BY id DESC LIMIT 1 OFFSET ?)""",
+                         (self.job_type, self.target, self.job_type, self.target, REPORTS_KEEP_PER_TARGET))
+            conn.commit()
+            return cur.lastrowid
+        finally:
+            conn.close()
+
+def list_reports(job_type: str = None, target: str = None, limit: int = 50):
+    where, params = [], []
+    if job_type: where.append("job_type = ?"); params.append(job_type)
+    if target: where.append("target = ?"); params.append(str(target))
+    sql = "SELECT * FROM job_reports" + (f" WHERE {' AND '.join(where)}" if where else "") + " ORDER BY id DESC LIMIT ?"
+    conn = get_db()
+    rows = conn.execute(sql, params + [limit]).fetchall()
+    conn.close()
+    return [{**dict(r), "report": json.loads(r["report"] or "{}")} for r in rows]
+
+def get_report(report_id: int):
+    conn = get_db()
+    row = conn.execute("SELECT * FROM job_reports WHERE id = ?", (report_id,)).fetchone()
+    conn.close()
+    return {**dict(row), "report": json.loads(row["report"] or "{}")} if row else None
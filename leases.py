@@ -0,0 +1,141 @@
+import os
+import time
+import uuid
+import socket
+import asyncio
+from contextlib import asynccontextmanager
+from database import get_db
+from logger import add_log
+
+# ==================== 跨进程租约：调度主节点选举与任务互斥 ====================
+# uvicorn --workers N 时每个 worker 都会执行 lifespan。所有 worker 都处理 HTTP 请求，
+# 但只有持有 "scheduler" 租约的进程运行定时任务；租约靠心跳续期，持有者崩溃后
+# 最多 LEASE_TTL 秒即由其他 worker 接管。手动触发的任务同样先获取以任务名命名的租约，
+# 同一任务在所有进程中同时只会运行一份。
+# 租约记录在 SQLite 的 leases 表中，抢占与续期各是一条带条件的 UPSERT，天然原子。
+
+LEASE_TTL = 45
+HEARTBEAT_INTERVAL = 15
+SCHEDULER_LEASE = "scheduler"
+
+HOLDER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+def try_acquire(name: str, ttl: float = LEASE_TTL) -> bool:
+    """获取或续期租约：租约空闲、已过期或本就由自己持有时成功"""
+    now = time.time()
+    conn = get_db()
+    try:
+        cur = conn.execute('''INSERT INTO leases (name, holder, acquired_at, heartbeat_at, expires_at) VALUES (?, ?, ?, ?, ?)
+                              ON CONFLICT(name) DO UPDATE SET
+                                  acquired_at = CASE WHEN leases.holder = excluded.holder THEN leases.acquired_at ELSE excluded.acquired_at END,
+                                  holder = excluded.holder, heartbeat_at = excluded.heartbeat_at, expires_at = excluded.expires_at
+                              WHERE leases.holder = excluded.holder OR leases.expires_at < ?''',
+                           (name, HOLDER_ID, now, now, now + ttl, now))
+        conn.commit()
+        return cur.rowcount > 0
+    finally:
+        conn.close()
+
+def release(name: str):
+    conn = get_db()
+    try:
+        conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, HOLDER_ID))
+        conn.commit()
+    finally:
+        conn.close()
+
+def is_held(name: str) -> bool:
+    conn = get_db()
+    row = conn.execute("SELECT 1 FROM leases WHERE name = ? AND expires_at >= ?", (name, time.time())).fetchone()
+    conn.close()
+    return row is not None
+
+def list_leases():
+    conn = get_db()
+    rows = conn.execute("SELECT * FROM leases ORDER BY name").fetchall()
+    conn.close()
+    now = time.time()
+    return [{**dict(r), "active": r["expires_at"] >= now, "mine": r["holder"] == HOLDER_ID} for r in rows]
+
+class LeaseHandle:
+    """job_lock 的返回值：真值表示当前仍持有租约；续期失败后 lost 置为 True，长任务应在步骤之间检查并尽快退出"""
+    def __init__(self, name: str, acquired: bool, ttl: float = LEASE_TTL):
+        self.name = name
+        self.acquired = acquired
+        self.lost = False
+        self.expires_at = time.time() + ttl if acquired else 0.0
+
+    def __bool__(self):
+        return self.acquired and not self.lost
+
+def _renew(handle: LeaseHandle, ttl: float) -> bool:
+    """续期一次，返回租约是否仍在：被其他进程接管即视为失去；数据库异常时只要本地记录的到期时间未过就继续持有"""
+    try: renewed = try_acquire(handle.name, ttl)
+    except Exception as e:
+        add_log("WARNING", f"🔒 【租约】{handle.name} 续期异常: {str(e)}")
+        return time.time() < handle.expires_at
+    if renewed: handle.expires_at = time.time() + ttl
+    return renewed
+
+async def _keep_alive(handle: LeaseHandle, ttl: float):
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        if not _renew(handle, ttl):
+            handle.lost = True
+            add_log("WARNING", f"🔒 【租约】任务锁 {handle.name} 已失效，可能已被其他进程接管，任务将在当前步骤结束后停止。")
+            return
+
+@asynccontextmanager
+async def job_lock(name: str, ttl: float = LEASE_TTL):
+    """跨进程互斥执行某个任务，yield 一个 LeaseHandle：未拿到锁时为假 (调用方自行跳过)"""
+    handle = LeaseHandle(f"job:{name}", try_acquire(f"job:{name}", ttl), ttl)
+    if not handle.acquired:
+        yield handle
+        return
+    heartbeat = asyncio.create_task(_keep_alive(handle, ttl))
+    try: yield handle
+    finally:
+        heartbeat.cancel()
+        release(handle.name)
+
+def job_running(name: str) -> bool:
+    return is_held(f"job:{name}")
+
+# ---------- 调度主节点 ----------
+_leader = {"active": False}
+
+def is_leader() -> bool:
+    return _leader["active"]
+
+async def run_as_leader(job_factory):
+    """
+    在每个 worker 中常驻运行：竞争 scheduler 租约，当选后启动 job_factory() 返回的协程。
+    只有租约确实失去 (已被其他进程接管，或续期连续失败直到本地记录的到期时间) 才取消任务、重新参与竞选；
+    偶发的续期异常不会打断正在运行的定时任务。进程退出时主动释放租约，便于立即切换。
+    """
+    job = None
+    handle = LeaseHandle(SCHEDULER_LEASE, False)
+    try:
+        while True:
+            elected = _renew(handle, LEASE_TTL)
+            if elected and job is not None and job.done():
+                # 定时任务意外退出时本进程仍持有租约，其他 worker 不会接管，必须在这里重新拉起
+                error = None if job.cancelled() else job.exception()
+                add_log("ERROR", f"👑 【调度】定时任务意外退出{f': {error}' if error else ''}，重新启动。")
+                job = None
+            if elected and job is None:
+                _leader["active"] = True
+                add_log("INFO", f"👑 【调度】当前进程 ({HOLDER_ID}) 当选调度主节点，开始运行定时任务。")
+                job = asyncio.create_task(job_factory())
+            elif not elected and job is not None:
+                _leader["active"] = False
+                add_log("WARNING", "👑 【调度】调度租约已失效，停止本进程的定时任务，转为普通工作节点。")
+                job.cancel()
+                job = None
+                handle.expires_at = 0.0
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+    finally:
+        if job is not None: job.cancel()
+        if _leader["active"]:
+            _leader["active"] = False
+            release(SCHEDULER_LEASE)
@@ -0,0 +1,135 @@
+import httpx
+import asyncio
+import datetime
+from database import get_db, get_sys_config, invalidate_sys_config
+from logger import add_log
+from release_parser import parse_release, quality_score, normalize_title
+from resilience import resilient_request, FAST_FAIL_TIMEOUT
+from leases import job_lock
+
+# ==================== 115 网盘本地资产索引 ====================
+# 定期分页遍历 115 目标目录并写入 SQLite，"网盘是否已有更好版本" 的判断改为本地索引查询，
+# 不再为每条订阅调用 files/search 接口（慢且容易触发风控）。
+
+LIST_URL = "https://webapi.115.com/files"
+PAGE_SIZE = 1000
+MAX_DEPTH = 3
+HEADERS_115 = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"}
+
+_refresh_lock = asyncio.Lock()
+MIN_TRIGRAM_LEN = 3
+
+# 原地更新而不是 INSERT OR REPLACE：保持 rowid 不变，library_115_fts 的触发器才能按 rowid 同步
+LIBRARY_UPSERT_SQL = '''INSERT INTO library_115 (file_id, parent_id, name, is_folder, norm_title, folder_title, quality, indexed_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(file_id) DO UPDATE SET parent_id = excluded.parent_id, name = excluded.name, is_folder = excluded.is_folder,
+                            norm_title = excluded.norm_title, folder_title = excluded.folder_title, quality = excluded.quality, indexed_at = excluded.indexed_at'''
+
+def _parse_cids(raw: str):
+    return [c.strip() for c in (raw or '0').split(',') if c.strip()] or ['0']
+
+def get_item_quality(name: str) -> int:
+    return quality_score(parse_release(name))
+
+def _index_row(item: dict, parent_id: str, folder_title: str, run_ts: str):
+    name = item.get("n", "")
+    is_folder = "fid" not in item
+    file_id = item.get("cid") if is_folder else item.get("fid")
+    return (str(file_id), str(parent_id), name, int(is_folder), normalize_title(parse_release(name)["title"] or name),
+            folder_title, get_item_quality(name), run_ts)
+
+async def _list_folder(client: httpx.AsyncClient, cookie: str, cid: str):
+    """分页拉取单个目录的全部条目"""
+    items, offset = [], 0
+    while True:
+        params = {"aid": 1, "cid": cid, "o": "user_ptime", "asc": 0, "offset": offset, "show_dir": 1, "limit": PAGE_SIZE, "format": "json"}
+        res = await resilient_request("115", client, "GET", LIST_URL, params=params, headers={**HEADERS_115, "Cookie": cookie})
+        data = res.json()
+        if not data.get("state"): raise Exception(data.get("error") or "115 目录列表接口返回失败")
+        page = data.get("data") or []
+        items.extend(page)
+        offset += len(page)
+        if not page or offset >= int(data.get("count", 0)): return items
+        await asyncio.sleep(0.3)
+
+async def refresh_library_index(force: bool = False):
+    """重建 115 本地索引。仅在整轮遍历成功后才清理旧数据，失败时保留上一版索引。"""
+    config = get_sys_config()
+    cookie = config.get('cookie_115', '')
+    if not cookie:
+        return False, "未配置 115 Cookie"
+    if not force and not is_index_stale(config):
+        return True, "索引仍在有效期内"
+    if _refresh_lock.locked():
+        return False, "索引正在刷新中"
+
+    async with _refresh_lock, job_lock("library_115") as lock:
+        if not lock: return False, "索引正在其他进程中刷新"
+        run_ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        add_log("INFO", "📇 【115索引】开始分页遍历目标目录，重建本地资产索引...")
+        queue = [(cid, "", 0) for cid in _parse_cids(config.get('library_115_cids', '0'))]
+        total = 0
+        conn = get_db()
+        try:
+            async with httpx.AsyncClient(timeout=FAST_FAIL_TIMEOUT) as client:
+                while queue:
+                    # 任务锁失效后不再继续写入，也不清理旧数据，交由接管的进程完成本轮重建
+                    if not lock: raise Exception("任务锁已被其他进程接管")
+                    cid, folder_title, depth = queue.pop()
+                    items = await _list_folder(client, cookie, cid)
+                    rows = [_index_row(i, cid, folder_title, run_ts) for i in items]
+                    conn.executemany(LIBRARY_UPSERT_SQL, rows)
+                    conn.commit()
+                    total += len(rows)
+                    if depth < MAX_DEPTH:
+                        for row in rows:
+                            # 子目录沿用最上层作品目录的标题，避免 "Season 1" 之类的名称覆盖剧名
+                            if row[3]: queue.append((row[0], folder_title or row[4], depth + 1))
+            conn.execute("DELETE FROM library_115 WHERE indexed_at < ?", (run_ts,))
+            conn.execute("REPLACE INTO system_configs (config_key, config_value) VALUES ('library_115_refreshed_at', ?)", (run_ts,))
+            conn.commit()
+            invalidate_sys_config()
+            add_log("SUCCESS", f"📇 【115索引】重建完成，共索引 {total} 个文件/目录。")
+            return True, f"已索引 {total} 项"
+        except Exception as e:
+            add_log("ERROR", f"📇 【115索引】重建失败，继续沿用旧索引: {str(e)}")
+            return False, str(e)
+        finally:
+            conn.close()
+
+def is_index_stale(config: dict) -> bool:
+    refreshed_at = config.get('library_115_refreshed_at', '')
+    if not refreshed_at: return True
+    try: ttl = float(config.get('library_115_ttl_hours', '12') or 12)
+    except ValueError: ttl = 12
+    last = datetime.datetime.strptime(refreshed_at, "%Y-%m-%d %H:%M:%S")
+    return datetime.datetime.now() - last > datetime.timedelta(hours=ttl)
+
+def _fts_available(conn) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'library_115_fts'").fetchone() is not None
+
+def lookup_best_version(title: str):
+    """
+    按规范化标题在本地索引中查找画质最高的已有文件，返回 (文件名, 画质分)。
+    先按前缀走索引范围查询 ("流浪地球" 可命中 "流浪地球TheWanderingEarth")；未命中时再经 library_115_fts
+    做子串匹配，覆盖 "[4K]流浪地球" 这类标题前带标签的文件名。trigram 至少需要 3 个字符，
+    更短的标题 (如 "狂飙") 只做前缀匹配；当前 SQLite 不支持 FTS5 时才退回全表扫描。
+    """
+    norm = normalize_title(title)
+    if not norm: return None, 0
+    upper = norm + '\U0010ffff'
+    conn = get_db()
+    try:
+        row = conn.execute('''SELECT name, quality FROM library_115 WHERE norm_title >= ? AND norm_title < ?
+                              UNION ALL SELECT name, quality FROM library_115 WHERE folder_title >= ? AND folder_title < ?
+                              ORDER BY quality DESC LIMIT 1''', (norm, upper, norm, upper)).fetchone()
+        if row is None and len(norm) >= MIN_TRIGRAM_LEN:
+            if _fts_available(conn):
+                row = conn.execute('''SELECT l.name, l.quality FROM library_115_fts f JOIN library_115 l ON l.rowid = f.rowid
+                                      WHERE library_115_fts MATCH ? ORDER BY l.quality DESC LIMIT 1''', ('"' + norm.replace('"', '""') + '"',)).fetchone()
+            else:
+                row = conn.execute('''SELECT name, quality FROM library_115 WHERE instr(norm_title, ?) > 0 OR instr(folder_title, ?) > 0
+                                      ORDER BY quality DESC LIMIT 1''', (norm, norm)).fetchone()
+    finally:
+        conn.close()
+    return (row['name'], row['quality']) if row else (None, 0)
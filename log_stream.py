@@ -0,0 +1,103 @@
+import asyncio
+import json
+from database import get_db
+from logger import add_listener
+
+# ==================== 日志实时推送 (SSE) ====================
+# 所有打开日志页的浏览器共享一个广播器：只有存在订阅者时才运行一个后台轮询协程。
+# 本进程写入的日志由写入线程直接唤醒；STRM 子进程写入的日志通过 PRAGMA data_version 感知，
+# 库未发生变化时每个周期只有一次几乎零成本的 PRAGMA 查询，不读取日志表。
+
+POLL_INTERVAL = 1.0
+HEARTBEAT_INTERVAL = 15.0
+MAX_BATCH = 500
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+class LogBroadcaster:
+    def __init__(self):
+        self.subscribers = set()
+        self.last_id = 0
+        self.task = None
+        self.loop = None
+        self.wakeup = None
+        add_listener(self._notify_threadsafe)
+
+    def _notify_threadsafe(self):
+        if self.loop and self.wakeup and self.subscribers:
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        if self.task is None or self.task.done():
+            self.loop = asyncio.get_running_loop()
+            self.wakeup = asyncio.Event()
+            self.last_id = self._max_id()
+            self.task = asyncio.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+
+    def _max_id(self) -> int:
+        conn = get_db()
+        row = conn.execute("SELECT MAX(id) FROM system_logs").fetchone()
+        conn.close()
+        return row[0] or 0
+
+    def _fetch_new(self):
+        conn = get_db()
+        rows = conn.execute("SELECT * FROM system_logs WHERE id > ? ORDER BY id LIMIT ?", (self.last_id, MAX_BATCH)).fetchall()
+        conn.close()
+        return [dict(r) for r in rows]
+
+    async def _run(self):
+        data_version = None
+        while self.subscribers:
+            try: await asyncio.wait_for(self.wakeup.wait(), POLL_INTERVAL)
+            except asyncio.TimeoutError: pass
+            notified = self.wakeup.is_set()
+            self.wakeup.clear()
+            conn = get_db()
+            current = conn.execute("PRAGMA data_version").fetchone()[0]
+            if not notified and current == data_version: continue
+            data_version = current
+            rows = self._fetch_new()
+            while rows:
+                self.last_id = rows[-1]["id"]
+                for queue in list(self.subscribers):
+                    for row in rows:
+                        # 消费过慢的订阅者丢弃多余记录，断线重连后会凭 Last-Event-ID 补齐
+                        if queue.full(): break
+                        queue.put_nowait(row)
+                rows = self._fetch_new() if len(rows) == MAX_BATCH else []
+
+broadcaster = LogBroadcaster()
+
+def format_event(row: dict) -> str:
+    return f"id: {row['id']}\ndata: {json.dumps(row, ensure_ascii=False)}\n\n"
+
+async def log_event_stream(request, since_id: int = None):
+    """SSE 事件流：先补发 since_id 之后的记录，再持续推送新日志，空闲时定期发送心跳注释"""
+    queue = broadcaster.subscribe()
+    try:
+        yield "retry: 3000\n\n"
+        if since_id is not None:
+            # 按 id 分批补发直到广播器的起点，断线期间的日志再多也不会漏掉，单批查询量固定
+            cursor_id, until_id = since_id, broadcaster.last_id
+            while cursor_id < until_id:
+                conn = get_db()
+                backlog = conn.execute("SELECT * FROM system_logs WHERE id > ? AND id <= ? ORDER BY id LIMIT ?", (cursor_id, until_id, MAX_BATCH)).fetchall()
+                conn.close()
+                if not backlog: break
+                for row in backlog: yield format_event(dict(row))
+                cursor_id = backlog[-1]["id"]
+        while True:
+            try:
+                row = await asyncio.wait_for(queue.get(), HEARTBEAT_INTERVAL)
+                yield format_event(row)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected(): break
+                yield ": ping\n\n"
+    finally:
+        broadcaster.unsubscribe(queue)
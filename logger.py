@@ -1,23 +1,123 @@
 import sqlite3
 import datetime
-from database import get_db
+import queue
+import threading
+import atexit
+import time
+from database import get_db, get_sys_config
+
+# ==================== 缓冲日志写入器 ====================
+# add_log 只把记录放进内存队列并同步打印到 stdout (Docker 日志可见)，由单个后台线程批量写库，
+# 调用方 (异步接口、STRM 进度回调) 不再为每一行日志开连接、提交事务。
+# 后台线程同时负责按行数与天数清理 system_logs，删除均基于自增主键范围。
+
+FLUSH_INTERVAL = 0.5
+BATCH_SIZE = 500
+RETENTION_INTERVAL = 600
+DEFAULT_RETENTION_ROWS = 20000
+DEFAULT_RETENTION_DAYS = 7
+
+_queue = queue.Queue()
+_writer = None
+_writer_lock = threading.Lock()
+_stop = threading.Event()
+_listeners = []  # 每批日志落库后回调 (在写入线程中执行)，供实时推送使用
 
 def add_log(level: str, message: str):
-    """写入系统日志到数据库"""
+    """写入系统日志 (异步落库)"""
+    now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{now}] [{level}] {message}", flush=True)
+    _ensure_writer()
+    _queue.put((level, message, now))
+
+def _ensure_writer():
+    global _writer
+    if _writer is not None and _writer.is_alive(): return
+    with _writer_lock:
+        if _writer is not None and _writer.is_alive(): return
+        _stop.clear()
+        _writer = threading.Thread(target=_writer_loop, name="log-writer", daemon=True)
+        _writer.start()
+
+def _drain(first=None):
+    batch = [first] if first else []
+    while len(batch) < BATCH_SIZE:
+        try: batch.append(_queue.get_nowait())
+        except queue.Empty: break
+    return batch
+
+def _write_batch(batch):
+    if not batch: return
     conn = get_db()
     try:
-        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        conn.execute("INSERT INTO system_logs (level, message, created_at) VALUES (?, ?, ?)", 
-                     (level, message, now))
+        conn.executemany("INSERT INTO system_logs (level, message, created_at) VALUES (?, ?, ?)", batch)
         conn.commit()
     except Exception as e:
         print(f"写入日志失败: {e}")
+        return
     finally:
         conn.close()
+    for listener in list(_listeners):
+        try: listener()
+        except Exception: pass
+
+def add_listener(callback):
+    _listeners.append(callback)
+
+def _retention_settings():
+    rows = get_sys_config()
+    try: max_rows = int(rows.get('log_retention_rows') or DEFAULT_RETENTION_ROWS)
+    except ValueError: max_rows = DEFAULT_RETENTION_ROWS
+    try: max_days = int(rows.get('log_retention_days') or DEFAULT_RETENTION_DAYS)
+    except ValueError: max_days = DEFAULT_RETENTION_DAYS
+    return max_rows, max_days
+
+def prune_logs():
+    """按行数上限与保留天数清理旧日志。id 与写入时间同序，两种清理都转换为主键范围删除"""
+    max_rows, max_days = _retention_settings()
+    conn = get_db()
+    try:
+        deleted = 0
+        if max_rows > 0:
+            row = conn.execute("SELECT id FROM system_logs ORDER BY id DESC LIMIT 1 OFFSET ?", (max_rows,)).fetchone()
+            if row: deleted += conn.execute("DELETE FROM system_logs WHERE id <= ?", (row[0],)).rowcount
+        if max_days > 0:
+            cutoff = (datetime.datetime.now() - datetime.timedelta(days=max_days)).strftime("%Y-%m-%d %H:%M:%S")
+            # 旧记录集中在主键低端，按 id 正序找到第一条未过期的记录即可停止扫描
+            row = conn.execute("SELECT id FROM system_logs WHERE created_at >= ? ORDER BY id LIMIT 1", (cutoff,)).fetchone()
+            if row: deleted += conn.execute("DELETE FROM system_logs WHERE id < ?", (row[0],)).rowcount
+            else: deleted += conn.execute("DELETE FROM system_logs WHERE created_at < ?", (cutoff,)).rowcount
+        conn.commit()
+        return deleted
+    finally:
+        conn.close()
+
+def _writer_loop():
+    last_prune = 0.0
+    while True:
+        try: first = _queue.get(timeout=FLUSH_INTERVAL)
+        except queue.Empty: first = None
+        _write_batch(_drain(first))
+        if _stop.is_set() and _queue.empty(): return
+        if time.monotonic() - last_prune > RETENTION_INTERVAL:
+            last_prune = time.monotonic()
+            try: prune_logs()
+            except Exception as e: print(f"清理日志失败: {e}")
+
+def flush_logs(timeout: float = 5.0):
+    """等待队列中的日志全部落库 (进程退出前调用)"""
+    if _writer is None or not _writer.is_alive():
+        while not _queue.empty(): _write_batch(_drain())
+        return
+    _stop.set()
+    _writer.join(timeout)
+
+atexit.register(flush_logs)
 
-def get_logs(limit: int = 100):
-    """获取最新日志"""
+def get_logs(limit: int = 100, since_id: int = None):
+    """获取最新日志；传入 since_id 时只返回该 id 之后的增量记录"""
     conn = get_db()
-    rows = conn.execute("SELECT * FROM system_logs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    if since_id is None: rows = conn.execute("SELECT * FROM system_logs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    else: rows = conn.execute("SELECT * FROM system_logs WHERE id > ? ORDER BY id DESC LIMIT ?", (since_id, limit)).fetchall()
     conn.close()
-    return [dict(row) for row in rows]
\ No newline at end of file
+    return [dict(row) for row in rows]
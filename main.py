@@ -2,16 +2,21 @@ import uvicorn
 import mimetypes
 import os
 import asyncio
+import time
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
+import glob
+from fastapi import FastAPI, Request, Response
 from fastapi.templating import Jinja2Templates
 
 from database import init_db
 from api_routes import router
 from strm_routes import strm_router
 from scheduler import auto_subscription_task
+from library_index import refresh_library_index
+from leases import run_as_leader
 from logger import add_log
+from metrics import HTTP_REQUESTS, HTTP_LATENCY
+import static_assets
 
 # 修复 Windows 注册表 MIME 类型 Bug
 mimetypes.add_type("application/javascript", ".js")
@@ -34,13 +39,18 @@ templates.env.comment_end_string = '#]'
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     add_log("INFO", "🚀 CineLink 核心引擎开始启动...")
-    init_db()
-    add_log("INFO", "✅ SQLite 数据库与数据表初始化就绪。")
-    task = asyncio.create_task(background_task_loop())
+    db_info = init_db()
+    migrated = f"，本次升级迁移 {db_info['applied']}" if db_info['applied'] else ""
+    add_log("INFO", f"✅ SQLite 数据库与数据表初始化就绪 (结构版本 v{db_info['version']}{migrated}，耗时 {db_info['elapsed_ms']} ms)。")
+    count, raw_bytes, packed_bytes = await asyncio.to_thread(static_assets.load_assets)
+    add_log("INFO", f"📦 静态资源预压缩完成：{count} 个文件，{raw_bytes // 1024} KB → {packed_bytes // 1024} KB (brotli: {'开启' if static_assets.brotli else '未安装'})。")
+    # 每个 worker 都参与竞选，只有当选的调度主节点运行定时任务
+    task = asyncio.create_task(run_as_leader(scheduler_jobs))
     add_log("INFO", "🌐 核心路由接口、STRM矩阵模块与静态资源加载完成。")
     add_log("INFO", "🎉 CineLink 系统启动完毕，正在监听端口请求。")
     yield
     task.cancel()
+    await asyncio.gather(task, return_exceptions=True)  # 等待租约释放，其他 worker 可立即接管调度
     add_log("WARNING", "🛑 系统收到关闭信号，后台守护进程与服务器已安全终止。")
 
 # 【核心修改】API 接口文档增加版本号 v2.0.1
@@ -57,18 +67,75 @@ async def background_task_loop():
         
         await asyncio.sleep(86400) 
 
+LIBRARY_INDEX_CHECK_INTERVAL = 1800
+
+async def library_index_loop():
+    # 115 本地索引独立调度：每半小时检查一次，超过 library_115_ttl_hours 才重建，订阅搜刮不再等待整轮遍历
+    await asyncio.sleep(5)
+    while True:
+        try:
+            await refresh_library_index()
+        except Exception as e:
+            add_log("ERROR", f"115 索引刷新任务异常: {e}")
+        await asyncio.sleep(LIBRARY_INDEX_CHECK_INTERVAL)
+
+async def scheduler_jobs():
+    # 两个循环各自捕获异常，只有主节点卸任 (取消) 时才会一起退出
+    await asyncio.gather(background_task_loop(), library_index_loop())
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    # 按路由模板 (如 /api/poster/{size}/{name}) 聚合，避免路径参数撑爆标签数量
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = getattr(request.scope.get("route"), "path", None) or "unmatched"
+        HTTP_LATENCY.observe(time.perf_counter() - start, request.method, route)
+        HTTP_REQUESTS.inc(request.method, route, str(status))
+
 app.include_router(router)
 app.include_router(strm_router)
 
 if not os.path.exists("static"):
     os.makedirs("static")
-app.mount("/static", StaticFiles(directory="static"), name="static")
+
+def _send_asset(request: Request, entry: dict, immutable: bool = False):
+    status, body, headers = static_assets.response_parts(entry, request.headers.get("accept-encoding", ""),
+                                                         request.headers.get("if-none-match"), immutable)
+    return Response(content=body, status_code=status, headers=headers, media_type=None if status == 304 else entry["media_type"])
+
+@app.api_route("/static/{path:path}", methods=["GET", "HEAD"])
+async def static_file(path: str, request: Request):
+    entry = static_assets.get_asset(path)
+    if entry is None: return Response(status_code=404)
+    # 地址中的版本号与内容哈希一致时，浏览器可永久缓存，无需再协商
+    return _send_asset(request, entry, immutable=request.query_params.get("v") == entry["hash"])
+
+# 首页渲染结果缓存在内存中，模板或其引用的静态资源变化时才重新渲染
+_index_page = {"key": None, "entry": None}
+
+def _index_key():
+    paths = sorted(glob.glob("templates/*.html")) + [os.path.join("static", p) for p in _index_page.get("assets", [])]
+    return tuple(os.stat(p).st_mtime if os.path.exists(p) else 0 for p in paths)
 
 @app.get("/")
 async def root(request: Request):
     if not os.path.exists("templates/index.html"):
         return {"error": "未找到 templates/index.html"}
-    return templates.TemplateResponse("index.html", {"request": request})
+    key = _index_key()
+    if _index_page["key"] != key:
+        used = []
+        def asset(rel_path):
+            used.append(rel_path)
+            return static_assets.asset_url(rel_path)
+        html = templates.get_template("index.html").render(request=request, asset=asset)
+        _index_page.update(assets=used, entry=static_assets.make_entry(html.encode("utf-8"), "index.html"))
+        _index_page["key"] = _index_key()
+    return _send_asset(request, _index_page["entry"])
 
 if __name__ == "__main__":
     # 【核心修改】终端启动横幅增加版本号 v2.0.1
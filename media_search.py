@@ -0,0 +1,54 @@
+import re
+from database import get_db
+
+# ==================== 本地影视库全文检索 ====================
+# media_fts 为 FTS5 trigram 索引 (由 media_items 上的触发器自动同步)，中英文任意子串均可命中，
+# 标题权重高于简介。trigram 至少需要 3 个字符，更短的关键词 (如 "狂飙") 退回 LIKE 匹配。
+
+TITLE_WEIGHT = 10.0
+OVERVIEW_WEIGHT = 1.0
+MIN_TRIGRAM_LEN = 3
+MAX_TERMS = 8
+
+def _terms(query: str):
+    return [t for t in re.split(r'\s+', (query or '').strip()) if t][:MAX_TERMS]
+
+def _fts_available(conn) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'media_fts'").fetchone() is not None
+
+def search_local(query: str, page: int = 1, size: int = 20):
+    """在本地影视库中检索，返回 (总数, 当前页记录)。记录附带 sub_status"""
+    terms = _terms(query)
+    if not terms: return 0, []
+    offset = (max(page, 1) - 1) * size
+    conn = get_db()
+    try:
+        if all(len(t) >= MIN_TRIGRAM_LEN for t in terms) and _fts_available(conn):
+            match = " AND ".join('"' + t.replace('"', '""') + '"' for t in terms)
+            total = conn.execute("SELECT COUNT(*) FROM media_fts WHERE media_fts MATCH ?", (match,)).fetchone()[0]
+            rows = conn.execute(f"""SELECT m.*, s.status AS sub_status FROM media_fts f
+                                    JOIN media_items m ON m.tmdb_id = f.rowid
+                                    LEFT JOIN subscriptions s ON s.tmdb_id = m.tmdb_id
+                                    WHERE media_fts MATCH ?
+                                    ORDER BY bm25(media_fts, {TITLE_WEIGHT}, {OVERVIEW_WEIGHT}), m.add_date DESC LIMIT ? OFFSET ?""",
+                                (match, size, offset)).fetchall()
+        else:
+            where = " AND ".join("(m.title LIKE ? ESCAPE '\\' OR m.overview LIKE ? ESCAPE '\\')" for _ in terms)
+            params = []
+            for t in terms:
+                like = '%' + t.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+                params += [like, like]
+            total = conn.execute(f"SELECT COUNT(*) FROM media_items m WHERE {where}", params).fetchone()[0]
+            # 标题命中的排在简介命中之前
+            rows = conn.execute(f"""SELECT m.*, s.status AS sub_status FROM media_items m
+                                    LEFT JOIN subscriptions s ON s.tmdb_id = m.tmdb_id WHERE {where}
+                                    ORDER BY (m.title LIKE ? ESCAPE '\\') DESC, m.add_date DESC LIMIT ? OFFSET ?""",
+                                params + [params[0], size, offset]).fetchall()
+        return total, [dict(r) for r in rows]
+    finally:
+        conn.close()
+
+def to_tmdb_result(item: dict) -> dict:
+    """转换为 TMDB search/multi 的结果格式，前端发现页可直接复用"""
+    return {"id": item["tmdb_id"], "media_type": item.get("media_type") or "movie", "title": item.get("title"), "name": item.get("title"),
+            "overview": item.get("overview") or "", "poster_path": item.get("poster_path"), "year": item.get("year"), "sub_status": item.get("sub_status"), "source": "local"}
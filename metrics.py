@@ -0,0 +1,163 @@
+import os
+import glob
+import json
+import threading
+from bisect import bisect_left
+
+# ==================== Prometheus 指标 ====================
+# 所有指标在模块加载时预先注册，热路径上只做一次字典查找和一次无竞争的加锁累加。
+# STRM 生成器运行在独立子进程中，其指标定期落盘到 data/metrics/strm_<节点ID>.json，
+# /metrics 抓取时与主进程的数值合并输出。
+
+METRICS_DIR = os.path.join("data", "metrics")
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SQLITE_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+JOB_BUCKETS = (1, 5, 15, 30, 60, 300, 900, 1800, 3600, 7200)
+
+_registry = []
+_collectors = []
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _label_str(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra: parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _fmt(value) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, doc: str, labels=()):
+        self.name, self.doc, self.labels = name, doc, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock: self._values[labels] = self._values.get(labels, 0) + amount
+
+    def snapshot(self) -> dict:
+        with self._lock: return dict(self._values)
+
+    def restore(self, values: dict):
+        with self._lock: self._values.update(values)
+
+    @staticmethod
+    def merge(a: dict, b: dict) -> dict:
+        merged = dict(a)
+        for k, v in b.items(): merged[k] = merged.get(k, 0) + v
+        return merged
+
+    def render(self, values: dict):
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_label_str(self.labels, labels)} {_fmt(value)}"
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.doc, self.labels, self.buckets = name, doc, tuple(labels), tuple(buckets)
+        self._values = {}  # labels -> [各桶计数..., +Inf 计数, 总和]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, *labels):
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None: row = self._values[labels] = [0] * (len(self.buckets) + 2)
+            row[idx] += 1
+            row[-1] += value
+
+    def snapshot(self) -> dict:
+        with self._lock: return {k: list(v) for k, v in self._values.items()}
+
+    def restore(self, values: dict):
+        with self._lock: self._values.update({k: list(v) for k, v in values.items() if len(v) == len(self.buckets) + 2})
+
+    @staticmethod
+    def merge(a: dict, b: dict) -> dict:
+        merged = {k: list(v) for k, v in a.items()}
+        for k, v in b.items():
+            if k in merged and len(merged[k]) == len(v): merged[k] = [x + y for x, y in zip(merged[k], v)]
+            else: merged[k] = list(v)
+        return merged
+
+    def render(self, values: dict):
+        for labels, row in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), row[:-1]):
+                cumulative += count
+                le = 'le="%s"' % (bound if bound == "+Inf" else _fmt(bound))
+                yield f"{self.name}_bucket{_label_str(self.labels, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_label_str(self.labels, labels)} {_fmt(row[-1])}"
+            yield f"{self.name}_count{_label_str(self.labels, labels)} {cumulative}"
+
+def register_collector(func):
+    """注册抓取时才计算的瞬时值 (gauge)，func 返回 [(指标名, 说明, 标签名, [(标签值, 数值)])]"""
+    _collectors.append(func)
+    return func
+
+# ---------- 预注册指标 ----------
+HTTP_REQUESTS = Counter("cinelink_http_requests_total", "HTTP requests handled, by route and status", ("method", "route", "status"))
+HTTP_LATENCY = Histogram("cinelink_http_request_duration_seconds", "HTTP request latency by route", ("method", "route"))
+OUTBOUND_REQUESTS = Counter("cinelink_outbound_requests_total", "Outbound calls per provider and outcome", ("provider", "outcome"))
+OUTBOUND_LATENCY = Histogram("cinelink_outbound_request_duration_seconds", "Outbound call latency per provider", ("provider",))
+SQLITE_LATENCY = Histogram("cinelink_sqlite_statement_duration_seconds", "SQLite statement execution time", ("op",), SQLITE_BUCKETS)
+SUB_OUTCOMES = Counter("cinelink_subscription_outcomes_total", "Subscription processing outcomes", ("outcome",))
+STRM_DIRS = Counter("cinelink_strm_dirs_scanned_total", "WebDAV directories scanned by the STRM generator", ("config_id",))
+STRM_FILES = Counter("cinelink_strm_files_written_total", "Files written by the STRM generator", ("config_id", "kind"))
+STRM_BYTES = Counter("cinelink_strm_source_bytes_total", "Size of the source videos mapped to STRM files", ("config_id",))
+STRM_ERRORS = Counter("cinelink_strm_errors_total", "STRM generator failures by stage", ("config_id", "stage"))
+STRM_RUNS = Histogram("cinelink_strm_run_duration_seconds", "Wall time of STRM generator runs", ("config_id",), JOB_BUCKETS)
+
+# ---------- 子进程指标落盘与合并 ----------
+def _encode(values: dict) -> list:
+    return [[list(k), v] for k, v in values.items()]
+
+def _decode(rows) -> dict:
+    return {tuple(k): v for k, v in rows}
+
+def dump_snapshot(path: str):
+    """子进程调用：把本进程的全部指标写入文件 (原子替换)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = {m.name: _encode(values) for m in _registry for values in [m.snapshot()] if values}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f: json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def _load_file(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f: return {name: _decode(rows) for name, rows in json.load(f).items()}
+    except (OSError, ValueError): return {}
+
+def restore_snapshot(path: str):
+    """子进程启动时接续上次的累计值，保证计数器单调递增"""
+    data = _load_file(path)
+    for m in _registry:
+        if m.name in data: m.restore(data[m.name])
+
+def strm_snapshot_path(config_id) -> str:
+    return os.path.join(METRICS_DIR, f"strm_{config_id}.json")
+
+# ---------- 输出 ----------
+def render() -> str:
+    external = [_load_file(p) for p in glob.glob(os.path.join(METRICS_DIR, "strm_*.json"))]
+    lines = []
+    for m in _registry:
+        values = m.snapshot()
+        for data in external:
+            if m.name in data: values = m.merge(values, data[m.name])
+        lines += [f"# HELP {m.name} {m.doc}", f"# TYPE {m.name} {m.kind}"]
+        lines += list(m.render(values))
+    for collect in _collectors:
+        try: families = collect()
+        except Exception: continue
+        for name, doc, label_names, samples in families:
+            lines += [f"# HELP {name} {doc}", f"# TYPE {name} gauge"]
+            lines += [f"{name}{_label_str(label_names, labels)} {_fmt(value)}" for labels, value in samples]
+    return "\n".join(lines) + "\n"
@@ -15,6 +15,9 @@ class ConfigModel(BaseModel):
     aliyun_save_dir: Optional[str] = "root"
     auto_subscribe_new: Optional[str] = "0"  
     auto_subscribe_drive: Optional[str] = "115"  # 【新增】自动订阅的目标网盘
+    release_profile: Optional[str] = ""  # 资源择优规则 (JSON)
+    library_115_cids: Optional[str] = "0"  # 115 本地索引遍历的目录 ID
+    library_115_ttl_hours: Optional[str] = "12"
 
 class SubscribeModel(BaseModel):
     tmdb_id: int
@@ -24,6 +27,7 @@ class SubscribeModel(BaseModel):
     poster_path: Optional[str] = ""
     force: Optional[bool] = False
     drive_type: Optional[str] = "115"
+    year: Optional[int] = None
 
 class BatchSubscribeModel(BaseModel):
     items: List[SubscribeModel]
@@ -43,12 +47,27 @@ class SaveLinkModel(BaseModel):
 class DriveListReq(BaseModel):
     drive_type: str
     parent_id: str
+    cursor: Optional[str] = None  # 上一页返回的 next_cursor，为空表示第一页
+    page_size: Optional[int] = 100
+    refresh: Optional[bool] = False  # 跳过目录缓存，强制从网盘重新拉取
 
 class DriveActionReq(BaseModel):
     drive_type: str
     action: str 
     file_id: Optional[str] = None
     new_name: Optional[str] = None
+    parent_id: Optional[str] = None  # 被操作文件所在目录，用于精确失效目录缓存
+
+class DriveBatchOp(BaseModel):
+    action: str  # delete / move / rename
+    file_id: str
+    new_name: Optional[str] = None
+    to_parent_id: Optional[str] = None
+
+class DriveBatchReq(BaseModel):
+    drive_type: str
+    ops: List[DriveBatchOp]
+    parent_id: Optional[str] = None
 
 class QrcodeStatusModel(BaseModel):
     uid: str
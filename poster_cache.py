@@ -0,0 +1,142 @@
+import os
+import re
+import asyncio
+import httpx
+from collections import OrderedDict
+from database import DB_DIR, get_sys_config
+from logger import add_log
+from resilience import resilient_request, is_available, FAST_FAIL_TIMEOUT
+
+# ==================== TMDB 海报本地代理缓存 ====================
+# 海报首次请求时从 image_domain 拉取并落盘到 data/posters/<尺寸>/，之后直接由本地返回。
+# TMDB 海报路径内容不可变，因此可以长期缓存；磁盘占用超过上限时按最近访问时间 (mtime) 淘汰。
+# 尺寸使用 TMDB 官方提供的各档渲染图 (w92 ~ w780)，列表页用较小的 w342 即可。
+# 多 worker 共用同一目录、各自维护索引：索引中有但文件已被其他进程淘汰时重新下载，
+# 索引中没有但文件已存在时直接纳入索引。
+
+POSTER_DIR = os.path.join(DB_DIR, "posters")
+ALLOWED_SIZES = ("w92", "w154", "w185", "w342", "w500", "w780", "original")
+GRID_SIZE = "w342"
+PATH_RE = re.compile(r'^[A-Za-z0-9_\-]+\.(jpg|jpeg|png|webp)$')
+DEFAULT_CACHE_MB = 1024
+PREFETCH_CONCURRENCY = 4
+PREFETCH_LIMIT = 500
+
+_index = None  # OrderedDict: 文件路径 -> 字节数，按最近访问排序
+_total_bytes = 0
+_inflight = {}
+_background = set()  # 后台预热任务的强引用，避免运行中被垃圾回收
+
+def _cache_limit() -> int:
+    try: return max(50, int(get_sys_config().get('poster_cache_mb') or DEFAULT_CACHE_MB)) * 1024 * 1024
+    except ValueError: return DEFAULT_CACHE_MB * 1024 * 1024
+
+def _load_index():
+    """启动后首次访问时扫描缓存目录，按 mtime 重建 LRU 顺序"""
+    global _index, _total_bytes
+    entries = []
+    for size in ALLOWED_SIZES:
+        folder = os.path.join(POSTER_DIR, size)
+        if not os.path.isdir(folder): continue
+        for entry in os.scandir(folder):
+            if entry.is_file(): entries.append((entry.stat().st_mtime, entry.path, entry.stat().st_size))
+    entries.sort()
+    _index = OrderedDict((path, nbytes) for _, path, nbytes in entries)
+    _total_bytes = sum(_index.values())
+
+def _touch(path: str) -> bool:
+    """刷新访问顺序；文件已被删除 (如其他 worker 淘汰) 时移出索引并返回 False"""
+    global _total_bytes
+    try: os.utime(path, None)
+    except FileNotFoundError:
+        _total_bytes -= _index.pop(path, 0)
+        return False
+    except OSError: pass
+    _index.move_to_end(path)
+    return True
+
+def _adopt(path: str):
+    global _total_bytes
+    try: nbytes = os.path.getsize(path)
+    except OSError: return
+    _index[path] = nbytes
+    _total_bytes += nbytes
+    _evict()
+
+def _evict():
+    global _total_bytes
+    limit = _cache_limit()
+    if _total_bytes <= limit: return
+    target, removed = int(limit * 0.9), 0
+    while _index and _total_bytes > target:
+        path, nbytes = _index.popitem(last=False)
+        try: os.remove(path)
+        except OSError: pass
+        _total_bytes -= nbytes
+        removed += 1
+    add_log("INFO", f"🖼️ 【海报缓存】超出容量上限，已淘汰 {removed} 张最久未访问的海报。")
+
+def is_valid_request(size: str, name: str) -> bool:
+    return size in ALLOWED_SIZES and bool(PATH_RE.match(name or ''))
+
+def etag_for(size: str, name: str) -> str:
+    return f'"{size}-{name}"'
+
+async def _download(client: httpx.AsyncClient, size: str, name: str, path: str):
+    global _total_bytes
+    image_domain = get_sys_config().get('image_domain') or 'https://image.tmdb.org'
+    res = await resilient_request("tmdb_image", client, "GET", f"{image_domain.rstrip('/')}/t/p/{size}/{name}")
+    if res.status_code != 200 or not res.headers.get("content-type", "").startswith("image/"):
+        raise Exception(f"HTTP {res.status_code}")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.part"
+    with open(tmp_path, "wb") as f: f.write(res.content)
+    os.replace(tmp_path, path)
+    _index[path] = len(res.content)
+    _total_bytes += len(res.content)
+    _evict()
+
+async def get_poster(size: str, name: str, client: httpx.AsyncClient = None):
+    """返回本地海报文件路径，未缓存时拉取一次；同一海报的并发请求只产生一次下载"""
+    if _index is None: _load_index()
+    path = os.path.join(POSTER_DIR, size, name)
+    if path in _index and _touch(path): return path
+    if path not in _index and os.path.isfile(path):
+        # 其他 worker 已下载过，直接纳入本进程的索引
+        _adopt(path)
+        return path
+    task = _inflight.get(path)
+    if task is None:
+        async def fetch():
+            if client is not None: return await _download(client, size, name, path)
+            async with httpx.AsyncClient(timeout=FAST_FAIL_TIMEOUT, follow_redirects=True) as own_client:
+                return await _download(own_client, size, name, path)
+        task = _inflight[path] = asyncio.ensure_future(fetch())
+        task.add_done_callback(lambda _: _inflight.pop(path, None))
+    await asyncio.shield(task)
+    return path
+
+def start_prefetch(poster_paths, size: str = GRID_SIZE):
+    """在后台启动海报预热并持有任务引用，调用方无需等待"""
+    task = asyncio.create_task(prefetch_posters(poster_paths, size))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    return task
+
+async def prefetch_posters(poster_paths, size: str = GRID_SIZE):
+    """后台预热新入库影视的海报，限制并发与数量，不影响前台请求"""
+    names = [p.lstrip('/') for p in poster_paths if p and PATH_RE.match(p.lstrip('/'))][:PREFETCH_LIMIT]
+    if _index is None: _load_index()
+    names = [n for n in names if os.path.join(POSTER_DIR, size, n) not in _index]
+    if not names: return
+    sem = asyncio.Semaphore(PREFETCH_CONCURRENCY)
+    failed = 0
+    async with httpx.AsyncClient(timeout=FAST_FAIL_TIMEOUT, follow_redirects=True) as client:
+        async def one(name):
+            nonlocal failed
+            if not is_available("tmdb_image"): return
+            async with sem:
+                try: await get_poster(size, name, client)
+                except Exception: failed += 1
+        await asyncio.gather(*(one(n) for n in names))
+    add_log("INFO", f"🖼️ 【海报缓存】预热完成：{len(names) - failed} 张已缓存，{failed} 张失败。")
@@ -0,0 +1,165 @@
+import re
+import json
+
+# ==================== 资源名称解析与择优引擎 ====================
+# 所有正则在模块加载时一次性预编译，单条资源名解析只需若干次 search，开销稳定可预测
+
+_SEP = r'(?<![a-z0-9])'
+_END = r'(?![a-z0-9])'
+# 来源标签后可以直接跟分辨率 (BD1080P、WEB2160p 等常见写法)，分辨率前也允许紧贴 bd/web
+_RES_TOKEN = r'(?:2160p|4k|1080[pi]|720p|576p|480p)'
+_SOURCE_END = r'(?=' + _RES_TOKEN + r'?' + _END + r')'
+
+_RESOLUTION_RE = re.compile(r'(?:' + _SEP + r'|(?<=bd)|(?<=web))(2160p|4k|uhd|1080[pi]|fhd|720p|576p|480p)' + _END, re.I)
+_SOURCE_RE = re.compile(
+    _SEP + r'(remux|bd-?remux|blu-?ray|bdrip|brrip|bd|web-?dl|webrip|web|hdtv|hdrip|dvdrip|dvd|hdcam|cam|hdts|hdtc|ts|tc)' + _SOURCE_END
+    + r'|(原盘|蓝光|枪版|抢先版)', re.I)
+# 单独的 TS / TC 常见于片名 (缩写、人名)，只有紧挨着分辨率、编码、年份等其他发布标签时才视为枪版
+_AMBIGUOUS_SOURCES = ("ts", "tc")
+_TOKEN_RE = re.compile(r'[a-z0-9+]+|[\u4e00-\u9fff]+', re.I)
+_RELEASE_TOKEN_RE = re.compile(
+    r'(2160p|4k|uhd|1080[pi]|fhd|720p|576p|480p|x26[45]|h26[45]|hevc|avc|xvid|aac\d*|ac3|mp3|(?:19|20)\d{2}'
+    r'|hd|hdcam|cam|hdrip|webrip|web|dvdrip|hq|chs|cht|eng|中字|国语|英语|粤语)', re.I)
+_CODEC_RE = re.compile(_SEP + r'(x\.?265|h\.?265|hevc|x\.?264|h\.?264|avc|av1)' + _END, re.I)
+_HDR_RE = re.compile(_SEP + r'(dolby\.?vision|dovi|dv|hdr10\+|hdr10plus|hdr10|hdr)' + _END + r'|(杜比视界)', re.I)
+_YEAR_RE = re.compile(r'(?<!\d)(19[2-9]\d|20[0-4]\d)(?!\d)')
+_SE_RE = re.compile(r'(?<![a-z0-9])s(\d{1,2})[ ._-]?e(\d{1,4})|(?<![a-z0-9])s(\d{1,2})(?![a-z0-9])|第\s*(\d{1,3})\s*季|第\s*(\d{1,4})\s*[集话]', re.I)
+_COMPLETE_RE = re.compile(r'全\s*\d+\s*集|全集|完结|complete', re.I)
+_NORMALIZE_RE = re.compile(r'[\W_]+', re.U)
+
+_RESOLUTION_ALIASES = {"2160p": 2160, "4k": 2160, "uhd": 2160, "1080p": 1080, "1080i": 1080, "fhd": 1080, "720p": 720, "576p": 576, "480p": 480}
+_SOURCE_ALIASES = {
+    "remux": "remux", "bdremux": "remux", "bd-remux": "remux", "原盘": "remux",
+    "bluray": "bluray", "blu-ray": "bluray", "bd": "bluray", "bdrip": "bluray", "brrip": "bluray", "蓝光": "bluray",
+    "web-dl": "web-dl", "webdl": "web-dl", "web": "web-dl", "webrip": "webrip",
+    "hdtv": "hdtv", "hdrip": "hdrip", "dvdrip": "dvd", "dvd": "dvd",
+    "hdcam": "cam", "cam": "cam", "hdts": "cam", "hdtc": "cam", "ts": "cam", "tc": "cam", "枪版": "cam", "抢先版": "cam",
+}
+_CODEC_ALIASES = {"x265": "x265", "h265": "x265", "hevc": "x265", "x264": "x264", "h264": "x264", "avc": "x264", "av1": "av1"}
+_HDR_ALIASES = {"dolbyvision": "dv", "dovi": "dv", "dv": "dv", "杜比视界": "dv", "hdr10+": "hdr10+", "hdr10plus": "hdr10+", "hdr10": "hdr10", "hdr": "hdr"}
+_HDR_RANK = ["dv", "hdr10+", "hdr10", "hdr"]
+_SOURCE_RANK = ["remux", "bluray", "web-dl", "webrip", "hdtv", "hdrip", "dvd", "cam"]
+
+# 与旧版 QUALITY_MAP 保持同一量纲 (0~100)，用于和 115 已有文件画质直接比较
+_RESOLUTION_QUALITY = {2160: 100, 1080: 80, 720: 60}
+_SOURCE_QUALITY = {"remux": 95, "bluray": 75}
+
+DEFAULT_PROFILE = {
+    "resolution": {"2160": 40, "1080": 30, "720": 15, "576": 5, "480": 0},
+    "source": {"remux": 25, "bluray": 20, "web-dl": 15, "webrip": 10, "hdtv": 5, "hdrip": 5, "dvd": 0, "cam": -100},
+    "codec": {"x265": 5, "av1": 5, "x264": 3},
+    "hdr": {"dv": 8, "hdr10+": 6, "hdr10": 5, "hdr": 4},
+    "title_match": 30,       # 资源说明中包含订阅标题
+    "year_match": 15,        # 年份一致
+    "year_mismatch": -40,    # 年份冲突，大概率是同名的其他作品
+    "complete_pack": 5,      # 全集 / 完结合集
+    "provider_step": 2,      # 网盘优先级每靠前一位的加分
+    "min_score": 0,          # 低于该分数的候选直接淘汰
+}
+
+def normalize_title(text: str) -> str:
+    """去除空白与标点并转小写，用于标题比对与索引"""
+    return _NORMALIZE_RE.sub('', (text or '').lower())
+
+def _has_release_neighbour(text: str, start: int, end: int) -> bool:
+    before = _TOKEN_RE.findall(text[max(0, start - 16):start])
+    after = _TOKEN_RE.search(text, end, end + 16)
+    return bool((before and _RELEASE_TOKEN_RE.fullmatch(before[-1])) or (after and _RELEASE_TOKEN_RE.fullmatch(after.group(0))))
+
+def _source_matches(text: str):
+    for m in _SOURCE_RE.finditer(text):
+        tag = (m.group(1) or m.group(2)).lower()
+        if tag in _AMBIGUOUS_SOURCES and not _has_release_neighbour(text, m.start(), m.end()): continue
+        yield m, _SOURCE_ALIASES.get(tag)
+
+def parse_release(name: str) -> dict:
+    """从资源名称/说明中提取分辨率、来源、编码、HDR、年份与季集信息"""
+    text = name or ''
+    info = {"resolution": None, "source": None, "codec": None, "hdr": None, "year": None, "season": None, "episode": None, "complete": False, "title": ""}
+
+    m = _RESOLUTION_RE.search(text)
+    if m: info["resolution"] = _RESOLUTION_ALIASES.get(m.group(1).lower())
+
+    # "BluRay 1080p REMUX"、"蓝光原盘" 这类名称会同时命中多个来源，同样取等级最高的一项
+    source_hits = list(_source_matches(text))
+    for _, source in source_hits:
+        if info["source"] is None or _SOURCE_RANK.index(source) < _SOURCE_RANK.index(info["source"]): info["source"] = source
+
+    m = _CODEC_RE.search(text)
+    if m: info["codec"] = _CODEC_ALIASES.get(m.group(1).lower().replace('.', ''))
+
+    # 同时标注 HDR 与杜比视界的资源很常见，取等级最高的一项
+    for m in _HDR_RE.finditer(text):
+        hdr = _HDR_ALIASES.get((m.group(1) or m.group(2)).lower().replace('.', ''))
+        if info["hdr"] is None or _HDR_RANK.index(hdr) < _HDR_RANK.index(info["hdr"]): info["hdr"] = hdr
+
+    year_match = _YEAR_RE.search(text)
+    if year_match: info["year"] = int(year_match.group(1))
+
+    m = _SE_RE.search(text)
+    if m:
+        if m.group(1): info["season"], info["episode"] = int(m.group(1)), int(m.group(2))
+        elif m.group(3): info["season"] = int(m.group(3))
+        elif m.group(4): info["season"] = int(m.group(4))
+        else: info["episode"] = int(m.group(5))
+
+    info["complete"] = bool(_COMPLETE_RE.search(text))
+
+    # 标题取第一个年份/技术标签之前的部分
+    cut = len(text)
+    for regex in (_YEAR_RE, _RESOLUTION_RE, _SOURCE_RE, _SE_RE, _COMPLETE_RE):
+        if regex is _YEAR_RE: hit = year_match
+        elif regex is _SOURCE_RE: hit = source_hits[0][0] if source_hits else None
+        else: hit = regex.search(text)
+        if hit and 0 < hit.start() < cut: cut = hit.start()
+    info["title"] = text[:cut].strip(' .-_[]()【】')
+    return info
+
+def quality_score(info: dict) -> int:
+    """画质分 (0~100)，与旧版 QUALITY_MAP 的取最大值语义一致"""
+    return max(50, _RESOLUTION_QUALITY.get(info.get("resolution"), 0), _SOURCE_QUALITY.get(info.get("source"), 0))
+
+def load_profile(raw: str = "") -> dict:
+    """读取 system_configs 中的 JSON 择优配置，并覆盖到默认配置之上"""
+    profile = {k: (v.copy() if isinstance(v, dict) else v) for k, v in DEFAULT_PROFILE.items()}
+    if not raw: return profile
+    try: custom = json.loads(raw)
+    except ValueError: return profile
+    if not isinstance(custom, dict): return profile
+    for key, value in custom.items():
+        if isinstance(profile.get(key), dict) and isinstance(value, dict): profile[key].update(value)
+        elif key in profile: profile[key] = value
+    return profile
+
+def score_release(info: dict, profile: dict, year: int = None) -> int:
+    score = 0
+    if info["resolution"]: score += profile["resolution"].get(str(info["resolution"]), 0)
+    if info["source"]: score += profile["source"].get(info["source"], 0)
+    if info["codec"]: score += profile["codec"].get(info["codec"], 0)
+    if info["hdr"]: score += profile["hdr"].get(info["hdr"], 0)
+    if info["complete"]: score += profile["complete_pack"]
+    if year and info["year"]: score += profile["year_match"] if info["year"] == year else profile["year_mismatch"]
+    return score
+
+def rank_candidates(merged_by_type: dict, priorities: list, title: str = "", year: int = None, profile: dict = None) -> list:
+    """一次遍历所有网盘类型的候选资源，按择优配置打分并降序返回 [(score, p_type, item, info), ...]"""
+    profile = profile or DEFAULT_PROFILE
+    norm_title = normalize_title(title)
+    ranked = []
+    for idx, p_type in enumerate(priorities):
+        provider_bonus = (len(priorities) - idx - 1) * profile["provider_step"]
+        for item in merged_by_type.get(p_type) or []:
+            if not item.get("url"): continue
+            note = item.get("note", "") or ""
+            info = parse_release(note)
+            score = score_release(info, profile, year) + provider_bonus
+            if norm_title and norm_title in normalize_title(note): score += profile["title_match"]
+            if score < profile["min_score"]: continue
+            ranked.append((score, p_type, item, info))
+    # sort 稳定：同分时保留网盘优先级与盘搜返回的原始顺序
+    ranked.sort(key=lambda x: x[0], reverse=True)
+    return ranked
+
+def pick_best(merged_by_type: dict, priorities: list, title: str = "", year: int = None, profile: dict = None):
+    ranked = rank_candidates(merged_by_type, priorities, title, year, profile)
+    return ranked[0] if ranked else None
@@ -0,0 +1,147 @@
+import asyncio
+import random
+import time
+import httpx
+from logger import add_log
+from metrics import OUTBOUND_REQUESTS, OUTBOUND_LATENCY
+from job_report import current_report
+
+# ==================== 外部接口容错层：抖动指数退避 + 分渠道熔断 ====================
+# 每个外部渠道 (TMDB / 盘搜 / 夸克 / 阿里云 / 115 / CMS) 各持有一个熔断器。
+# 连续失败达到阈值后熔断器打开，冷却期内的请求直接失败，不再逐个等待超时；
+# 冷却期结束只放行一个探测请求 (半开)，成功即恢复，失败则重新熔断；探测期间其余请求仍被拒绝。
+
+TRANSIENT_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+# 渠道: (连续失败阈值, 熔断冷却秒数)
+PROVIDER_SETTINGS = {
+    "tmdb": (8, 60),
+    "pansou": (3, 300),
+    "quark": (5, 120),
+    "aliyun": (5, 120),
+    "115": (5, 300),
+    "cms": (3, 300),
+    "tmdb_image": (10, 60),
+}
+
+# 连接阶段超时单独压短，宕机的上游几秒内即可判定失败
+FAST_FAIL_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，请求被直接拒绝"""
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at = None  # 半开状态下探测请求的发出时间，None 表示没有探测在途
+
+    def allow(self) -> bool:
+        if self.state == "closed": return True
+        now = time.monotonic()
+        if self.state == "open":
+            if now - self.opened_at < self.recovery_timeout: return False
+            self._transition("half_open")
+        # 半开：同一时刻只放行一个探测；探测请求迟迟没有结果 (被取消等) 时，超过冷却时长再放行下一个
+        if self.probe_started_at is not None and now - self.probe_started_at < self.recovery_timeout: return False
+        self.probe_started_at = now
+        return True
+
+    def remaining(self) -> float:
+        return max(0.0, self.recovery_timeout - (time.monotonic() - self.opened_at)) if self.state == "open" else 0.0
+
+    def record_success(self):
+        self.failures = 0
+        self.probe_started_at = None
+        if self.state != "closed": self._transition("closed")
+
+    def abandon_probe(self):
+        """请求被取消等无法判定结果时，释放半开探测名额，不计成功也不计失败"""
+        self.probe_started_at = None
+
+    def record_failure(self, reason: str = ""):
+        self.failures += 1
+        self.probe_started_at = None
+        if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+            self.opened_at = time.monotonic()
+            self._transition("open", reason)
+
+    def _transition(self, state: str, reason: str = ""):
+        self.state = state
+        if state == "open":
+            add_log("ERROR", f"⚡ 【熔断】{self.name} 连续失败 {self.failures} 次，熔断 {int(self.recovery_timeout)} 秒，期间请求将直接跳过。{reason}")
+        elif state == "half_open":
+            add_log("WARNING", f"⚡ 【熔断】{self.name} 冷却结束，放行探测请求 (半开)。")
+        else:
+            add_log("INFO", f"⚡ 【熔断】{self.name} 已恢复正常，熔断器关闭。")
+
+_breakers = {}
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    breaker = _breakers.get(provider)
+    if breaker is None:
+        threshold, cooldown = PROVIDER_SETTINGS.get(provider, (5, 60))
+        breaker = _breakers.setdefault(provider, CircuitBreaker(provider, threshold, cooldown))
+    return breaker
+
+def is_available(provider: str) -> bool:
+    breaker = _breakers.get(provider)
+    return breaker is None or breaker.state != "open" or breaker.remaining() == 0
+
+def backoff_delay(attempt: int, base_delay: float = 0.5, max_delay: float = 8.0) -> float:
+    """Full jitter：在 [0, base * 2^attempt] 区间内随机取值，避免多个请求同时重试"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+async def resilient_request(provider: str, client: httpx.AsyncClient, method: str, url: str,
+                            retries: int = 2, idempotent: bool = True, base_delay: float = 0.5, max_delay: float = 8.0, **kwargs) -> httpx.Response:
+    """
+    经过熔断器的 HTTP 请求。网络错误与 408/429/5xx 视为瞬时错误并按抖动指数退避重试。
+    非幂等请求 (如转存) 只在连接建立失败时重试，避免重复提交。
+    最终失败时抛出原始异常；熔断打开时抛出 CircuitOpenError。
+    """
+    breaker = get_breaker(provider)
+    report = current_report.get()
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            OUTBOUND_REQUESTS.inc(provider, "circuit_open")
+            raise CircuitOpenError(f"{provider} 接口熔断中 (剩余 {int(breaker.remaining())} 秒)")
+        start = time.perf_counter()
+        if report: report.request_started()
+        # 结果统一在 finally 中记录：解码失败、重定向过多、任务取消等任何退出路径都会让在途计数归还
+        outcome, nbytes = "error", 0
+        try:
+            res = await client.request(method, url, **kwargs)
+            if res.status_code in TRANSIENT_STATUS:
+                raise httpx.HTTPStatusError(f"HTTP {res.status_code}", request=res.request, response=res)
+            outcome, nbytes = "ok", len(res.content)
+        except (httpx.TransportError, httpx.HTTPStatusError) as e:
+            breaker.record_failure(f"最近错误: {type(e).__name__} {str(e)[:80]}")
+            retryable = idempotent or isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+            if attempt < retries and retryable: outcome = "retry"
+            else: raise
+        except httpx.RequestError as e:
+            breaker.record_failure(f"最近错误: {type(e).__name__} {str(e)[:80]}")
+            raise
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            breaker.abandon_probe()
+            raise
+        except Exception:
+            breaker.abandon_probe()
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            OUTBOUND_LATENCY.observe(elapsed, provider)
+            OUTBOUND_REQUESTS.inc(provider, outcome)
+            if report: report.record_request(provider, elapsed, outcome, nbytes)
+        if outcome == "retry":
+            await asyncio.sleep(backoff_delay(attempt, base_delay, max_delay))
+            attempt += 1
+            continue
+        breaker.record_success()
+        return res
@@ -1,53 +1,32 @@
 import httpx
 import asyncio
 import datetime
-import random
-import re
-from database import get_db, get_sys_config
+from database import get_db, get_sys_config, invalidate_sys_config, invalidate_media_counts, upsert_media_items
 from logger import add_log
-
-QUALITY_MAP = {"4k": 100, "2160p": 100, "uhd": 100, "1080p": 80, "fhd": 80, "bdrip": 75, "720p": 60, "remux": 95}
-
-VALID_VIDEO_EXTS = (
-    '.mp4', '.mkv', '.avi', '.mov', '.flv', '.wmv', '.ts', '.m2ts', 
-    '.rmvb', '.iso', '.vob', '.webm', '.srt', '.ass', '.sub', '.nfo'
-)
+from release_parser import parse_release, quality_score, load_profile, pick_best
+from library_index import lookup_best_version
+from resilience import resilient_request, is_available, CircuitOpenError, FAST_FAIL_TIMEOUT
+from drive_api import QuarkDrive, AliyunDrive
+from poster_cache import start_prefetch
+from metrics import SUB_OUTCOMES
+from job_report import JobReport, current_report
+from leases import job_lock
 
 def get_quality_score(text: str) -> int:
-    text = text.lower()
-    score = 50 
-    for key, weight in QUALITY_MAP.items():
-        if key in text: score = max(score, weight)
-    return score
+    return quality_score(parse_release(text))
 
 # ==================== 115网盘模块 ====================
 async def check_115_existing_quality(cookie: str, title: str):
+    # 直接查询本地 115 资产索引 (由 library_index 定期刷新)，不再逐条调用 files/search
     if not cookie: return None, 0
-    await asyncio.sleep(random.uniform(0.2, 0.5))
-    search_url = f"https://webapi.115.com/files/search?search_value={title}"
-    headers = {"Cookie": cookie, "User-Agent": "Mozilla/5.0"}
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        try:
-            res = await client.get(search_url, headers=headers)
-            res_data = res.json()
-            if res_data.get("state") and res_data.get("data"):
-                file_list = res_data["data"]
-                if not file_list: return None, 0
-                best_match, max_score = None, 0
-                for f in file_list:
-                    name = f.get("n", "")
-                    score = get_quality_score(name)
-                    if score > max_score: max_score = score; best_match = name
-                return best_match, max_score
-        except Exception: pass
-    return None, 0
+    return lookup_best_version(title)
 
 async def push_to_cms(cms_url: str, cms_token: str, link: str):
     api_endpoint = f"{cms_url.rstrip('/')}/api/cloud/add_share_down_by_token"
     payload = {"url": link, "token": cms_token}
-    async with httpx.AsyncClient(timeout=20.0) as client:
+    async with httpx.AsyncClient(timeout=FAST_FAIL_TIMEOUT) as client:
         try:
-            res = await client.post(api_endpoint, json=payload)
+            res = await resilient_request("cms", client, "POST", api_endpoint, idempotent=False, json=payload)
             res_json = res.json()
             if res_json.get("code") == 200: return True, res_json.get("msg")
             return False, res_json.get("msg", "未知错误")
@@ -55,117 +34,45 @@ async def push_to_cms(cms_url: str, cms_token: str, link: str):
 
 # ==================== 夸克网盘模块 ====================
 async def push_to_quark(cookie: str, share_url: str, passcode: str = "", save_dir: str = "0"):
-    if not cookie: return False, "未配置夸克Cookie"
-    match = re.search(r'/s/([a-zA-Z0-9]+)', share_url)
-    if not match: return False, "无法解析夸克分享链接"
-    pwd_id = match.group(1)
-    
-    clean_save_dir = save_dir.split('-')[0].strip() if save_dir else "0"
-    
-    headers = {
-        "cookie": cookie, 
-        "content-type": "application/json",
-        "referer": f"https://pan.quark.cn/s/{pwd_id}",
-        "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
-    }
-    
-    async with httpx.AsyncClient(timeout=20.0) as client:
-        try:
-            token_url = "https://pan.quark.cn/1/clouddrive/share/sharepage/token"
-            token_payload = {"pwd_id": pwd_id, "passcode": passcode}
-            info_res = await client.post(token_url, json=token_payload, headers=headers)
-            info_data = info_res.json()
-            if info_data.get("code") != 0: return False, f"夸克解析失败: {info_data.get('message', '未知错误')}"
-            stoken = info_data.get("data", {}).get("stoken")
-            if not stoken: return False, "未能提取 stoken"
-
-            detail_url = "https://pan.quark.cn/1/clouddrive/share/sharepage/detail"
-            detail_params = {"pwd_id": pwd_id, "stoken": stoken, "pdir_fid": "0"}
-            detail_res = await client.get(detail_url, params=detail_params, headers=headers)
-            detail_data = detail_res.json()
-            if detail_data.get("code") != 0: return False, f"获取文件列表失败: {detail_data.get('message', '未知错误')}"
-            file_list = detail_data.get("data", {}).get("list", [])
-            if not file_list: return False, "分享内无文件或为空目录"
-            
-            filtered_list = []
-            for f in file_list:
-                fname = f.get("file_name", "").lower()
-                is_folder = f.get("file_type") == 0 
-                if is_folder or fname.endswith(VALID_VIDEO_EXTS):
-                    filtered_list.append(f)
-            
-            if not filtered_list: return False, "分享链接内未找到视频格式文件 (可能为压缩包或无关引流文件)"
-            
-            fid_list = [f["fid"] for f in filtered_list]
-            fid_token_list = [f["share_fid_token"] for f in filtered_list]
-            
-            save_url = "https://drive-pc.quark.cn/1/clouddrive/share/sharepage/save"
-            params = {"pr": "ucpro", "fr": "pc", "uc_param_str": "", "app": "clouddrive", "__dt": int(random.uniform(1, 5) * 60 * 1000), "__t": int(datetime.datetime.now().timestamp() * 1000)}
-            payload = {"fid_list": fid_list, "fid_token_list": fid_token_list, "to_pdir_fid": clean_save_dir, "pwd_id": pwd_id, "stoken": stoken, "pdir_fid": "0", "scene": "link"}
-            res = await client.post(save_url, params=params, json=payload, headers=headers)
-            res_json = res.json()
-            if res_json.get("code") == 0: return True, "夸克文件转存成功"
-            else: return False, res_json.get("message", "转存被拒绝")
-        except Exception as e: return False, f"夸克 API 异常: {str(e)}"
+    # 递归展开分享目录，只转存视频与字幕文件 (见 drive_api.plan_share_transfer)
+    return await QuarkDrive(cookie).save_share(share_url, passcode, save_dir)
 
 # ==================== 阿里云盘模块 ====================
 async def push_to_aliyun(refresh_token: str, share_url: str, passcode: str = "", save_dir: str = "root"):
     if not refresh_token: return False, "未配置阿里云盘 Refresh Token"
-    match = re.search(r'/s/([a-zA-Z0-9]+)', share_url)
-    if not match: return False, "无法解析阿里云盘分享链接"
-    share_id = match.group(1)
-    clean_save_dir = save_dir.split('-')[0].strip() if save_dir else "root"
-
-    async with httpx.AsyncClient(timeout=20.0) as client:
-        try:
-            refresh_res = await client.post("https://api.aliyundrive.com/token/refresh", json={"refresh_token": refresh_token})
-            refresh_data = refresh_res.json()
-            if "access_token" not in refresh_data: return False, "Token 刷新失败"
-            access_token = refresh_data["access_token"]
-            drive_id = refresh_data.get("default_drive_id")
-            auth_header = {"Authorization": f"Bearer {access_token}"}
-            
-            st_res = await client.post("https://api.aliyundrive.com/v2/share_link/get_share_token", json={"share_id": share_id, "share_pwd": passcode})
-            share_token = st_res.json().get("share_token")
-            if not share_token: return False, "获取 Share Token 失败"
-
-            info_res = await client.post(f"https://api.aliyundrive.com/adrive/v3/share_link/get_share_by_anonymous?share_id={share_id}", json={"share_id": share_id}, headers=auth_header)
-            file_infos = info_res.json().get("file_infos", [])
-            if not file_infos: return False, "分享链接内无文件"
-            
-            requests_list = []
-            idx = 0
-            for f in file_infos:
-                fname = f.get("name", "").lower()
-                is_folder = f.get("type") == 'folder'
-                if is_folder or fname.endswith(VALID_VIDEO_EXTS):
-                    requests_list.append({
-                        "body": {"file_id": f["file_id"], "share_id": share_id, "auto_rename": True, "to_parent_file_id": clean_save_dir, "to_drive_id": drive_id},
-                        "headers": {"Content-Type": "application/json"}, "id": str(idx), "method": "POST", "url": "/file/copy"
-                    })
-                    idx += 1
-            
-            if not requests_list: return False, "分享链接内未找到视频格式文件 (可能为压缩包或无关引流文件)"
-                
-            batch_res = await client.post("https://api.aliyundrive.com/adrive/v2/batch", json={"requests": requests_list, "resource": "file"}, headers={"Authorization": f"Bearer {access_token}", "x-share-token": share_token})
-            if batch_res.status_code in [200, 202]: return True, "阿里云盘文件极速转存成功"
-            else: return False, "阿里云盘转存被拒绝"
-        except Exception as e: return False, f"阿里云盘 API 异常: {str(e)}"
+    # 复用进程级 Token 缓存，与网盘管理页面共享同一个 access_token 与轮换后的 refresh_token
+    return await AliyunDrive(refresh_token).save_share(share_url, passcode, save_dir)
 
 # ==================== TMDB 数据采集 ====================
 # 增加 mode 参数，精确区分“只采前10页热门”和“首次补全500页基础库”
 async def sync_tmdb_data(force=False, mode="all"):
+    # 本次同步期间经 resilient_request 发出的请求都会记入该报告
+    report = JobReport("tmdb_sync", mode)
+    token = current_report.set(report)
+    try:
+        # 多 worker 部署时同一时刻只允许一个进程同步
+        async with job_lock("tmdb_sync") as acquired:
+            if not acquired:
+                add_log("INFO", f"【库同步】已有同步任务在其他进程运行中，本次 ({mode}) 跳过。")
+                return
+            ran = await _sync_tmdb_data(force, mode, report)
+    finally: current_report.reset(token)
+    if ran is False: return
+    try: report.save()
+    except Exception as e: add_log("WARNING", f"【库同步】运行报告保存失败: {str(e)}")
+
+async def _sync_tmdb_data(force, mode, report: JobReport):
     config = get_sys_config()
     api_key = config.get('api_key')
     
     if not api_key: 
         add_log("WARNING", "【库同步】跳过：未配置 TMDB API Key。")
-        return
+        return False
 
     today_str = datetime.date.today().isoformat()
     # 如果不是强制且今天已同步，并且是全量日常定时任务，则跳过
     if not force and config.get('last_sync_date') == today_str and mode == "all": 
-        return 
+        return False
 
     conn = get_db()
     count = conn.execute("SELECT COUNT(*) FROM media_items").fetchone()[0]
@@ -173,8 +80,9 @@ async def sync_tmdb_data(force=False, mode="all"):
 
     base_url = config.get('api_domain', 'https://api.tmdb.org').rstrip('/')
     items = []
+    failed_pages = []
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
+    async with httpx.AsyncClient(timeout=FAST_FAIL_TIMEOUT) as client:
         try:
             # 1. 【今日热门】模式：只采集前 10 页
             if mode in ["all", "trending"]:
@@ -183,12 +91,13 @@ async def sync_tmdb_data(force=False, mode="all"):
                 async def fetch_trend(m_type, window, page):
                     try:
                         url = f"{base_url}/3/trending/{m_type}/{window}"
-                        r = await client.get(url, params={"api_key": api_key, "language": "zh-CN", "page": page})
+                        r = await resilient_request("tmdb", client, "GET", url, params={"api_key": api_key, "language": "zh-CN", "page": page})
                         if r.status_code == 200:
                             res_data = r.json().get('results', [])
                             for m in res_data: m['media_type'] = m_type
                             return res_data
                     except Exception: pass
+                    failed_pages.append(f"trending/{m_type}#{page}")
                     return []
 
                 trend_tasks = []
@@ -197,7 +106,7 @@ async def sync_tmdb_data(force=False, mode="all"):
                         for p in range(1, 11): 
                             trend_tasks.append(fetch_trend(t, w, p))
                 
-                trend_results = await asyncio.gather(*trend_tasks)
+                with report.phase("trending"): trend_results = await asyncio.gather(*trend_tasks)
                 for res_arr in trend_results:
                     items.extend(res_arr)
 
@@ -208,25 +117,34 @@ async def sync_tmdb_data(force=False, mode="all"):
                 async def fetch_page(m_type, page):
                     async with sem:
                         try:
-                            res = await client.get(f"{base_url}/3/{m_type}/popular", params={"api_key": api_key, "language": "zh-CN", "page": page})
+                            res = await resilient_request("tmdb", client, "GET", f"{base_url}/3/{m_type}/popular", params={"api_key": api_key, "language": "zh-CN", "page": page})
                             if res.status_code == 200:
                                 res_items = res.json().get('results', [])
                                 for r in res_items: r['media_type'] = m_type
                                 return res_items
                         except Exception: pass
+                        failed_pages.append(f"{m_type}/popular#{page}")
                         return []
 
-                tasks_m = [fetch_page('movie', p) for p in range(1, 501)]
-                for i in range(0, 500, 100):
-                    res_list = await asyncio.gather(*tasks_m[i:i+100])
-                    for r in res_list: items.extend(r)
-                    add_log("INFO", f"【库同步】电影库已处理 {min(i+100, 500)} 页...")
+                with report.phase("popular_movie"):
+                    tasks_m = [fetch_page('movie', p) for p in range(1, 501)]
+                    for i in range(0, 500, 100):
+                        res_list = await asyncio.gather(*tasks_m[i:i+100])
+                        for r in res_list: items.extend(r)
+                        add_log("INFO", f"【库同步】电影库已处理 {min(i+100, 500)} 页...")
+
+                with report.phase("popular_tv"):
+                    tasks_t = [fetch_page('tv', p) for p in range(1, 501)]
+                    for i in range(0, 500, 100):
+                        res_list = await asyncio.gather(*tasks_t[i:i+100])
+                        for r in res_list: items.extend(r)
+                        add_log("INFO", f"【库同步】剧集库已处理 {min(i+100, 500)} 页...")
 
-                tasks_t = [fetch_page('tv', p) for p in range(1, 501)]
-                for i in range(0, 500, 100):
-                    res_list = await asyncio.gather(*tasks_t[i:i+100])
-                    for r in res_list: items.extend(r)
-                    add_log("INFO", f"【库同步】剧集库已处理 {min(i+100, 500)} 页...")
+            report.add("items_fetched", len(items))
+            report.add("pages_failed", len(failed_pages))
+            if failed_pages:
+                report.status = "partial"
+                add_log("WARNING", f"【库同步】有 {len(failed_pages)} 页在重试后仍拉取失败 (如 {', '.join(failed_pages[:5])})，本次数据不完整，下次调度将重新同步。")
 
             unique_items = {item['id']: item for item in items if item.get('id')}.values()
             if not unique_items: return
@@ -236,14 +154,16 @@ async def sync_tmdb_data(force=False, mode="all"):
                 title = item.get('title') or item.get('name')
                 poster = item.get('poster_path')
                 if not title or not poster: continue
-                insert_data.append((item['id'], item.get('media_type', 'movie'), title, item.get('overview', ''), poster, today_str))
+                date = item.get('release_date') or item.get('first_air_date') or ''
+                insert_data.append((item['id'], item.get('media_type', 'movie'), title, item.get('overview', ''), poster, today_str, int(date[:4]) if date[:4].isdigit() else None))
 
             conn = get_db()
             cursor = conn.cursor()
-            cursor.executemany('''INSERT OR REPLACE INTO media_items (tmdb_id, media_type, title, overview, poster_path, add_date) VALUES (?, ?, ?, ?, ?, ?)''', insert_data)
+            with report.phase("upsert"): new_posters = upsert_media_items(conn, insert_data)
+            report.add("items_upserted", len(insert_data))
             
-            # 只有全量同步时才刷新今日的同步状态标识
-            if mode == "all":
+            # 只有全量同步且所有页面都拉取成功时才刷新今日的同步状态标识
+            if mode == "all" and not failed_pages:
                 cursor.execute("REPLACE INTO system_configs (config_key, config_value) VALUES ('last_sync_date', ?)", (today_str,))
             
             # 【防止自动订阅爆炸】只有日常定时更新（库已满）且抓取了每日热点时，才将当天的数据丢入自动订阅。
@@ -255,12 +175,54 @@ async def sync_tmdb_data(force=False, mode="all"):
 
             conn.commit()
             conn.close()
-            add_log("INFO", f"【库同步】执行完毕 (模式: {mode})，系统运转流畅！")
+            invalidate_sys_config()
+            invalidate_media_counts()
+            # 新入库 (或更换了海报) 的影视海报在后台预热到本地缓存，发现页首屏无需再回源
+            if new_posters: start_prefetch(new_posters)
+            if failed_pages: add_log("WARNING", f"【库同步】执行完毕 (模式: {mode})，部分页面缺失，已入库 {len(insert_data)} 条。")
+            else: add_log("INFO", f"【库同步】执行完毕 (模式: {mode})，系统运转流畅！")
         except Exception as e:
+            report.status = "error"
             add_log("ERROR", f"【库同步】严重异常: {str(e)}")
 
+# ==================== 订阅重试调度 ====================
+def _retry_settings(config: dict):
+    try: max_attempts = max(1, int(config.get('sub_max_attempts', '6') or 6))
+    except ValueError: max_attempts = 6
+    try: base_hours = max(0.1, float(config.get('sub_retry_base_hours', '6') or 6))
+    except ValueError: base_hours = 6.0
+    return max_attempts, base_hours
+
+def mark_sub_success(tmdb_id: int):
+    conn = get_db()
+    conn.execute("UPDATE subscriptions SET status='success', last_error=NULL, last_tried_at=?, next_retry_at='' WHERE tmdb_id=?",
+                 (datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), tmdb_id))
+    conn.commit(); conn.close()
+    SUB_OUTCOMES.inc("success")
+
+def mark_sub_failure(tmdb_id: int, attempts: int, error: str, max_attempts: int, base_hours: float):
+    """记录一次失败尝试：按指数退避安排下次重试，达到上限后转为终态 not_found"""
+    now = datetime.datetime.now()
+    attempts += 1
+    delay = datetime.timedelta(hours=min(base_hours * (2 ** (attempts - 1)), 24 * 7))
+    status = 'not_found' if attempts >= max_attempts else 'pending'
+    conn = get_db()
+    conn.execute("UPDATE subscriptions SET status=?, attempts=?, last_error=?, last_tried_at=?, next_retry_at=? WHERE tmdb_id=?",
+                 (status, attempts, error[:500], now.strftime("%Y-%m-%d %H:%M:%S"), (now + delay).strftime("%Y-%m-%d %H:%M:%S"), tmdb_id))
+    conn.commit(); conn.close()
+    SUB_OUTCOMES.inc("not_found" if status == 'not_found' else "retry")
+    return status
+
 # ==================== 调度主循环 ====================
 async def auto_subscription_task():
+    # 定时调度与手动触发共用同一把跨进程锁，避免同一批订阅被重复转存
+    async with job_lock("auto_subscription") as lock:
+        if not lock:
+            add_log("INFO", "【定时任务】订阅搜刮任务已在运行中，本次触发跳过。")
+            return
+        await _auto_subscription_task(lock)
+
+async def _auto_subscription_task(lock):
     config = get_sys_config()
     api_key = config.get('api_key', '').strip()
     auto_subscribe = str(config.get('auto_subscribe_new', '0'))
@@ -281,18 +243,41 @@ async def auto_subscription_task():
     
     quark_save_dir = config.get('quark_save_dir', '0')
     aliyun_save_dir = config.get('aliyun_save_dir', 'root')
+    profile = load_profile(config.get('release_profile', ''))
+    max_attempts, base_hours = _retry_settings(config)
 
+    # 只取已到重试时间的订阅 (走 status + next_retry_at 索引)，每轮工作量只与真正可重试的条目成正比
+    now_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     conn = get_db()
-    subs = conn.execute("SELECT s.tmdb_id, s.drive_type, m.title FROM subscriptions s JOIN media_items m ON s.tmdb_id = m.tmdb_id WHERE s.status = 'pending'").fetchall()
+    subs = conn.execute('''SELECT s.tmdb_id, s.drive_type, s.attempts, m.title, m.year FROM subscriptions s JOIN media_items m ON s.tmdb_id = m.tmdb_id
+                           WHERE s.status = 'pending' AND s.next_retry_at <= ? ORDER BY s.next_retry_at, s.id''', (now_str,)).fetchall()
     conn.close()
-    if not subs: return
+    if not subs:
+        add_log("INFO", "【定时任务】当前没有到期需要重试的订阅。")
+        return
+    add_log("INFO", f"【定时任务】本轮共有 {len(subs)} 条订阅到期待搜刮。")
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        for sub in subs:
-            tmdb_id, title, drive_type = sub['tmdb_id'], sub['title'], sub['drive_type']
+    drive_provider = {"quark": "quark", "aliyun": "aliyun"}
+    async with httpx.AsyncClient(timeout=FAST_FAIL_TIMEOUT) as client:
+        for idx, sub in enumerate(subs):
+            tmdb_id, title, drive_type, attempts = sub['tmdb_id'], sub['title'], sub['drive_type'], sub['attempts'] or 0
+            # 任务锁已被其他进程接管时立即停止，剩余订阅交给新的持有者，避免同一资源被重复转存
+            if not lock:
+                SUB_OUTCOMES.inc("deferred", amount=len(subs) - idx)
+                add_log("WARNING", "【定时任务】订阅任务锁已失效，本轮剩余订阅交由其他进程处理。")
+                break
+            # 盘搜熔断时本轮剩余订阅全部无法搜刮，直接结束，避免逐条等待超时
+            if not is_available("pansou"):
+                SUB_OUTCOMES.inc("deferred", amount=len(subs) - idx)
+                add_log("WARNING", "【定时任务】盘搜接口处于熔断状态，本轮剩余订阅顺延至下次调度。")
+                break
+            if not is_available(drive_provider.get(drive_type, "cms")):
+                SUB_OUTCOMES.inc("deferred")
+                add_log("WARNING", f"【搜刮】跳过《{title}》：目标渠道 {drive_type} 处于熔断状态。")
+                continue
             add_log("INFO", f"【搜刮】执行中: 《{title}》 目标网盘: {drive_type}")
             try:
-                ps_res = await client.post(f"{pansou_domain.rstrip('/')}/api/search", json={"kw": title})
+                ps_res = await resilient_request("pansou", client, "POST", f"{pansou_domain.rstrip('/')}/api/search", json={"kw": title})
                 data = ps_res.json().get("data", {}).get("merged_by_type", {})
                 
                 if drive_type == 'quark': priorities = ["quark"]
@@ -300,14 +285,13 @@ async def auto_subscription_task():
                 else: priorities = ["115", "aliyun", "ed2k", "magnet"]
                     
                 best_link, hit_type, new_note, best_pwd = None, None, "", ""
-                for p_type in priorities:
-                    if data.get(p_type) and len(data[p_type]) > 0:
-                        item = data[p_type][0]
-                        best_link = item["url"]
-                        hit_type = p_type
-                        new_note = item.get("note", "")
-                        best_pwd = item.get("password", "") or item.get("pwd", "")
-                        break
+                best = pick_best(data, priorities, title, sub['year'], profile=profile)
+                if best:
+                    best_score, hit_type, item, info = best
+                    best_link = item["url"]
+                    new_note = item.get("note", "")
+                    best_pwd = item.get("password", "") or item.get("pwd", "")
+                    add_log("INFO", f"【择优】《{title}》最佳候选 ({hit_type}, 评分 {best_score}, {info['resolution'] or '未知'}P/{info['source'] or '未知来源'}): {new_note[:60]}")
                 
                 if best_link:
                     success, msg = False, ""
@@ -326,17 +310,25 @@ async def auto_subscription_task():
                         new_score = get_quality_score(new_note or title)
                         if ex_file and ex_score >= new_score:
                             add_log("INFO", f"【跳过】网盘已有极佳版本: {ex_file}")
-                            conn = get_db(); conn.execute("UPDATE subscriptions SET status='success' WHERE tmdb_id=?", (tmdb_id,)); conn.commit(); conn.close()
+                            mark_sub_success(tmdb_id)
                             continue
                         success, msg = await push_to_cms(cms_url, cms_token, best_link)
 
                     if success:
                         add_log("SUCCESS", f"【成功】《{title}》已入库 ({hit_type})")
-                        conn = get_db(); conn.execute("UPDATE subscriptions SET status='success' WHERE tmdb_id=?", (tmdb_id,)); conn.commit(); conn.close()
+                        mark_sub_success(tmdb_id)
                     else:
                         add_log("ERROR", f"【失败】{msg}")
+                        mark_sub_failure(tmdb_id, attempts, f"转存失败: {msg}", max_attempts, base_hours)
                 else:
-                    add_log("WARN", f"【搜刮】全网未找到符合 {drive_type} 的《{title}》资源。")
+                    status = mark_sub_failure(tmdb_id, attempts, "全网未找到符合条件的资源", max_attempts, base_hours)
+                    if status == 'not_found': add_log("WARN", f"【搜刮】《{title}》已连续 {attempts + 1} 次未找到 {drive_type} 资源，标记为未找到，停止自动重试。")
+                    else: add_log("WARN", f"【搜刮】全网未找到符合 {drive_type} 的《{title}》资源 (第 {attempts + 1} 次)，已按退避策略安排下次重试。")
+            except CircuitOpenError as e:
+                SUB_OUTCOMES.inc("deferred")
+                add_log("WARNING", f"【熔断】《{title}》本次跳过: {str(e)}")
+                continue
             except Exception as e: 
                 add_log("ERROR", f"【异常】: {str(e)}")
+                mark_sub_failure(tmdb_id, attempts, f"异常: {str(e)}", max_attempts, base_hours)
             await asyncio.sleep(2)
\ No newline at end of file
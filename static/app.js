@@ -17,8 +17,10 @@ const app = createApp({
         const driveLoading = ref(false);
         const drivePaths = ref([]); 
         const currentDriveType = ref(''); 
+        const driveNextCursor = ref(null);
+        const driveSelection = ref([]);
         
-        const config = ref({ api_domain: '', image_domain: '', api_key: '', pansou_domain: '', cookie_115: '', cookie_quark: '', token_aliyun: '', quark_save_dir: '0', aliyun_save_dir: 'root', cron_expression: '', cms_api_url: '', cms_api_token: '', auto_subscribe_new: '0', auto_subscribe_drive: '115' });
+        const config = ref({ api_domain: '', image_domain: '', api_key: '', pansou_domain: '', cookie_115: '', cookie_quark: '', token_aliyun: '', quark_save_dir: '0', aliyun_save_dir: 'root', cron_expression: '', cms_api_url: '', cms_api_token: '', auto_subscribe_new: '0', auto_subscribe_drive: '115', release_profile: '', library_115_cids: '0', library_115_ttl_hours: '12' });
         
         const pv = ref(false), pr = ref({}), curKw = ref('');
         const curMedia = ref(null), savingLink = ref(false); 
@@ -26,15 +28,31 @@ const app = createApp({
 
         const autoRefreshLogs = ref(true);
         const logTimer = ref(null);
+        const logSource = ref(null);
+        const lastLogId = () => systemLogs.value.length ? systemLogs.value[0].id : 0;
+        const pushLogs = (rows) => {
+            const known = lastLogId();
+            const fresh = rows.filter(r => r.id > known).sort((a, b) => b.id - a.id);
+            if (fresh.length) systemLogs.value = fresh.concat(systemLogs.value).slice(0, 100);
+        };
 
+        // 优先使用 SSE 推送新日志；浏览器不支持时退化为 since_id 增量轮询
         const startLogPoll = () => {
-            if (logTimer.value) clearInterval(logTimer.value);
-            if (autoRefreshLogs.value && activeMenu.value === 'logs') {
-                logTimer.value = setInterval(loadLogs, 2000); 
+            stopLogPoll();
+            if (!autoRefreshLogs.value || activeMenu.value !== 'logs') return;
+            if (window.EventSource) {
+                logSource.value = new EventSource(`${API_BASE}/logs/stream?since_id=${lastLogId()}`);
+                logSource.value.onmessage = (e) => { try { pushLogs([JSON.parse(e.data)]); } catch (err) {} };
+            } else {
+                logTimer.value = setInterval(async () => { try { const r = await axios.get(`${API_BASE}/logs`, { params: { since_id: lastLogId() } }); pushLogs(r.data); } catch (e) {} }, 2000);
             }
         };
 
         const stopLogPoll = () => {
+            if (logSource.value) {
+                logSource.value.close();
+                logSource.value = null;
+            }
             if (logTimer.value) {
                 clearInterval(logTimer.value);
                 logTimer.value = null;
@@ -54,13 +72,18 @@ const app = createApp({
         const loadConfig = async () => { try { const r = await axios.get(`${API_BASE}/config`); config.value = { ...config.value, ...r.data }; } catch (e) {} };
         const saveConfig = async () => { try { await axios.post(`${API_BASE}/config`, config.value); ElMessage.success('配置已保存'); } catch (e) { ElMessage.error('保存失败'); } };
 
+        // 记录每一页的键集游标 (上一页返回的 next_cursor)，顺序翻页时走游标，跳页时服务端退回 OFFSET
+        const mediaPageCursors = {};
         const loadLocalMedia = async (t, page = 1) => { 
             loading.value = true; 
+            if (page === 1) Object.keys(mediaPageCursors).forEach(k => { if (k.startsWith(`${t}:`)) delete mediaPageCursors[k]; });
             try { 
-                const r = await axios.get(`${API_BASE}/local_media`, { params: { type: t, page: page, size: pageSize.value } }); 
+                const cursor = mediaPageCursors[`${t}:${page}`] || null;
+                const r = await axios.get(`${API_BASE}/local_media`, { params: { type: t, page: page, size: pageSize.value, cursor } }); 
                 if (r.data && typeof r.data.items !== 'undefined') { 
                     lm.value = r.data.items; 
                     totalItems.value = r.data.total; 
+                    if (r.data.next_cursor) mediaPageCursors[`${t}:${page + 1}`] = r.data.next_cursor; 
                 } else if (Array.isArray(r.data)) { 
                     lm.value = r.data; 
                     totalItems.value = r.data.length; 
@@ -80,17 +103,33 @@ const app = createApp({
         };
         
         const handlePageChange = (val) => loadLocalMedia(activeMenu.value, val);
-        const loadSubscriptions = async () => { try { const r = await axios.get(`${API_BASE}/subscriptions`, { params: { status: 'pending' } }); subscriptions.value = r.data; } catch (e) {} };
+        const subStatusFilter = ref('pending');
+        const loadSubscriptions = async () => { try { const r = await axios.get(`${API_BASE}/subscriptions`, { params: { status: subStatusFilter.value } }); subscriptions.value = r.data; } catch (e) {} };
         const loadRecords = async () => { try { const r = await axios.get(`${API_BASE}/subscriptions`, { params: { status: 'success' } }); records.value = r.data; } catch (e) {} };
         const loadLogs = async () => { try { const r = await axios.get(`${API_BASE}/logs`); systemLogs.value = r.data; } catch (e) {} };
 
-        const fetchDriveFiles = async (parentId) => { driveLoading.value = true; try { const r = await axios.post(`${API_BASE}/drive/list`, { drive_type: currentDriveType.value, parent_id: parentId }); if(r.data.code === 200) driveFiles.value = r.data.data; else ElMessage.error(r.data.msg); } finally { driveLoading.value = false; } };
+        const fetchDriveFiles = async (parentId, append = false, refresh = false) => { 
+            driveLoading.value = true; 
+            try { 
+                const r = await axios.post(`${API_BASE}/drive/list`, { drive_type: currentDriveType.value, parent_id: parentId, cursor: append ? driveNextCursor.value : null, refresh }); 
+                if (r.data.code === 200) { 
+                    driveFiles.value = append ? driveFiles.value.concat(r.data.data) : r.data.data; 
+                    driveNextCursor.value = r.data.next_cursor || null; 
+                } else ElMessage.error(r.data.msg); 
+            } finally { driveLoading.value = false; } 
+        };
+        const currentDriveDir = () => drivePaths.value[drivePaths.value.length - 1].id;
+        const refreshDriveFiles = () => fetchDriveFiles(currentDriveDir(), false, true);
+        const loadMoreDriveFiles = () => { if (driveNextCursor.value && !driveLoading.value) fetchDriveFiles(drivePaths.value[drivePaths.value.length - 1].id, true); };
         const initDriveView = (type) => { currentDriveType.value = type; const rootId = type === 'quark' ? '0' : 'root'; drivePaths.value = [{ id: rootId, name: '全部文件' }]; fetchDriveFiles(rootId); };
         const clickDriveBreadcrumb = (index) => { drivePaths.value = drivePaths.value.slice(0, index + 1); fetchDriveFiles(drivePaths.value[index].id); };
         const openDriveFolder = (row) => { if (!row.is_folder) return; drivePaths.value.push({ id: row.id, name: row.name }); fetchDriveFiles(row.id); };
         const promptMkdir = async () => { try { const { value } = await msgBox.prompt('请输入文件夹名称', '新建'); if (value) { const pid = drivePaths.value[drivePaths.value.length - 1].id; const r = await axios.post(`${API_BASE}/drive/action`, { drive_type: currentDriveType.value, action: 'mkdir', file_id: pid, new_name: value }); if (r.data.code === 200) fetchDriveFiles(pid); } } catch(e){} };
-        const promptRename = async (row) => { try { const { value } = await msgBox.prompt('请输入新名称', '重命名', { inputValue: row.name }); if (value) { const r = await axios.post(`${API_BASE}/drive/action`, { drive_type: currentDriveType.value, action: 'rename', file_id: row.id, new_name: value }); if (r.data.code === 200) fetchDriveFiles(drivePaths.value[drivePaths.value.length - 1].id); } } catch(e){} };
-        const deleteDriveFile = async (row) => { try { await msgBox.confirm(`确定永久删除？`, '警告', { type: 'danger' }); const r = await axios.post(`${API_BASE}/drive/action`, { drive_type: currentDriveType.value, action: 'delete', file_id: row.id }); if (r.data.code === 200) fetchDriveFiles(drivePaths.value[drivePaths.value.length - 1].id); } catch(e){} };
+        const promptRename = async (row) => { try { const { value } = await msgBox.prompt('请输入新名称', '重命名', { inputValue: row.name }); if (value) { const r = await axios.post(`${API_BASE}/drive/action`, { drive_type: currentDriveType.value, action: 'rename', file_id: row.id, new_name: value, parent_id: currentDriveDir() }); if (r.data.code === 200) row.name = value; } } catch(e){} };
+        const runDriveBatch = async (ops) => { const pid = drivePaths.value[drivePaths.value.length - 1].id; driveLoading.value = true; try { const r = await axios.post(`${API_BASE}/drive/batch`, { drive_type: currentDriveType.value, ops, parent_id: pid }); if (r.data.code === 200) ElMessage.success(r.data.msg); else ElMessage.warning(r.data.msg); } catch(e){} finally { driveLoading.value = false; } driveSelection.value = []; fetchDriveFiles(pid); };
+        const batchDeleteDrive = async () => { if (!driveSelection.value.length) return; try { await msgBox.confirm(`确定删除选中的 ${driveSelection.value.length} 项？`, '警告', { type: 'danger' }); await runDriveBatch(driveSelection.value.map(f => ({ action: 'delete', file_id: f.id }))); } catch(e){} };
+        const batchMoveDrive = async () => { if (!driveSelection.value.length) return; try { const { value } = await msgBox.prompt('请输入目标文件夹 ID (夸克根目录为 0，阿里云根目录为 root)', '批量移动'); if (value) await runDriveBatch(driveSelection.value.map(f => ({ action: 'move', file_id: f.id, to_parent_id: value.trim() }))); } catch(e){} };
+        const deleteDriveFile = async (row) => { try { await msgBox.confirm(`确定永久删除？`, '警告', { type: 'danger' }); const r = await axios.post(`${API_BASE}/drive/action`, { drive_type: currentDriveType.value, action: 'delete', file_id: row.id, parent_id: currentDriveDir() }); if (r.data.code === 200) driveFiles.value = driveFiles.value.filter(f => f.id !== row.id); } catch(e){} };
 
         const handleMenuSelect = (i) => { 
             activeMenu.value = i; 
@@ -98,8 +137,7 @@ const app = createApp({
             selectedTableRows.value = [];
             
             if (i === 'logs') {
-                loadLogs();
-                startLogPoll();
+                loadLogs().then(startLogPoll);
             } else {
                 stopLogPoll();
             }
@@ -115,17 +153,18 @@ const app = createApp({
             else if(i === 'drive_quark') initDriveView('quark');
             else if(i === 'drive_aliyun') initDriveView('aliyun');
             else if(i === 'strm_configs') strmModule.loadStrmConfigs();
-            else if(i === 'strm_records') { strmModule.recordPage.value = 1; strmModule.loadStrmRecords(); }
+            else if(i === 'strm_records') { strmModule.recordPage.value = 1; strmModule.loadStrmConfigs(); strmModule.loadStrmRecords(); }
             else if(i === 'strm_tasks') { strmModule.loadStrmConfigs(); strmModule.loadStrmTasks(); }
             else if(i === 'strm_settings') strmModule.loadStrmSettings();
         };
 
-        const searchTMDB = async () => { if (!sq.value) return; loading.value = true; try { const r = await axios.get(`${API_BASE}/search`, { params: { query: sq.value } }); sr.value = r.data.results.filter(x => x.media_type !== 'person'); } finally { loading.value = false; } };
+        const searchTMDB = async (online = false) => { if (!sq.value) return; loading.value = true; try { const r = await axios.get(`${API_BASE}/search`, { params: { query: sq.value, online } }); sr.value = r.data.results.filter(x => x.media_type !== 'person'); } finally { loading.value = false; } };
         const isMediaSelected = (i) => selectedMediaList.value.some(m => (m.tmdb_id || m.id) === (i.tmdb_id || i.id));
         const toggleMediaSelect = (i, val) => { if (val) selectedMediaList.value.push(i); else selectedMediaList.value = selectedMediaList.value.filter(m => (m.tmdb_id || m.id) !== (i.tmdb_id || i.id)); };
 
-        const subscribe = async (i, isL, force = false, driveType = '115') => { try { const r = await axios.post(`${API_BASE}/subscribe`, { tmdb_id: isL ? i.tmdb_id : i.id, media_type: i.media_type || 'movie', title: i.title || i.name, overview: i.overview, poster_path: i.poster_path, force: force, drive_type: driveType }); if (r.data.code === 409) { const dn = driveType==='quark'?'夸克':(driveType==='aliyun'?'阿里云':'115'); await ElMessageBox.confirm(`已在系统中！强制加入 [${dn}]？`, '提醒', {type: 'warning'}); await subscribe(i, isL, true, driveType); return; } ElMessage.success(`加入队列！`); i.sub_status = 'pending'; if(activeMenu.value === 'records') loadRecords(); } catch (e) {} };
-        const batchSubscribe = async (driveType = '115') => { if (!selectedMediaList.value.length) return; const items = selectedMediaList.value.map(i => ({ tmdb_id: i.tmdb_id || i.id, media_type: i.media_type || 'movie', title: i.title || i.name, overview: i.overview || '', poster_path: i.poster_path || '', force: false, drive_type: driveType })); try { await axios.post(`${API_BASE}/subscribe/batch`, { items }); ElMessage.success(`批量操作成功！`); selectedMediaList.value = []; if(activeMenu.value === 'discover') searchTMDB(); else loadLocalMedia(activeMenu.value, currentPage.value); } catch (e) {} };
+        const mediaYear = (i) => i.year || parseInt((i.release_date || i.first_air_date || '').slice(0, 4)) || null;
+        const subscribe = async (i, isL, force = false, driveType = '115') => { try { const r = await axios.post(`${API_BASE}/subscribe`, { tmdb_id: isL ? i.tmdb_id : i.id, media_type: i.media_type || 'movie', title: i.title || i.name, overview: i.overview, poster_path: i.poster_path, force: force, drive_type: driveType, year: mediaYear(i) }); if (r.data.code === 409) { const dn = driveType==='quark'?'夸克':(driveType==='aliyun'?'阿里云':'115'); await ElMessageBox.confirm(`已在系统中！强制加入 [${dn}]？`, '提醒', {type: 'warning'}); await subscribe(i, isL, true, driveType); return; } ElMessage.success(`加入队列！`); i.sub_status = 'pending'; if(activeMenu.value === 'records') loadRecords(); if(activeMenu.value === 'subscriptions') loadSubscriptions(); } catch (e) {} };
+        const batchSubscribe = async (driveType = '115') => { if (!selectedMediaList.value.length) return; const items = selectedMediaList.value.map(i => ({ tmdb_id: i.tmdb_id || i.id, media_type: i.media_type || 'movie', title: i.title || i.name, overview: i.overview || '', poster_path: i.poster_path || '', force: false, drive_type: driveType, year: mediaYear(i) })); try { await axios.post(`${API_BASE}/subscribe/batch`, { items }); ElMessage.success(`批量操作成功！`); selectedMediaList.value = []; if(activeMenu.value === 'discover') searchTMDB(); else loadLocalMedia(activeMenu.value, currentPage.value); } catch (e) {} };
         const handleSelectionChange = (val) => { selectedTableRows.value = val; };
         const unsubscribeMedia = async (r) => { try { await ElMessageBox.confirm(`放弃订阅吗？`, '确认'); await axios.delete(`${API_BASE}/subscriptions/${r.tmdb_id}`); loadSubscriptions(); } catch (e) {} };
         const deleteRecord = async (r) => { try { await ElMessageBox.confirm(`清除此记录？`, '确认', { type: 'danger' }); await axios.delete(`${API_BASE}/subscriptions/${r.tmdb_id}`); loadRecords(); } catch (e) {} };
@@ -140,8 +179,7 @@ const app = createApp({
                 ElMessage.success('进程已拉起，正在跳转系统日志监控...'); 
                 setTimeout(() => { 
                     activeMenu.value = 'logs'; 
-                    loadLogs(); 
-                    startLogPoll(); 
+                    loadLogs().then(startLogPoll); 
                 }, 1500); 
             } catch (e) {} 
         };
@@ -177,6 +215,8 @@ const app = createApp({
         };
 
         // 获取二维码与防错处理
+        const rebuild115Index = async () => { try { const r = await axios.post(`${API_BASE}/115/index/refresh`); ElMessage.success(r.data.message); } catch (e) {} };
+
         const generate115QrCode = async () => {
             if (pTimer.value) clearInterval(pTimer.value);
             qrLoading.value = true;
@@ -210,10 +250,10 @@ const app = createApp({
         });
 
         return { 
-            activeMenu, syncingData, loading, lm, sr, sq, subscriptions, records, systemLogs, config, pv, pr, qrLoading, qUrl, qSt, curKw, currentPage, pageSize, totalItems, 
+            activeMenu, syncingData, loading, lm, sr, sq, subscriptions, subStatusFilter, loadSubscriptions, records, systemLogs, config, pv, pr, qrLoading, qUrl, qSt, curKw, currentPage, pageSize, totalItems, 
             selectedMediaList, selectedTableRows, isMediaSelected, toggleMediaSelect, batchSubscribe, handleSelectionChange, batchDeleteRecords,
-            driveFiles, driveLoading, drivePaths, currentDriveType, formatFileSize, clickDriveBreadcrumb, openDriveFolder, promptMkdir, promptRename, deleteDriveFile,
-            getMenuTitle, handleMenuSelect, saveConfig, searchTMDB, subscribe, unsubscribeMedia, deleteRecord, openPanSou, manualSaveLink, generate115QrCode, loadLogs, runTaskManual, handlePageChange,
+            driveFiles, driveLoading, drivePaths, currentDriveType, driveNextCursor, loadMoreDriveFiles, formatFileSize, clickDriveBreadcrumb, openDriveFolder, promptMkdir, promptRename, deleteDriveFile, driveSelection, batchDeleteDrive, batchMoveDrive, refreshDriveFiles,
+            getMenuTitle, handleMenuSelect, saveConfig, searchTMDB, subscribe, unsubscribeMedia, deleteRecord, openPanSou, manualSaveLink, generate115QrCode, rebuild115Index, loadLogs, runTaskManual, handlePageChange,
             autoRefreshLogs, toggleLogPoll, 
             ...strmModule
         };
@@ -11,6 +11,9 @@ const useStrm = (API_BASE, ElMessage, msgBox) => {
     const recordTotal = ref(0);
     const recordPage = ref(1);
     const recordPageSize = ref(20);
+    const recordFilter = ref({ config_id: null, path_prefix: '', dates: null });
+    const recordTotalCapped = ref(false);
+    const recordCursors = {}; // 页码 -> 上一页返回的 next_cursor
 
     const strmTasks = ref([]);
     const showTaskDialog = ref(false);
@@ -38,8 +41,20 @@ const useStrm = (API_BASE, ElMessage, msgBox) => {
     const deleteStrmConfig = async (id) => { try { await msgBox.confirm('确定删除?'); await axios.delete(`${API_BASE}/strm/configs/${id}`); loadStrmConfigs(); } catch (e) {} };
     const runStrmTask = async (id) => { try { await axios.post(`${API_BASE}/strm/run/${id}`); ElMessage.success('生成任务已投递至后台，请查看日志！'); } catch (e) {} };
 
-    const loadStrmRecords = async () => { const r = await axios.get(`${API_BASE}/strm/records?page=${recordPage.value}&size=${recordPageSize.value}`); strmRecords.value = r.data.items; recordTotal.value = r.data.total; };
-    const clearStrmRecords = async () => { try { await msgBox.confirm('清空后下次将重新扫描，确定清空？', '警告', { type: 'danger' }); await axios.delete(`${API_BASE}/strm/records/clear`); ElMessage.success('记录已清空'); loadStrmRecords(); } catch (e) {} };
+    const loadStrmRecords = async () => {
+        if (recordPage.value === 1) Object.keys(recordCursors).forEach(k => delete recordCursors[k]);
+        const f = recordFilter.value;
+        const params = { page: recordPage.value, size: recordPageSize.value, cursor: recordCursors[recordPage.value] ?? null, config_id: f.config_id ?? null, path_prefix: f.path_prefix || null, date_from: f.dates ? f.dates[0] : null, date_to: f.dates ? f.dates[1] : null };
+        const r = await axios.get(`${API_BASE}/strm/records`, { params });
+        strmRecords.value = r.data.items; recordTotal.value = r.data.total; recordTotalCapped.value = r.data.total_capped;
+        if (r.data.next_cursor) recordCursors[recordPage.value + 1] = r.data.next_cursor;
+    };
+    const searchStrmRecords = () => { recordPage.value = 1; loadStrmRecords(); };
+    const clearStrmRecords = async () => {
+        const cid = recordFilter.value.config_id;
+        const scope = cid != null ? `节点 [${getStrmConfigName(cid)}] 的` : '全部';
+        try { await msgBox.confirm(`清空${scope}记录后下次将重新扫描，确定清空？`, '警告', { type: 'danger' }); const r = await axios.delete(`${API_BASE}/strm/records/clear`, { params: { config_id: cid ?? null } }); ElMessage.success(r.data.message); searchStrmRecords(); } catch (e) {}
+    };
 
     const openTaskDialog = () => { isEditingTask.value = false; editingTaskId.value = null; newStrmTask.value = { task_name: '', config_id: null, cron_expression: '0 */2 * * *', is_enabled: 1 }; showTaskDialog.value = true; };
     const editStrmTask = (row) => { isEditingTask.value = true; editingTaskId.value = row.id; newStrmTask.value = { task_name: row.task_name, config_id: row.config_id, cron_expression: row.cron_expression, is_enabled: row.is_enabled }; showTaskDialog.value = true; };
@@ -59,11 +74,11 @@ const useStrm = (API_BASE, ElMessage, msgBox) => {
 
     return {
         strmConfigs, showStrmDialog, isEditingConfig, newStrmConfig,
-        strmRecords, recordTotal, recordPage, recordPageSize,
+        strmRecords, recordTotal, recordPage, recordPageSize, recordFilter, recordTotalCapped,
         strmTasks, showTaskDialog, newStrmTask, isEditingTask,
         strmSettings, replaceTool,
         loadStrmConfigs, openStrmDialog, editStrmConfig, saveStrmConfig, deleteStrmConfig, runStrmTask,
-        loadStrmRecords, clearStrmRecords,
+        loadStrmRecords, clearStrmRecords, searchStrmRecords,
         loadStrmTasks, openTaskDialog, editStrmTask, saveStrmTask, toggleTaskStatus, deleteStrmTask, getStrmConfigName,
         loadStrmSettings, saveStrmSettings, runReplaceDomain
     };
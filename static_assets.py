@@ -0,0 +1,130 @@
+import os
+import gzip
+import hashlib
+import mimetypes
+import threading
+
+try: import brotli  # 可选依赖，未安装时只提供 gzip
+except ImportError: brotli = None
+
+# ==================== 静态资源预压缩与缓存 ====================
+# 启动时把 static/ 下的文件读入内存，计算内容哈希并预先生成 gzip / brotli 版本，
+# 按请求的 Accept-Encoding 直接返回压缩后的字节。页面引用资源时带上 ?v=<内容哈希>，
+# 命中哈希的请求可永久缓存 (immutable)，其余请求靠 ETag 协商缓存。
+# 构建镜像时可执行 `python static_assets.py` 以最高压缩率生成 .gz / .br 旁路文件，启动时直接加载。
+
+STATIC_DIR = "static"
+COMPRESSIBLE_EXTS = {".js", ".css", ".svg", ".html", ".json", ".map", ".txt"}
+MIN_COMPRESS_BYTES = 1024
+STARTUP_BROTLI_QUALITY = 9   # 启动时在线压缩兼顾速度
+BUILD_BROTLI_QUALITY = 11
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+_assets = {}  # 相对路径 -> 资源条目
+_lock = threading.Lock()
+
+def _compress(raw: bytes, brotli_quality: int) -> dict:
+    variants = {"gzip": gzip.compress(raw, compresslevel=9, mtime=0)}
+    if brotli is not None: variants["br"] = brotli.compress(raw, quality=brotli_quality)
+    # 压缩后反而更大的变体没有意义
+    return {enc: data for enc, data in variants.items() if len(data) < len(raw)}
+
+def _load_sidecar(path: str, mtime: float, suffix: str):
+    """构建阶段生成且不早于源文件的 .gz/.br 文件直接复用"""
+    sidecar = path + suffix
+    try:
+        if os.stat(sidecar).st_mtime >= mtime:
+            with open(sidecar, "rb") as f: return f.read()
+    except OSError: pass
+    return None
+
+def make_entry(raw: bytes, name: str, mtime: float = 0.0, path: str = None, brotli_quality: int = STARTUP_BROTLI_QUALITY) -> dict:
+    digest = hashlib.sha256(raw).hexdigest()[:16]
+    entry = {"raw": raw, "hash": digest, "etag": f'"{digest}"', "mtime": mtime, "variants": {},
+             "media_type": mimetypes.guess_type(name)[0] or "application/octet-stream"}
+    if entry["media_type"].startswith("text/") or entry["media_type"] in ("application/javascript", "application/json"):
+        entry["media_type"] += "; charset=utf-8"
+    if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTS and len(raw) >= MIN_COMPRESS_BYTES:
+        sidecars = {enc: _load_sidecar(path, mtime, suffix) for enc, suffix in (("gzip", ".gz"), ("br", ".br"))} if path else {}
+        if all(sidecars.get(enc) for enc in ("gzip", "br")) or (sidecars.get("gzip") and brotli is None):
+            entry["variants"] = {enc: data for enc, data in sidecars.items() if data}
+        else:
+            entry["variants"] = _compress(raw, brotli_quality)
+    return entry
+
+def _build(rel_path: str):
+    path = os.path.join(STATIC_DIR, rel_path)
+    mtime = os.stat(path).st_mtime
+    with open(path, "rb") as f: raw = f.read()
+    return make_entry(raw, rel_path, mtime, path)
+
+def _walk_static():
+    for root, _, files in os.walk(STATIC_DIR):
+        for name in files:
+            if name.endswith((".gz", ".br")): continue
+            yield os.path.relpath(os.path.join(root, name), STATIC_DIR).replace(os.sep, "/")
+
+def load_assets():
+    """启动时预加载全部静态资源，返回 (文件数, 原始字节数, 压缩后字节数)"""
+    with _lock:
+        _assets.clear()
+        for rel_path in _walk_static(): _assets[rel_path] = _build(rel_path)
+        raw_bytes = sum(len(a["raw"]) for a in _assets.values())
+        packed = sum(min([len(a["raw"])] + [len(v) for v in a["variants"].values()]) for a in _assets.values())
+    return len(_assets), raw_bytes, packed
+
+def get_asset(rel_path: str):
+    """按相对路径取资源；文件在运行期间被修改或新增时重新加载"""
+    rel_path = rel_path.lstrip("/")
+    path = os.path.normpath(os.path.join(STATIC_DIR, rel_path))
+    if not path.startswith(os.path.normpath(STATIC_DIR) + os.sep): return None
+    try: mtime = os.stat(path).st_mtime
+    except OSError: return None
+    if not os.path.isfile(path): return None
+    entry = _assets.get(rel_path)
+    if entry is None or entry["mtime"] != mtime:
+        entry = _build(rel_path)
+        with _lock: _assets[rel_path] = entry
+    return entry
+
+def asset_url(rel_path: str) -> str:
+    """模板中使用：生成带内容哈希的资源地址"""
+    entry = get_asset(rel_path)
+    return f"/static/{rel_path}?v={entry['hash']}" if entry else f"/static/{rel_path}"
+
+def pick_encoding(accept_encoding: str, entry: dict):
+    """按客户端支持情况选择 br > gzip > 原始数据"""
+    accepted = set()
+    for part in (accept_encoding or "").lower().split(","):
+        token, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"): continue
+        accepted.add(token.strip())
+    for enc in ("br", "gzip"):
+        if enc in entry["variants"] and (enc in accepted or "*" in accepted): return enc, entry["variants"][enc]
+    return None, entry["raw"]
+
+def response_parts(entry: dict, accept_encoding: str, if_none_match: str = None, immutable: bool = False):
+    """返回 (状态码, 响应体, 响应头)，由路由包装成 Response"""
+    headers = {"ETag": entry["etag"], "Vary": "Accept-Encoding", "Cache-Control": IMMUTABLE_CACHE if immutable else REVALIDATE_CACHE}
+    if if_none_match and entry["etag"] in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]:
+        return 304, b"", headers
+    encoding, body = pick_encoding(accept_encoding, entry)
+    if encoding: headers["Content-Encoding"] = encoding
+    return 200, body, headers
+
+def build_sidecars():
+    """构建阶段调用：以最高压缩率写出 .gz / .br 旁路文件"""
+    for rel_path in _walk_static():
+        path = os.path.join(STATIC_DIR, rel_path)
+        if os.path.splitext(path)[1].lower() not in COMPRESSIBLE_EXTS: continue
+        with open(path, "rb") as f: raw = f.read()
+        if len(raw) < MIN_COMPRESS_BYTES: continue
+        for enc, data in _compress(raw, BUILD_BROTLI_QUALITY).items():
+            with open(path + (".br" if enc == "br" else ".gz"), "wb") as f: f.write(data)
+            print(f"{rel_path} [{enc}] {len(raw)} -> {len(data)} 字节")
+
+if __name__ == "__main__":
+    mimetypes.add_type("application/javascript", ".js")
+    mimetypes.add_type("text/css", ".css")
+    build_sidecars()
@@ -10,6 +10,9 @@ import easywebdav
 
 from database import get_db
 from logger import add_log
+import metrics
+from metrics import OUTBOUND_REQUESTS, OUTBOUND_LATENCY, STRM_DIRS, STRM_FILES, STRM_BYTES, STRM_ERRORS, STRM_RUNS
+from job_report import JobReport
 
 strm_file_counter = 0  
 metadata_file_counter = 0  # 【新增】元数据下载计数器
@@ -21,6 +24,26 @@ metadata_tasks = []        # 【新增】元数据下载队列
 counter_lock = threading.Lock()
 db_lock = threading.Lock()
 thread_local = threading.local()
+report = None  # 本次作业的运行报告，main() 中创建
+METRICS_DUMP_INTERVAL = 5  # 运行期间每隔几秒把指标落盘，供主进程 /metrics 读取
+
+def timed_webdav(op):
+    """执行一次 WebDAV 调用并记录耗时与结果"""
+    start = time.perf_counter()
+    outcome = "error"
+    if report: report.request_started()
+    try:
+        result = op()
+        outcome = "ok"
+        return result
+    finally:
+        elapsed = time.perf_counter() - start
+        OUTBOUND_REQUESTS.inc("webdav", outcome)
+        OUTBOUND_LATENCY.observe(elapsed, "webdav")
+        if report: report.record_request("webdav", elapsed, outcome)
+
+def in_phase(name, func, *args):
+    with report.phase(name): return func(*args)
 
 def get_webdav_config(config_id):
     conn = get_db()
@@ -101,8 +124,10 @@ def fetch_dir_task(directory, config):
         
         client = get_webdav_client(config)
         safe_dir = directory if directory.endswith('/') else directory + '/'
-        return directory, client.ls(safe_dir)
+        return directory, timed_webdav(lambda: client.ls(safe_dir))
     except Exception as e:
+        STRM_ERRORS.inc(str(config['id']), "scan")
+        report.add("errors_scan")
         add_log("ERROR", f"❌ 读取 WebDAV 目录失败 [{directory}] -> 错误原因: {str(e)}")
         return directory, e
 
@@ -133,6 +158,8 @@ def scan_directories_concurrently(config, script_config, existing_records):
             done, futures = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
             for future in done:
                 current_dir, result = future.result()
+                STRM_DIRS.inc(str(config['id']))
+                report.add("dirs_scanned")
                 
                 with counter_lock:
                     dir_scan_counter += 1
@@ -153,6 +180,7 @@ def scan_directories_concurrently(config, script_config, existing_records):
                         if f.name != current_dir and f.name not in visited:
                             visited.add(f.name)
                             futures.add(executor.submit(fetch_dir_task, f.name, config))
+                            report.peak("scan_queue", len(futures))
                     else:
                         file_extension = os.path.splitext(f.name)[1].lower().lstrip('.')
                         
@@ -201,12 +229,18 @@ def create_strm_file(file_name, file_size, config, local_directory, relative_pat
             strm_file.write(http_link)
         os.chmod(strm_file_path, 0o777)
         record_success(config['id'], strm_file_name, relative_path)
+        STRM_FILES.inc(str(config['id']), "strm")
+        STRM_BYTES.inc(str(config['id']), amount=file_size)
+        report.add("strm_written")
+        report.add("bytes_written", len(http_link.encode('utf-8')))
         
         with counter_lock: 
             strm_file_counter += 1
             if strm_file_counter % 50 == 0:
                 add_log("INFO", f"⏳ STRM写入进度: 已成功映射 {strm_file_counter} 个视频文件。")
     except Exception as e:
+        STRM_ERRORS.inc(str(config['id']), "write")
+        report.add("errors_write")
         add_log("ERROR", f"❌ 写入本地 STRM 文件失败: [{strm_file_path}] -> 原因: {str(e)}")
 
 # 【新增】真实下载元数据文件的核心函数
@@ -224,32 +258,63 @@ def download_metadata_file(remote_file_name, config, local_directory, relative_p
 
     try:
         client = get_webdav_client(config)
-        client.download(remote_file_name, local_file_path)
+        timed_webdav(lambda: client.download(remote_file_name, local_file_path))
         os.chmod(local_file_path, 0o777)
         record_success(config['id'], local_file_name, relative_path)
+        STRM_FILES.inc(str(config['id']), "metadata")
+        report.add("metadata_downloaded")
+        report.add("bytes_downloaded", os.path.getsize(local_file_path))
         
         with counter_lock: 
             metadata_file_counter += 1
             if metadata_file_counter % 20 == 0:
                 add_log("INFO", f"📥 元数据下载进度: 已成功拉取 {metadata_file_counter} 个封面/字幕文件。")
     except Exception as e:
+        STRM_ERRORS.inc(str(config['id']), "download")
+        report.add("errors_download")
         add_log("ERROR", f"❌ 下载元数据文件失败: [{local_file_name}] -> 原因: {str(e)}")
 
 def main(config_id):
+    """指标快照在运行期间定期落盘，结束时 (含异常退出) 再写一次最终值"""
+    snapshot_path = metrics.strm_snapshot_path(config_id)
+    metrics.restore_snapshot(snapshot_path)
+    stop = threading.Event()
+    def dump_loop():
+        while not stop.wait(METRICS_DUMP_INTERVAL): metrics.dump_snapshot(snapshot_path)
+    threading.Thread(target=dump_loop, daemon=True).start()
+    global report
+    report = JobReport("strm", config_id)
+    start = time.perf_counter()
+    try: run_job(config_id)
+    except Exception:
+        report.status = "error"
+        raise
+    finally:
+        stop.set()
+        STRM_RUNS.observe(time.perf_counter() - start, str(config_id))
+        metrics.dump_snapshot(snapshot_path)
+        try: report.save()
+        except Exception as e: add_log("WARNING", f"⚠️ STRM 运行报告保存失败: {str(e)}")
+
+def run_job(config_id):
     global strm_file_counter, metadata_file_counter, video_file_counter, existing_strm_file_counter, strm_tasks, metadata_tasks, dir_scan_counter
     config = get_webdav_config(config_id)
     if not config:
         add_log("ERROR", f"❌ 找不到节点配置 (ID: {config_id})，生成任务已终止。")
+        report.status = "error"
         return
     
     script_config = get_script_config()
     
     add_log("INFO", f"🎥 STRM 引擎: 启动节点 [{config['config_name']}] 的全自动生成作业...")
     
-    existing_records = get_existing_records(config['id']) 
+    with report.phase("record_load"): existing_records = get_existing_records(config['id'])
     add_log("INFO", f"📚 数据库比对缓存加载完毕，该节点共命中 {len(existing_records)} 条历史记录。")
     
-    scan_directories_concurrently(config, script_config, existing_records)
+    with report.phase("scan"): scan_directories_concurrently(config, script_config, existing_records)
+    report.add("videos_found", video_file_counter)
+    report.add("videos_existing", existing_strm_file_counter)
+    report.peak("write_queue", len(strm_tasks) + len(metadata_tasks))
     
     if len(strm_tasks) == 0 and len(metadata_tasks) == 0:
         add_log("INFO", f"✅ STRM 引擎结束: 累计深入 {dir_scan_counter} 个目录。本次未发现新视频与未下载的元数据文件。")
@@ -261,10 +326,10 @@ def main(config_id):
         futures = []
         # 1. 提交 STRM 写入任务
         for t in strm_tasks:
-            futures.append(executor.submit(create_strm_file, t[0], t[1], config, t[2], t[3], t[4], script_config['size_threshold']))
+            futures.append(executor.submit(in_phase, "write", create_strm_file, t[0], t[1], config, t[2], t[3], t[4], script_config['size_threshold']))
         # 2. 提交 元数据 下载任务
         for m in metadata_tasks:
-            futures.append(executor.submit(download_metadata_file, m[0], config, m[1], m[2], m[3]))
+            futures.append(executor.submit(in_phase, "metadata_download", download_metadata_file, m[0], config, m[1], m[2], m[3]))
             
         for future in as_completed(futures):
             pass
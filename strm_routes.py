@@ -1,7 +1,10 @@
 import os
 import subprocess
 import sys
-from fastapi import APIRouter, BackgroundTasks
+import time
+import datetime
+from typing import Optional
+from fastapi import APIRouter, BackgroundTasks, HTTPException
 from database import get_db
 from models import StrmConfigModel, StrmSettingsModel, ReplaceDomainModel, StrmTaskModel
 from logger import add_log
@@ -85,25 +88,99 @@ def replace_domain(req: ReplaceDomainModel, background_tasks: BackgroundTasks):
     background_tasks.add_task(run_replace)
     return {"message": "批量域名替换任务已投递后台。"}
 
+STRM_RECORD_COUNT_CAP = 10000  # 附加路径/日期筛选时的计数上限，避免对超大表做精确 COUNT
+STRM_CLEAR_CHUNK = 5000
+
+def _utc_day_start(date_str: str, field: str, days: int = 0) -> str:
+    """前端按本地日期筛选，而 created_at 由 CURRENT_TIMESTAMP 写入 (UTC)，先把本地零点换算成 UTC 时间"""
+    try: day = datetime.date.fromisoformat(date_str[:10]) + datetime.timedelta(days=days)
+    except ValueError: raise HTTPException(status_code=400, detail=f"{field} 日期格式错误，应为 YYYY-MM-DD")
+    return datetime.datetime.combine(day, datetime.time.min).astimezone(datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+def _first_record_id_since(conn, utc_str: str):
+    """created_at 与自增 id 同序，把时间边界换算成 id 边界 (索引单次定位)"""
+    row = conn.execute("SELECT id FROM strm_records WHERE created_at >= ? ORDER BY created_at, id LIMIT 1", (utc_str,)).fetchone()
+    return row[0] if row else None
+
 @strm_router.get("/api/strm/records")
-def get_strm_records(page: int = 1, size: int = 50):
+def get_strm_records(page: int = 1, size: int = 50, cursor: Optional[int] = None, config_id: Optional[int] = None,
+                     path_prefix: Optional[str] = None, date_from: Optional[str] = None, date_to: Optional[str] = None):
+    # 键集分页：cursor 为上一页最后一条记录的 id；未携带游标时兼容旧的页码方式
+    size = max(1, min(size, 200))
+    # local_path 为相对路径 (不带前导分隔符)，兼容用户按 "/电影/" 习惯输入
+    path_prefix = (path_prefix or '').lstrip('/\\')
+    lower_bound = _utc_day_start(date_from, "date_from") if date_from else None
+    upper_bound = _utc_day_start(date_to, "date_to", days=1) if date_to else None
     conn = get_db()
-    offset = (page - 1) * size
-    query = '''SELECT r.*, c.config_name FROM strm_records r 
-               LEFT JOIN strm_configs c ON r.config_id = c.id 
-               ORDER BY r.id DESC LIMIT ? OFFSET ?'''
-    rows = conn.execute(query, (size, offset)).fetchall()
-    total = conn.execute("SELECT COUNT(*) FROM strm_records").fetchone()[0]
+    try:
+        where, params = [], []
+        if config_id is not None:
+            where.append("r.config_id = ?"); params.append(config_id)
+        if path_prefix:
+            # 前缀匹配转换为区间比较，可直接利用 (config_id, local_path) 索引
+            where.append("r.local_path >= ? AND r.local_path < ?"); params += [path_prefix, path_prefix + '\U0010ffff']
+        if lower_bound:
+            lower = _first_record_id_since(conn, lower_bound)
+            # 起始日期之后没有任何记录时给出一个不可能命中的边界
+            where.append("r.id >= ?"); params.append(lower if lower is not None else 2**62)
+        if upper_bound:
+            upper = _first_record_id_since(conn, upper_bound)
+            if upper is not None: where.append("r.id < ?"); params.append(upper)
+        filters = list(where)
+        page_params = list(params)
+        if cursor is not None:
+            where.append("r.id < ?"); page_params.append(cursor)
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+        query = f'''SELECT r.*, c.config_name FROM strm_records r 
+                   LEFT JOIN strm_configs c ON r.config_id = c.id 
+                   {where_sql} ORDER BY r.id DESC LIMIT ?{'' if cursor is not None else ' OFFSET ?'}'''
+        page_params += [size] if cursor is not None else [size, (max(page, 1) - 1) * size]
+        rows = [dict(row) for row in conn.execute(query, page_params).fetchall()]
+
+        capped = False
+        if path_prefix or date_from or date_to:
+            filter_sql = f"WHERE {' AND '.join(filters)}" if filters else ""
+            total = conn.execute(f"SELECT COUNT(*) FROM (SELECT 1 FROM strm_records r {filter_sql} LIMIT ?)", params + [STRM_RECORD_COUNT_CAP]).fetchone()[0]
+            capped = total >= STRM_RECORD_COUNT_CAP
+        elif config_id is not None:
+            row = conn.execute("SELECT total FROM strm_record_counts WHERE config_id = ?", (config_id,)).fetchone()
+            total = row[0] if row else 0
+        else:
+            total = conn.execute("SELECT COALESCE(SUM(total), 0) FROM strm_record_counts").fetchone()[0]
+    finally:
+        conn.close()
+    next_cursor = rows[-1]['id'] if len(rows) == size else None
+    return {"items": rows, "total": total, "total_capped": capped, "next_cursor": next_cursor}
+
+@strm_router.get("/api/strm/records/counts")
+def get_strm_record_counts():
+    conn = get_db()
+    rows = conn.execute('''SELECT n.config_id, n.total, c.config_name FROM strm_record_counts n
+                           LEFT JOIN strm_configs c ON n.config_id = c.id WHERE n.total > 0''').fetchall()
     conn.close()
-    return {"items": [dict(row) for row in rows], "total": total}
+    return [dict(row) for row in rows]
 
 @strm_router.delete("/api/strm/records/clear")
-def clear_strm_records():
+def clear_strm_records(config_id: Optional[int] = None):
+    # 分块删除并逐块提交，每块之间让出写锁，STRM 子进程的写入不会被长事务阻塞
+    deleted = 0
     conn = get_db()
-    conn.execute("DELETE FROM strm_records")
-    conn.commit(); conn.close()
-    add_log("WARNING", "🧹 用户手动清空了全部 STRM 成功记录缓存！下次生成将执行全量比对。")
-    return {"message": "历史记录已全部清空"}
+    try:
+        while True:
+            if config_id is None: sql, params = "DELETE FROM strm_records WHERE id IN (SELECT id FROM strm_records ORDER BY id LIMIT ?)", (STRM_CLEAR_CHUNK,)
+            else: sql, params = "DELETE FROM strm_records WHERE id IN (SELECT id FROM strm_records WHERE config_id = ? ORDER BY id LIMIT ?)", (config_id, STRM_CLEAR_CHUNK)
+            count = conn.execute(sql, params).rowcount
+            conn.commit()
+            deleted += count
+            if count < STRM_CLEAR_CHUNK: break
+            time.sleep(0.05)
+    finally:
+        conn.close()
+    if config_id is None:
+        add_log("WARNING", f"🧹 用户手动清空了全部 STRM 成功记录缓存 (共 {deleted} 条)！下次生成将执行全量比对。")
+        return {"message": f"历史记录已全部清空 ({deleted} 条)"}
+    add_log("WARNING", f"🧹 用户手动清空了节点 (ID: {config_id}) 的 STRM 成功记录缓存 (共 {deleted} 条)！该节点下次生成将执行全量比对。")
+    return {"message": f"已清空该节点的 {deleted} 条记录"}
 
 @strm_router.get("/api/strm/tasks")
 def get_strm_tasks():
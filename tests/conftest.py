@@ -0,0 +1,29 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import logger
+
+def _reset_caches():
+    database._config_cache = None
+    database._config_version += 1
+    database._config_shared.seen = None
+    database._media_counts.clear()
+    database._media_counts_shared.seen = None
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """每个用例使用独立的临时库 (已执行全部迁移)，返回当前线程的连接"""
+    database.close_thread_db()
+    monkeypatch.setattr(database, "DB_DIR", str(tmp_path))
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "test.db"))
+    _reset_caches()
+    database.init_db()
+    conn = database.get_db()
+    yield conn
+    logger.flush_logs()  # 后台写日志线程在库文件被删除前写完
+    database.close_thread_db()
+    _reset_caches()
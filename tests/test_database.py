@@ -0,0 +1,68 @@
+import database
+
+def _fts_count(conn, term: str) -> int:
+    return conn.execute("SELECT COUNT(*) FROM media_fts WHERE media_fts MATCH ?", (term,)).fetchone()[0]
+
+def _upsert(conn, *rows):
+    database.upsert_media_items(conn, list(rows))
+    conn.commit()
+
+def test_upsert_inserts_and_indexes_new_rows(db):
+    _upsert(db, (1, 'movie', 'Alpha Title', 'first', '/a.jpg', '2026-01-01', 2020),
+                (2, 'tv', 'Beta Show', 'second', '/b.jpg', '2026-01-01', None))
+    assert db.execute("SELECT COUNT(*) FROM media_items").fetchone()[0] == 2
+    assert _fts_count(db, 'Alpha') == 1
+    assert _fts_count(db, 'Beta') == 1
+
+def test_upsert_of_unchanged_columns_does_not_fail(db):
+    # 回归：仅 add_date 变化时曾因 FTS 触发器报 constraint failed
+    _upsert(db, (1, 'movie', 'Alpha Title', 'first', '/a.jpg', '2026-01-01', 2020))
+    _upsert(db, (1, 'movie', 'Alpha Title', 'first', '/a.jpg', '2026-01-02', 2020))
+    assert db.execute("SELECT add_date FROM media_items WHERE tmdb_id = 1").fetchone()[0] == '2026-01-02'
+    assert _fts_count(db, 'Alpha') == 1
+
+def test_title_change_resyncs_fts_without_stale_rows(db):
+    _upsert(db, (1, 'movie', 'Alpha Title', 'first', '/a.jpg', '2026-01-01', 2020))
+    _upsert(db, (1, 'movie', 'Gamma Title', 'second', '/a.jpg', '2026-01-02', 2020))
+    assert _fts_count(db, 'Gamma') == 1
+    assert _fts_count(db, 'Alpha') == 0
+    assert db.execute("SELECT COUNT(*) FROM media_fts").fetchone()[0] == 1
+    db.execute("INSERT INTO media_fts (media_fts) VALUES ('integrity-check')")
+
+def test_insert_or_replace_keeps_fts_in_sync(db):
+    _upsert(db, (1, 'movie', 'Alpha Title', 'first', '/a.jpg', '2026-01-01', 2020))
+    db.execute("INSERT OR REPLACE INTO media_items (tmdb_id, media_type, title, overview, poster_path, add_date) VALUES (1, 'movie', 'Delta', '', '/a.jpg', '2026-01-03')")
+    db.commit()
+    assert _fts_count(db, 'Delta') == 1
+    assert _fts_count(db, 'Alpha') == 0
+
+def test_yearless_upsert_keeps_stored_year(db):
+    _upsert(db, (1, 'movie', 'Alpha Title', 'first', '/a.jpg', '2026-01-01', 2020))
+    _upsert(db, (1, 'movie', 'Alpha Title', 'changed', '/a.jpg', '2026-01-02', None))
+    assert db.execute("SELECT year FROM media_items WHERE tmdb_id = 1").fetchone()[0] == 2020
+    _upsert(db, (1, 'movie', 'Alpha Title', 'changed', '/a.jpg', '2026-01-02', 2021))
+    assert db.execute("SELECT year FROM media_items WHERE tmdb_id = 1").fetchone()[0] == 2021
+
+def test_fetch_in_chunks_splits_large_in_lists(db):
+    _upsert(db, *[(i, 'movie', f'T{i}', '', '/p.jpg', '2026-01-01', None) for i in range(1, 21)])
+    rows = database.fetch_in_chunks(db, "SELECT tmdb_id FROM media_items WHERE tmdb_id IN ({marks})", range(1, 31), chunk_size=7)
+    assert sorted(r[0] for r in rows) == list(range(1, 21))
+
+def test_media_counts_cache_is_invalidated(db):
+    assert database.count_media(db, 'all') == 0
+    _upsert(db, (1, 'movie', 'Alpha', '', '/a.jpg', '2026-01-01', None))
+    assert database.count_media(db, 'all') == 0  # 仍是缓存值
+    database.invalidate_media_counts()
+    assert database.count_media(db, 'all') == 1
+    assert database.count_media(db, 'movie') == 1
+    assert database.count_media(db, 'hot', '2026-01-01') == 1
+
+def test_upsert_returns_only_new_or_changed_posters(db):
+    assert database.upsert_media_items(db, [(1, 'movie', 'Alpha', '', '/a.jpg', '2026-01-01', None),
+                                            (2, 'movie', 'Beta', '', '/b.jpg', '2026-01-01', None)]) == ['/a.jpg', '/b.jpg']
+    db.commit()
+    new_posters = database.upsert_media_items(db, [(1, 'movie', 'Alpha', '', '/a.jpg', '2026-01-02', None),
+                                                   (2, 'movie', 'Beta', '', '/b2.jpg', '2026-01-02', None),
+                                                   (3, 'tv', 'Gamma', '', '/c.jpg', '2026-01-02', None),
+                                                   (4, 'tv', 'Delta', '', None, '2026-01-02', None)])
+    assert new_posters == ['/b2.jpg', '/c.jpg']
@@ -0,0 +1,35 @@
+import json
+import job_report
+from job_report import JobReport
+
+def test_rss_is_reported_as_delta_over_the_run(monkeypatch):
+    readings = iter([100.0, 160.5])
+    monkeypatch.setattr(job_report, "_current_rss_mb", lambda: next(readings))
+    report = JobReport("tmdb_sync", "all")
+    data = report.to_dict()
+    rss = data["rss"]
+    assert (rss["start_mb"], rss["end_mb"], rss["delta_mb"]) == (100.0, 160.5, 60.5)
+    # 进程生命周期内的峰值单独标注，不再以 max_rss_mb 的名义混作本次运行的数据
+    assert "max_rss_mb" not in data and (rss["process_peak_mb"] is None or rss["process_peak_mb"] > 0)
+
+def test_rss_without_proc_is_empty(monkeypatch):
+    monkeypatch.setattr(job_report, "_current_rss_mb", lambda: None)
+    assert JobReport("strm", 1).to_dict()["rss"]["delta_mb"] is None
+
+def test_requests_and_phases_are_summarised():
+    report = JobReport("strm", 1)
+    with report.phase("scan"): pass
+    for seconds, outcome in [(0.1, "ok"), (0.2, "retry"), (0.3, "error")]:
+        report.request_started()
+        report.record_request("webdav", seconds, outcome, nbytes=10)
+    data = report.to_dict()
+    assert data["requests"]["webdav"] == {"count": 3, "errors": 1, "retries": 1, "bytes": 30, "p50_ms": 200.0, "p90_ms": 300.0, "p99_ms": 300.0, "max_ms": 300.0}
+    assert data["peaks"]["inflight_requests"] == 1 and "scan" in data["phases"]
+
+def test_save_keeps_latest_reports_per_target(db, monkeypatch):
+    monkeypatch.setattr(job_report, "REPORTS_KEEP_PER_TARGET", 2)
+    ids = [JobReport("strm", 1).save() for _ in range(3)]
+    JobReport("strm", 2).save()
+    rows = db.execute("SELECT id, target, report FROM job_reports ORDER BY id").fetchall()
+    assert [r["id"] for r in rows if r["target"] == "1"] == ids[1:]
+    assert "rss" in json.loads(rows[0]["report"])
@@ -0,0 +1,112 @@
+import time
+import asyncio
+import leases
+
+def _lease(conn, name):
+    return conn.execute("SELECT holder, acquired_at, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+
+def _foreign(conn, name, expires_in):
+    now = time.time()
+    conn.execute("INSERT OR REPLACE INTO leases (name, holder, acquired_at, heartbeat_at, expires_at) VALUES (?, 'other:1', ?, ?, ?)",
+                 (name, now, now, now + expires_in))
+    conn.commit()
+
+def test_acquire_renew_and_release(db):
+    assert leases.try_acquire("demo", ttl=30)
+    holder, acquired_at, expires_at = _lease(db, "demo")
+    assert holder == leases.HOLDER_ID and expires_at > time.time() + 25
+    time.sleep(0.01)
+    assert leases.try_acquire("demo", ttl=60)
+    _, renewed_acquired_at, renewed_expires_at = _lease(db, "demo")
+    assert renewed_acquired_at == acquired_at  # 续期不改变获取时间
+    assert renewed_expires_at > expires_at
+    assert leases.is_held("demo")
+    leases.release("demo")
+    assert _lease(db, "demo") is None and not leases.is_held("demo")
+
+def test_active_foreign_lease_blocks(db):
+    _foreign(db, "demo", 30)
+    assert not leases.try_acquire("demo")
+    leases.release("demo")  # 不能释放别人的租约
+    assert _lease(db, "demo")[0] == 'other:1'
+    assert [(l["name"], l["active"], l["mine"]) for l in leases.list_leases()] == [("demo", True, False)]
+
+def test_expired_foreign_lease_is_stolen(db):
+    _foreign(db, "demo", -1)
+    assert not leases.is_held("demo")
+    assert leases.try_acquire("demo", ttl=30)
+    holder, acquired_at, _ = _lease(db, "demo")
+    assert holder == leases.HOLDER_ID and acquired_at > time.time() - 5
+
+def test_renew_tolerates_errors_until_local_expiry(db, monkeypatch):
+    handle = leases.LeaseHandle("demo", True, ttl=30)
+    def broken(*args, **kwargs): raise RuntimeError("database is locked")
+    monkeypatch.setattr(leases, "try_acquire", broken)
+    assert leases._renew(handle, 30)
+    handle.expires_at = time.time() - 1
+    assert not leases._renew(handle, 30)
+
+def test_job_lock_skips_when_held_elsewhere(db):
+    _foreign(db, "job:sync", 30)
+    async def run():
+        async with leases.job_lock("sync") as lock:
+            return bool(lock)
+    assert asyncio.run(run()) is False
+    assert _lease(db, "job:sync")[0] == 'other:1'
+
+def test_job_lock_reports_lost_lease_and_releases(db, monkeypatch):
+    monkeypatch.setattr(leases, "HEARTBEAT_INTERVAL", 0.01)
+    async def run():
+        async with leases.job_lock("sync", ttl=30) as lock:
+            assert lock and leases.job_running("sync")
+            _foreign(db, "job:sync", 30)  # 模拟心跳停滞期间租约过期并被其他进程接管
+            for _ in range(100):
+                if not lock: break
+                await asyncio.sleep(0.01)
+            return lock.lost
+    assert asyncio.run(run()) is True
+    assert _lease(db, "job:sync")[0] == 'other:1'  # 退出时只释放自己的租约
+
+def test_job_lock_releases_on_exit(db):
+    async def run():
+        async with leases.job_lock("sync") as lock:
+            assert lock
+    asyncio.run(run())
+    assert _lease(db, "job:sync") is None
+
+def _run_leader(job_factory, until, timeout=2.0):
+    async def main():
+        leader = asyncio.create_task(leases.run_as_leader(job_factory))
+        deadline = time.time() + timeout
+        while not until() and time.time() < deadline:
+            await asyncio.sleep(0.01)
+        result = until()
+        leader.cancel()
+        await asyncio.gather(leader, return_exceptions=True)
+        return result
+    return asyncio.run(main())
+
+def test_leader_restarts_a_job_that_exits(db, monkeypatch):
+    monkeypatch.setattr(leases, "HEARTBEAT_INTERVAL", 0.01)
+    starts = []
+    async def job():
+        starts.append(time.time())
+        if len(starts) == 1: raise RuntimeError("boom")
+        await asyncio.sleep(60)
+    assert _run_leader(job, lambda: len(starts) >= 2)
+    assert not leases.is_leader()
+    assert _lease(db, leases.SCHEDULER_LEASE) is None  # 退出时释放主节点租约
+
+def test_leader_steps_down_when_lease_is_taken_over(db, monkeypatch):
+    monkeypatch.setattr(leases, "HEARTBEAT_INTERVAL", 0.01)
+    state = {"cancelled": False}
+    async def job():
+        try:
+            _foreign(db, leases.SCHEDULER_LEASE, 30)
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+    assert _run_leader(job, lambda: state["cancelled"])
+    assert not leases.is_leader()
+    assert _lease(db, leases.SCHEDULER_LEASE)[0] == 'other:1'
@@ -0,0 +1,48 @@
+import pytest
+
+pytest.importorskip("httpx")
+
+import library_index
+from library_index import lookup_best_version, LIBRARY_UPSERT_SQL
+
+def _index(conn, *names, folder_title="", run_ts="2026-01-01 00:00:00"):
+    rows = [library_index._index_row({"fid": f"f-{name}", "n": name}, "0", folder_title, run_ts) for name in names]
+    conn.executemany(LIBRARY_UPSERT_SQL, rows)
+    conn.commit()
+
+def _fts_rows(conn):
+    return conn.execute("SELECT COUNT(*) FROM library_115_fts").fetchone()[0]
+
+def test_prefix_lookup_prefers_best_quality(db):
+    _index(db, "流浪地球.2019.1080p.WEB-DL.mkv", "流浪地球.2019.2160p.BluRay.REMUX.mkv")
+    name, quality = lookup_best_version("流浪地球")
+    assert name == "流浪地球.2019.2160p.BluRay.REMUX.mkv" and quality == 100
+
+def test_substring_lookup_uses_trigram_index(db):
+    _index(db, "[4K]流浪地球2.2023.2160p.mkv")
+    assert lookup_best_version("流浪地球2")[0] == "[4K]流浪地球2.2023.2160p.mkv"
+    plan = " ".join(row[3] for row in db.execute("EXPLAIN QUERY PLAN SELECT l.name FROM library_115_fts f JOIN library_115 l ON l.rowid = f.rowid WHERE library_115_fts MATCH 'abc'"))
+    assert "VIRTUAL TABLE INDEX" in plan and "SCAN l" not in plan
+
+def test_folder_title_is_matched(db):
+    _index(db, "S01E01.1080p.mkv", folder_title="三体电视剧")
+    assert lookup_best_version("三体电视剧")[0] == "S01E01.1080p.mkv"
+    assert lookup_best_version("电视剧")[0] == "S01E01.1080p.mkv"
+
+def test_short_titles_only_match_by_prefix(db):
+    _index(db, "[4K]狂飙.2023.2160p.mkv", "狂飙.2023.1080p.mkv")
+    assert lookup_best_version("狂飙")[0] == "狂飙.2023.1080p.mkv"
+    assert lookup_best_version("") == (None, 0)
+    assert lookup_best_version("不存在的片名") == (None, 0)
+
+def test_reindex_keeps_fts_in_sync(db):
+    _index(db, "[4K]Oppenheimer.2023.mkv")
+    _index(db, "[4K]Oppenheimer.2023.mkv", run_ts="2026-01-02 00:00:00")  # 同一文件再次入库只更新，不产生重复索引
+    assert _fts_rows(db) == 1
+    db.execute("UPDATE library_115 SET norm_title = '4kbarbie' WHERE file_id = 'f-[4K]Oppenheimer.2023.mkv'")
+    db.commit()
+    assert lookup_best_version("Barbie")[0] == "[4K]Oppenheimer.2023.mkv"
+    assert lookup_best_version("Oppenheimer") == (None, 0)
+    db.execute("DELETE FROM library_115 WHERE indexed_at < '2026-01-03'")
+    db.commit()
+    assert _fts_rows(db) == 0
@@ -0,0 +1,102 @@
+import sqlite3
+import pytest
+import database
+
+# 引入版本化迁移之前的线上库结构 (旧 init_db 建出的表，没有 schema_version)
+BASELINE_DDL = [
+    "CREATE TABLE system_configs (config_key VARCHAR(50) UNIQUE PRIMARY KEY, config_value VARCHAR(255))",
+    "CREATE TABLE media_items (tmdb_id INTEGER PRIMARY KEY, media_type VARCHAR(20), title VARCHAR(255), overview TEXT, poster_path VARCHAR(255), add_date DATE)",
+    "CREATE TABLE subscriptions (id INTEGER PRIMARY KEY AUTOINCREMENT, tmdb_id INTEGER UNIQUE, status VARCHAR(20) DEFAULT 'pending')",
+    "CREATE TABLE system_logs (id INTEGER PRIMARY KEY AUTOINCREMENT, level VARCHAR(20), message TEXT, created_at DATETIME)",
+    '''CREATE TABLE strm_records (id INTEGER PRIMARY KEY AUTOINCREMENT, config_id INTEGER, file_name TEXT, local_path TEXT,
+       created_at DATETIME DEFAULT CURRENT_TIMESTAMP)''',
+    "CREATE UNIQUE INDEX idx_strm_local_path ON strm_records(config_id, local_path)",
+]
+
+ALL_VERSIONS = [version for version, _, _ in database.MIGRATIONS]
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+def _baseline(path):
+    conn = sqlite3.connect(path)
+    for sql in BASELINE_DDL:
+        conn.execute(sql)
+    conn.execute("INSERT INTO system_configs VALUES ('api_key', 'secret')")
+    conn.execute("INSERT INTO media_items VALUES (1, 'movie', '流浪地球', '太阳即将毁灭', '/p.jpg', '2026-01-01')")
+    conn.execute("INSERT INTO subscriptions (tmdb_id, status) VALUES (1, 'pending')")
+    conn.executemany("INSERT INTO strm_records (config_id, file_name, local_path) VALUES (?, ?, ?)",
+                     [(1, 'a', '/a'), (1, 'b', '/b'), (2, 'c', '/c')])
+    conn.commit(); conn.close()
+
+def _use_db(tmp_path, monkeypatch):
+    database.close_thread_db()
+    monkeypatch.setattr(database, "DB_DIR", str(tmp_path))
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "legacy.db"))
+    return str(tmp_path / "legacy.db")
+
+def test_baseline_db_upgrades_to_latest_version(tmp_path, monkeypatch):
+    path = _use_db(tmp_path, monkeypatch)
+    _baseline(path)
+    result = database.init_db()
+    assert result["version"] == database.SCHEMA_VERSION == 12
+    assert result["applied"] == ALL_VERSIONS == list(range(1, 13))
+
+    conn = sqlite3.connect(path)
+    try:
+        versions = [row[0] for row in conn.execute("SELECT version FROM schema_version ORDER BY version")]
+        assert versions == ALL_VERSIONS
+        # 旧数据保留，缺失的字段按默认值补齐
+        assert conn.execute("SELECT config_value FROM system_configs WHERE config_key = 'api_key'").fetchone()[0] == 'secret'
+        assert conn.execute("SELECT drive_type, attempts, next_retry_at FROM subscriptions WHERE tmdb_id = 1").fetchone() == ('115', 0, '')
+        assert {"drive_type", "attempts", "last_error", "last_tried_at", "next_retry_at"} <= _columns(conn, "subscriptions")
+        assert "year" in _columns(conn, "media_items")
+        # 已有影视与 STRM 记录被回填到全文索引与计数表
+        assert conn.execute("SELECT rowid FROM media_fts WHERE media_fts MATCH '流浪地'").fetchall() == [(1,)]
+        assert conn.execute("SELECT config_id, total FROM strm_record_counts ORDER BY config_id").fetchall() == [(1, 2), (2, 1)]
+        # 默认配置只补齐缺失项，不覆盖用户已有的值
+        assert conn.execute("SELECT COUNT(*) FROM system_configs").fetchone()[0] == len({k for k, _ in database.DEFAULT_CONFIGS} | {'api_key'})
+        for table in ("library_115", "library_115_fts", "job_reports", "leases", "cache_versions", "strm_settings", "strm_tasks"):
+            assert conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone(), table
+        assert conn.execute("PRAGMA integrity_check").fetchone()[0] == 'ok'
+    finally:
+        conn.close()
+
+def test_second_init_applies_nothing(tmp_path, monkeypatch):
+    path = _use_db(tmp_path, monkeypatch)
+    assert database.init_db()["applied"] == ALL_VERSIONS
+    assert database.init_db()["applied"] == []
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM schema_version").fetchone()[0] == len(ALL_VERSIONS)
+        assert conn.execute("SELECT COUNT(*) FROM strm_settings").fetchone()[0] == 1
+    finally:
+        conn.close()
+
+def test_partially_migrated_db_applies_only_missing_versions(tmp_path, monkeypatch):
+    path = _use_db(tmp_path, monkeypatch)
+    conn = sqlite3.connect(path, isolation_level=None)
+    with monkeypatch.context() as m:
+        m.setattr(database, "MIGRATIONS", database.MIGRATIONS[:9])
+        m.setattr(database, "SCHEMA_VERSION", 9)
+        assert database.migrate(conn) == list(range(1, 10))
+    assert database.migrate(conn) == ALL_VERSIONS[9:]
+    assert "year" in _columns(conn, "media_items")
+    conn.close()
+
+def test_failed_migration_rolls_back(tmp_path, monkeypatch):
+    path = _use_db(tmp_path, monkeypatch)
+    def broken(cursor):
+        cursor.execute("CREATE TABLE half_done (id INTEGER)")
+        raise sqlite3.OperationalError("boom")
+    monkeypatch.setattr(database, "MIGRATIONS", database.MIGRATIONS + [(database.SCHEMA_VERSION + 1, "broken", broken)])
+    monkeypatch.setattr(database, "SCHEMA_VERSION", database.SCHEMA_VERSION + 1)
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        with pytest.raises(sqlite3.OperationalError, match="boom"):
+            database.migrate(conn)
+        # 同一事务内的所有迁移一并回滚，下次启动从头重试
+        assert database._current_version(conn) == 0
+        assert conn.execute("SELECT 1 FROM sqlite_master WHERE name IN ('half_done', 'media_items')").fetchone() is None
+    finally:
+        conn.close()
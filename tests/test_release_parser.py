@@ -0,0 +1,97 @@
+import pytest
+from release_parser import parse_release, quality_score, load_profile, score_release, rank_candidates, pick_best, normalize_title, DEFAULT_PROFILE
+
+@pytest.mark.parametrize("name, resolution, source, codec, hdr", [
+    ("Oppenheimer.2023.1080p.BluRay.x264-SPARKS", 1080, "bluray", "x264", None),
+    ("Dune.Part.Two.2024.2160p.UHD.BluRay.REMUX.DV.HDR10.HEVC.TrueHD.7.1.Atmos", 2160, "remux", "x265", "dv"),
+    ("The.Last.of.Us.S01E03.2160p.WEB-DL.DDP5.1.Atmos.DV.HDR.H.265-FLUX", 2160, "web-dl", "x265", "dv"),
+    ("Poor.Things.2023.720p.WEBRip.x264.AAC-YTS", 720, "webrip", "x264", None),
+    ("盗梦空间 Inception 2010 4K REMUX HDR10+", 2160, "remux", None, "hdr10+"),
+    ("奥本海默 Oppenheimer (2023) 4K 蓝光原盘 杜比视界", 2160, "remux", None, "dv"),
+    ("千与千寻 2001 日语 中字 DVD", None, "dvd", None, None),
+])
+def test_parse_release_tags(name, resolution, source, codec, hdr):
+    info = parse_release(name)
+    assert (info["resolution"], info["source"], info["codec"], info["hdr"]) == (resolution, source, codec, hdr)
+
+@pytest.mark.parametrize("name", ["Movie 2020 BluRay 1080p REMUX", "蓝光原盘 REMUX", "REMUX BluRay"])
+def test_best_ranked_source_wins(name):
+    assert parse_release(name)["source"] == "remux"
+
+@pytest.mark.parametrize("name, resolution, source", [
+    ("Movie.2020.BD1080P.x264.mkv", 1080, "bluray"),
+    ("Movie.2020.bd720p.mkv", 720, "bluray"),
+    ("Movie.2021.WEB2160p.x265", 2160, "web-dl"),
+])
+def test_source_glued_to_resolution(name, resolution, source):
+    info = parse_release(name)
+    assert (info["resolution"], info["source"]) == (resolution, source)
+    assert info["title"] == "Movie"
+
+@pytest.mark.parametrize("name, source", [
+    ("Oppenheimer.2023.TS.1080p", "cam"),
+    ("Movie 2023 TC x264", "cam"),
+    ("某片 TS 中字", "cam"),
+    ("Movie.2023.HDTC.x264", "cam"),
+    ("The.TS.Eliot.Story.2019.1080p.WEB-DL", "web-dl"),
+    ("TC.Movie.Name", None),
+    ("奥本海默 TS", None),
+])
+def test_ts_tc_need_release_context(name, source):
+    assert parse_release(name)["source"] == source
+
+def test_title_is_not_cut_at_unguarded_ts():
+    assert parse_release("The.TS.Eliot.Story.2019.1080p.WEB-DL")["title"] == "The.TS.Eliot.Story"
+
+def test_year_season_episode_and_complete():
+    info = parse_release("三体 Three-Body 2023 S01E30 2160p WEB-DL H.265 DDP5.1")
+    assert (info["year"], info["season"], info["episode"]) == (2023, 1, 30)
+    assert parse_release("狂飙 全39集 1080P 国语中字")["complete"] is True
+    info = parse_release("三体 第1季 第15集 4K")
+    assert (info["season"], info["episode"], info["resolution"], info["title"]) == (1, None, 2160, "三体")
+
+def test_quality_score_matches_legacy_scale():
+    assert quality_score(parse_release("Movie 2160p")) == 100
+    assert quality_score(parse_release("Movie REMUX 1080p")) == 95
+    assert quality_score(parse_release("Movie 720p")) == 60
+    assert quality_score(parse_release("Movie")) == 50
+
+def test_normalize_title():
+    assert normalize_title("The Wandering-Earth: II") == "thewanderingearthii"
+    assert normalize_title(None) == ""
+
+def test_load_profile_merges_and_ignores_garbage():
+    profile = load_profile('{"source": {"cam": -500}, "min_score": 10, "unknown": 1}')
+    assert profile["source"]["cam"] == -500 and profile["source"]["remux"] == DEFAULT_PROFILE["source"]["remux"]
+    assert profile["min_score"] == 10 and "unknown" not in profile
+    assert load_profile("not json") == load_profile("")
+    assert load_profile("[1, 2]")["min_score"] == DEFAULT_PROFILE["min_score"]
+    # 覆盖不能修改默认配置本身
+    assert DEFAULT_PROFILE["source"]["cam"] == -100
+
+def test_score_release_year_match_and_mismatch():
+    info = parse_release("Movie 2020 1080p BluRay")
+    base = score_release(info, DEFAULT_PROFILE)
+    assert score_release(info, DEFAULT_PROFILE, 2020) == base + DEFAULT_PROFILE["year_match"]
+    assert score_release(info, DEFAULT_PROFILE, 2019) == base + DEFAULT_PROFILE["year_mismatch"]
+
+def test_rank_candidates_orders_by_score_and_provider():
+    data = {
+        "115": [{"url": "a", "note": "Movie 2020 720p WEBRip"}, {"url": "", "note": "Movie 2160p REMUX"}],
+        "aliyun": [{"url": "b", "note": "Movie 2020 2160p BluRay REMUX"}],
+        "magnet": [{"url": "c", "note": "Movie 2020 720p WEBRip"}],
+    }
+    ranked = rank_candidates(data, ["115", "aliyun", "magnet"], "Movie", 2020)
+    assert [r[2]["url"] for r in ranked] == ["b", "a", "c"]  # 无 url 的候选被丢弃；同质量时网盘优先级靠前者胜出
+    assert ranked[1][0] > ranked[2][0]
+
+def test_rank_candidates_title_match_and_min_score():
+    data = {"115": [{"url": "a", "note": "Other 1080p"}, {"url": "b", "note": "Movie 1080p"}, {"url": "c", "note": "Movie CAM"}]}
+    ranked = rank_candidates(data, ["115"], "Movie")
+    assert [r[2]["url"] for r in ranked] == ["b", "a"]  # cam 的 -100 低于 min_score 被淘汰
+    assert pick_best({}, ["115"]) is None
+
+def test_pick_best_uses_year_to_reject_namesakes():
+    data = {"115": [{"url": "old", "note": "Movie 1998 2160p REMUX"}, {"url": "new", "note": "Movie 2020 1080p WEB-DL"}]}
+    assert pick_best(data, ["115"], "Movie")[2]["url"] == "old"
+    assert pick_best(data, ["115"], "Movie", 2020)[2]["url"] == "new"
@@ -0,0 +1,46 @@
+import asyncio
+import pytest
+
+pytest.importorskip("httpx")
+
+from drive_api import plan_share_transfer, make_dir_tree, MIN_VIDEO_BYTES
+
+BIG = MIN_VIDEO_BYTES * 10
+
+def _file(name, size=BIG):
+    return {"item": {"name": name, "size": size, "folder": False}, "children": None}
+
+def _folder(name, *children):
+    return {"item": {"name": name, "folder": True}, "children": list(children)}
+
+def _plan(*nodes):
+    picked, selected, skipped = plan_share_transfer(list(nodes), lambda f: f["folder"], lambda f: f["name"], lambda f: f.get("size", 0))
+    return [(f["name"], path) for f, path in picked], selected, skipped
+
+def test_clean_folder_is_saved_whole():
+    tree = _folder("三体", _folder("Season 1", _file("E01.mkv"), _file("E01.srt", 1)), _file("E02.mkv"))
+    assert _plan(tree) == ([("三体", ())], 3, 0)
+
+def test_mixed_folder_keeps_relative_structure():
+    tree = _folder("合集",
+                   _folder("Season 1", _file("E01.mkv"), _file("公众号.mp4")),
+                   _folder("Season 2", _file("E01.mkv"), _file("E01.srt", 1)),
+                   _file("readme.txt"))
+    picked, selected, skipped = _plan(tree)
+    # 两季的 E01.mkv 分别落在各自的目录下，不会在目标目录中互相覆盖
+    assert picked == [("E01.mkv", ("合集", "Season 1")), ("Season 2", ("合集",))]
+    assert (selected, skipped) == (3, 2)
+
+def test_top_level_files_and_unknown_depth():
+    tree = [_file("Movie.mkv"), _file("sample.mkv", 1024), {"item": {"name": "深层", "folder": True}, "children": None}]
+    assert _plan(*tree) == ([("Movie.mkv", ())], 1, 2)
+
+def test_make_dir_tree_creates_each_level_once():
+    created = []
+    async def create_dir(parent, name):
+        created.append((parent, name))
+        return f"{parent}/{name}"
+    paths = [("合集", "Season 1"), ("合集",), (), ("合集", "Season 1"), ("其他",)]
+    dir_ids = asyncio.run(make_dir_tree(paths, "root", create_dir))
+    assert created == [("root", "合集"), ("root/合集", "Season 1"), ("root", "其他")]
+    assert dir_ids[()] == "root" and dir_ids[("合集", "Season 1")] == "root/合集/Season 1"
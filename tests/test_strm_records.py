@@ -0,0 +1,77 @@
+import pytest
+
+pytest.importorskip("fastapi")
+
+import strm_routes
+
+def _counts(conn):
+    return dict(conn.execute("SELECT config_id, total FROM strm_record_counts").fetchall())
+
+def _insert(conn, config_id, *paths, created_at=None):
+    for path in paths:
+        if created_at: conn.execute("INSERT INTO strm_records (config_id, file_name, local_path, created_at) VALUES (?, ?, ?, ?)", (config_id, path, path, created_at))
+        else: conn.execute("INSERT INTO strm_records (config_id, file_name, local_path) VALUES (?, ?, ?)", (config_id, path, path))
+    conn.commit()
+
+def test_count_triggers_follow_inserts_and_deletes(db):
+    _insert(db, 1, "电影/a.strm", "电影/b.strm")
+    _insert(db, 2, "剧集/c.strm")
+    assert _counts(db) == {1: 2, 2: 1}
+    db.execute("DELETE FROM strm_records WHERE local_path = '电影/a.strm'")
+    db.commit()
+    assert _counts(db) == {1: 1, 2: 1}
+
+def test_count_triggers_ignore_rejected_duplicates(db):
+    _insert(db, 1, "电影/a.strm")
+    db.execute("INSERT OR IGNORE INTO strm_records (config_id, file_name, local_path) VALUES (1, 'a', '电影/a.strm')")
+    db.commit()
+    assert _counts(db) == {1: 1}
+
+def test_clear_keeps_counts_consistent(db, monkeypatch):
+    monkeypatch.setattr(strm_routes, "STRM_CLEAR_CHUNK", 2)
+    monkeypatch.setattr(strm_routes.time, "sleep", lambda _: None)
+    _insert(db, 1, *[f"电影/{i}.strm" for i in range(5)])
+    _insert(db, 2, "剧集/x.strm")
+    assert "5" in strm_routes.clear_strm_records(1)["message"]
+    assert _counts(db) == {1: 0, 2: 1}
+    assert [r["config_id"] for r in strm_routes.get_strm_record_counts()] == [2]
+    strm_routes.clear_strm_records()
+    assert sum(_counts(db).values()) == 0
+
+def test_keyset_cursor_walks_all_records_once(db):
+    _insert(db, 1, *[f"电影/{i:02d}.strm" for i in range(7)])
+    seen, cursor = [], None
+    while True:
+        page = strm_routes.get_strm_records(size=3, cursor=cursor)
+        assert page["total"] == 7
+        seen += [r["id"] for r in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None: break
+    assert seen == sorted(seen, reverse=True) and len(set(seen)) == 7
+
+def test_cursor_pages_match_offset_pages(db):
+    _insert(db, 1, *[f"电影/{i:02d}.strm" for i in range(5)])
+    first = strm_routes.get_strm_records(size=2)
+    by_cursor = strm_routes.get_strm_records(size=2, cursor=first["next_cursor"])
+    by_page = strm_routes.get_strm_records(size=2, page=2)
+    assert [r["id"] for r in by_cursor["items"]] == [r["id"] for r in by_page["items"]]
+
+def test_filters_use_cached_or_capped_totals(db, monkeypatch):
+    _insert(db, 1, "电影/a.strm", "电影/b.strm", "剧集/c.strm")
+    _insert(db, 2, "电影/d.strm")
+    assert strm_routes.get_strm_records(config_id=1)["total"] == 3
+    page = strm_routes.get_strm_records(config_id=1, path_prefix="/电影/")
+    assert [r["local_path"] for r in page["items"]] == ["电影/b.strm", "电影/a.strm"]
+    assert (page["total"], page["total_capped"]) == (2, False)
+    monkeypatch.setattr(strm_routes, "STRM_RECORD_COUNT_CAP", 2)
+    assert strm_routes.get_strm_records(path_prefix="电影/")["total_capped"] is True
+
+def test_date_filters_map_to_id_bounds(db):
+    _insert(db, 1, "old.strm", created_at="2000-01-01 00:00:00")
+    _insert(db, 1, "new.strm")
+    page = strm_routes.get_strm_records(date_from="2001-01-01")
+    assert [r["local_path"] for r in page["items"]] == ["new.strm"]
+    assert strm_routes.get_strm_records(date_to="2000-01-02")["items"][0]["local_path"] == "old.strm"
+    assert strm_routes.get_strm_records(date_from="2999-01-01")["items"] == []
+    with pytest.raises(strm_routes.HTTPException):
+        strm_routes.get_strm_records(date_from="yesterday")
@@ -0,0 +1,72 @@
+import datetime
+import random
+import pytest
+
+pytest.importorskip("httpx")
+
+import scheduler
+from resilience import backoff_delay
+
+def _parse(ts: str) -> datetime.datetime:
+    return datetime.datetime.strptime(ts, "%Y-%m-%d %H:%M:%S")
+
+def _sub(conn, tmdb_id=1):
+    conn.execute("INSERT INTO subscriptions (tmdb_id, status) VALUES (?, 'pending')", (tmdb_id,))
+    conn.commit()
+
+def _row(conn, tmdb_id=1):
+    return conn.execute("SELECT status, attempts, last_error, last_tried_at, next_retry_at FROM subscriptions WHERE tmdb_id=?", (tmdb_id,)).fetchone()
+
+@pytest.mark.parametrize("attempt, cap", [(0, 0.5), (1, 1.0), (3, 4.0), (4, 8.0), (10, 8.0)])
+def test_backoff_delay_stays_within_full_jitter_bounds(attempt, cap):
+    random.seed(attempt)
+    delays = [backoff_delay(attempt) for _ in range(200)]
+    assert all(0 <= d <= cap for d in delays)
+    assert max(delays) > cap / 2  # 抖动覆盖整个区间，而不是固定值
+
+def test_retry_settings_fall_back_on_garbage():
+    assert scheduler._retry_settings({}) == (6, 6.0)
+    assert scheduler._retry_settings({"sub_max_attempts": "x", "sub_retry_base_hours": "y"}) == (6, 6.0)
+    assert scheduler._retry_settings({"sub_max_attempts": "0", "sub_retry_base_hours": "0"}) == (1, 0.1)
+    assert scheduler._retry_settings({"sub_max_attempts": "3", "sub_retry_base_hours": "1.5"}) == (3, 1.5)
+
+@pytest.mark.parametrize("attempts, hours", [(0, 6), (1, 12), (2, 24), (4, 96), (10, 168)])
+def test_failure_schedules_exponential_next_retry(db, attempts, hours):
+    _sub(db)
+    before = datetime.datetime.now().replace(microsecond=0)
+    assert scheduler.mark_sub_failure(1, attempts, "未找到资源", 99, 6) == 'pending'
+    status, new_attempts, error, tried_at, next_retry_at = _row(db)
+    assert (status, new_attempts, error) == ('pending', attempts + 1, "未找到资源")
+    delay = _parse(next_retry_at) - _parse(tried_at)
+    assert delay == datetime.timedelta(hours=hours)  # 超过 7 天时封顶
+    assert _parse(tried_at) >= before
+
+def test_failure_reaching_max_attempts_becomes_not_found(db):
+    _sub(db)
+    assert scheduler.mark_sub_failure(1, 0, "e" * 800, 2, 6) == 'pending'
+    assert scheduler.mark_sub_failure(1, 1, "e", 2, 6) == 'not_found'
+    status, attempts, _, _, _ = _row(db)
+    assert (status, attempts) == ('not_found', 2)
+
+def test_failure_truncates_long_errors(db):
+    _sub(db)
+    scheduler.mark_sub_failure(1, 0, "e" * 800, 6, 6)
+    assert len(_row(db)[2]) == 500
+
+def test_success_clears_retry_state(db):
+    _sub(db)
+    scheduler.mark_sub_failure(1, 0, "boom", 6, 6)
+    scheduler.mark_sub_success(1)
+    status, _, error, _, next_retry_at = _row(db)
+    assert (status, error, next_retry_at) == ('success', None, '')
+
+def test_only_due_subscriptions_are_selected(db):
+    # 与调度主循环相同的查询条件：'' 与已过期的 next_retry_at 才会被取出
+    for tmdb_id in (1, 2, 3):
+        _sub(db, tmdb_id)
+    scheduler.mark_sub_failure(2, 0, "later", 6, 6)
+    db.execute("UPDATE subscriptions SET next_retry_at='2000-01-01 00:00:00' WHERE tmdb_id=3")
+    db.commit()
+    now_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    due = db.execute("SELECT tmdb_id FROM subscriptions WHERE status = 'pending' AND next_retry_at <= ? ORDER BY next_retry_at, id", (now_str,)).fetchall()
+    assert [r[0] for r in due] == [1, 3]